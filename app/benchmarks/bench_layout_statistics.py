@@ -0,0 +1,144 @@
+"""
+Benchmark of the calculation of the layout statistics (LayoutContext.from_page_cache).
+
+Compares the former implementation (four separate scans, each parsing every page with
+page.getText('rawdict')) with the single pass of LayoutStatistics over the PageCache.
+The benchmark also checks that both implementations calculate the same histograms.
+
+Usage:
+    python -m app.benchmarks.bench_layout_statistics
+"""
+import glob
+import os
+import time
+from collections import defaultdict
+from typing import List
+
+import fitz
+
+from app.core.extraction_modul.page_cache import PageCache
+from app.core.extraction_modul.layout_statistics import LayoutStatistics
+
+PATH_TO_TEST_FILES = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../tests/testfiles')
+REPETITIONS = 3
+
+
+################################################################################
+# The former implementation
+################################################################################
+def legacy_get_space_between_chars(pages, width: int) -> List:
+    distancesBetweenTwoChars = defaultdict(int)
+    chars = []
+    for page in pages:
+        dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
+        textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
+        for textBlock in textBlocks:
+            for line in textBlock["lines"]:
+                for span in line["spans"]:
+                    chars.extend(span["chars"])
+
+    for idx_, char in enumerate(chars[1:]):
+        prev_char_x2 = chars[idx_ - 1]['bbox'][2]
+        char_x1 = char['bbox'][0]
+        delta = int(char_x1 - prev_char_x2)
+        if 0 <= delta <= width:
+            distancesBetweenTwoChars[delta] += 1
+
+    distancesBetweenTwoChars = list(distancesBetweenTwoChars.items())
+    distancesBetweenTwoChars.sort(key=lambda x: x[1], reverse=True)
+    return distancesBetweenTwoChars
+
+
+def legacy_get_heights_between_lines(pages) -> List:
+    heights = defaultdict(int)
+    lines = []
+    for pageNum, page in enumerate(pages):
+        dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
+        for textBlock in dataBlocks:
+            if textBlock['type'] == 0:
+                for line in textBlock['lines']:
+                    line.update({'page': pageNum})
+                lines.extend(textBlock['lines'])
+
+    for idx_, line in enumerate(lines[1:]):
+        prevLine = lines[idx_ - 1]
+        prevPage = prevLine['page']
+        page = line['page']
+        prevY1 = prevLine['bbox'][1]
+        prevY2 = prevLine['bbox'][3]
+        y1 = line['bbox'][1]
+        y2 = line['bbox'][3]
+        delta = int(y1 - prevY2)
+        is_in_same_line: bool = y1 <= prevY1 <= y2 or y1 <= prevY2 <= y2 or prevY1 <= y1 <= prevY2
+        if 0 <= delta and prevPage == page and not is_in_same_line:
+            heights[delta] += 1
+
+    heights: List = list(heights.items())
+    heights.sort(key=lambda x: x[1], reverse=True)
+    return heights
+
+
+def legacy_get_first_span_values(pages, key: str, to_value) -> List:
+    values = defaultdict(int)
+    for page in pages:
+        dataBlocks = [_dataBlocks for key_, _dataBlocks in page.getText("rawdict").items() if key_ == "blocks"][0]
+        textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
+        for textBlock in textBlocks:
+            for line in textBlock["lines"]:
+                values[to_value(line["spans"][0][key])] += 1
+    values = list(values.items())
+    values.sort(key=lambda x: x[1], reverse=True)
+    return values
+
+
+def legacy_statistics(pages, width):
+    return (legacy_get_space_between_chars(pages, width),
+            legacy_get_heights_between_lines(pages),
+            legacy_get_first_span_values(pages, 'size', int),
+            legacy_get_first_span_values(pages, 'font', str))
+
+
+################################################################################
+# The single pass implementation
+################################################################################
+def fused_statistics(pages, width):
+    statistics = LayoutStatistics.from_page_cache(PageCache(pages), width)
+    return (statistics.get_distances_between_chars(),
+            statistics.get_heights_between_lines(),
+            statistics.get_sizes(),
+            statistics.get_fonts())
+
+
+def measure(function, pages, width):
+    """ Returns the best time of a few repetitions and the results. """
+    best = None
+    res = None
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        res = function(pages, width)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, res
+
+
+def main():
+    total_legacy = 0
+    total_fused = 0
+    print(f"{'document':<45}{'pages':>6}{'legacy [s]':>12}{'fused [s]':>12}{'speedup':>9}  equal")
+    for path in sorted(glob.glob(os.path.join(PATH_TO_TEST_FILES, '**/*.pdf'), recursive=True)):
+        doc = fitz.open(path)
+        pages = [doc[i] for i in range(doc.pageCount)]
+        width = int(max([page.cropbox.x1 for page in pages]))
+
+        legacy_time, legacy_res = measure(legacy_statistics, pages, width)
+        fused_time, fused_res = measure(fused_statistics, pages, width)
+        total_legacy += legacy_time
+        total_fused += fused_time
+        print(f"{os.path.basename(path):<45}{len(pages):>6}{legacy_time:>12.3f}{fused_time:>12.3f}"
+              f"{legacy_time / fused_time:>8.1f}x  {legacy_res == fused_res}")
+
+    print(f"{'total':<51}{total_legacy:>12.3f}{total_fused:>12.3f}{total_legacy / total_fused:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
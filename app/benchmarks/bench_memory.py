@@ -0,0 +1,64 @@
+"""
+Benchmark of the memory usage of the extracted models.
+
+Extracts the text blocks (with their lines) of the test documents and creates a row with cells for
+every line (like the table extraction does for the lines of a table). The memory that stays allocated
+after the extraction is measured with tracemalloc and reported in bytes per page.
+
+Usage:
+    python -m app.benchmarks.bench_memory
+"""
+import gc
+import glob
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+from app.core.extraction_modul.datamodels.table_models import Table, Row
+from app.core.extraction_modul.extraction_model import PDF_Extraction
+from app.core.detection_models.text_detection import NLP_MODELS
+
+PATH_TO_TEST_FILES = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../tests/testfiles')
+
+
+def get_allocated_bytes() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def main():
+    paths = sorted(glob.glob(os.path.join(PATH_TO_TEST_FILES, '**/*.pdf'), recursive=True))
+    documents, rows = [], []
+    number_of_pages, number_of_lines, number_of_cells = 0, 0, 0
+
+    # The NLP model is loaded before the measurement, so that only the extracted models are counted
+    NLP_MODELS.warm_up()
+    tracemalloc.start()
+    start = get_allocated_bytes()
+    for path in paths:
+        data = PDF_Extraction.read_pdf(path)
+        documents.append(data)
+        number_of_pages += len(data.document)
+    after_extraction = get_allocated_bytes()
+
+    for data in documents:
+        table = Table(SimpleNamespace(pageNum=0, isPartOfTable=False), [], 0, 0, 0, 0, data.layout)
+        for textBlock in data.textBlocks:
+            for line in textBlock.lines:
+                row = Row.from_line(line, len(rows), table)
+                row.set_cells()
+                rows.append(row)
+                number_of_lines += 1
+                number_of_cells += len(row.cells)
+    after_rows = get_allocated_bytes()
+    tracemalloc.stop()
+
+    print(f"{len(documents)} documents, {number_of_pages} pages, {number_of_lines} lines, {number_of_cells} cells")
+    print(f"{'models':<28}{'bytes/page':>14}")
+    print(f"{'text blocks and lines':<28}{(after_extraction - start) / number_of_pages:>14,.0f}")
+    print(f"{'rows and cells':<28}{(after_rows - after_extraction) / number_of_pages:>14,.0f}")
+    print(f"{'total':<28}{(after_rows - start) / number_of_pages:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
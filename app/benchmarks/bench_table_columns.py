@@ -0,0 +1,115 @@
+"""
+Benchmark of the column discovery of a table (Table.setColumns).
+
+Compares the former implementation (a repeated scan over all cells of the table until no cell is
+added to a column) with the sweep over the cells sorted by their positions, which compares only
+the cells of overlapping bands. The tables are synthetic wide tables with slightly shifted cells.
+The benchmark also checks that both implementations create the same columns.
+
+Usage:
+    python -m app.benchmarks.bench_table_columns
+"""
+import random
+import time
+from types import SimpleNamespace
+from typing import List
+
+from app.core.extraction_modul.datamodels.table_models import Table, Row, Cell, Column
+from app.core.extraction_modul.layout_statistics import LayoutContext
+
+NUMBER_OF_ROWS = 30
+NUMBERS_OF_COLUMNS = [10, 50, 100, 200]
+REPETITIONS = 3
+
+
+################################################################################
+# The former implementation
+################################################################################
+def legacy_get_rows(table: Table) -> List[Cell]:
+    zwerg = []
+    for row in table.rows:
+        zwerg.extend(row.cells)
+    rows = []
+    while (len(zwerg) > 0):
+        cell = zwerg.pop(0)
+        rows.append(cell)
+        to_remove = []
+        counter = 1
+        while (counter != 0):
+            counter = 0
+            for _cell in zwerg:
+                if _cell not in to_remove:
+                    delta_1 = cell.posX2 - cell.posX1
+                    delta_2 = _cell.posX2 - _cell.posX1
+                    if delta_2 > delta_1:
+                        if _cell.posX1 <= cell.centerX <= _cell.posX2:
+                            to_remove.append(_cell)
+                            counter += 1
+                    else:
+                        if cell.posX1 <= _cell.centerX <= cell.posX2:
+                            rows.remove(cell)
+                            rows.append(_cell)
+                            cell = _cell
+                            to_remove.append(_cell)
+                            counter += 1
+        for cell in to_remove:
+            if cell in zwerg:
+                zwerg.remove(cell)
+    return rows
+
+
+def legacy_set_columns(table: Table, x1, x2, y1, y2) -> None:
+    rows = legacy_get_rows(table)
+    rows.sort(key=lambda x: x.posX1)
+    table.columns = [Column(num, row.posX1, row.posX2, y1, y2, table) for num, row in enumerate(rows)]
+
+
+################################################################################
+# The benchmark
+################################################################################
+def create_wide_table(number_of_columns: int) -> Table:
+    """ Creates a table with shifted cells, a header spanning two columns and some empty cells. """
+    table = Table(SimpleNamespace(pageNum=0, isPartOfTable=False), [], 0, 0, 50 * number_of_columns, 1000,
+                  LayoutContext())
+    for num in range(NUMBER_OF_ROWS):
+        row = Row(num, None, table)
+        for column_number in range(number_of_columns):
+            if num == 0 and column_number % 2 == 1:
+                continue
+            if num > 0 and random.random() < 0.1:
+                continue
+            x = 50 * column_number + random.randint(0, 5)
+            width = 85 if num == 0 else random.randint(10, 40)
+            row.cells.append(Cell((x, 12 * num, x + width, 12 * num + 10), "1.0"))
+        row.numberOfCols = len(row.cells)
+        table.rows.append(row)
+    return table
+
+
+def measure(function, table: Table) -> float:
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        function(table, table.posX1, table.posX2, table.posY1, table.posY2)
+    return (time.perf_counter() - start) / REPETITIONS
+
+
+def get_columns(table: Table):
+    return [(column.rowNumber, column.posX1, column.posX2, column.posY1, column.posY2) for column in table.columns]
+
+
+def main():
+    random.seed(0)
+    print(f"{'rows x columns':<16}{'cells':>8}{'former [ms]':>14}{'sweep [ms]':>14}{'same columns':>14}")
+    for number_of_columns in NUMBERS_OF_COLUMNS:
+        table = create_wide_table(number_of_columns)
+        legacy_time = measure(legacy_set_columns, table)
+        legacy_columns = get_columns(table)
+        sweep_time = measure(Table.setColumns, table)
+        same = legacy_columns == get_columns(table)
+        number_of_cells = sum([len(row.cells) for row in table.rows])
+        print(f"{f'{NUMBER_OF_ROWS} x {number_of_columns}':<16}{number_of_cells:>8}"
+              f"{legacy_time * 1000:>14.1f}{sweep_time * 1000:>14.1f}{str(same):>14}")
+
+
+if __name__ == '__main__':
+    main()
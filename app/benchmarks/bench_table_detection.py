@@ -0,0 +1,95 @@
+"""
+Benchmark of the table detection on the CPU.
+
+Runs the table detection on every page with a table caption of the test documents, once with the
+fp32 model and once with the dynamically quantized (int8) model. The latency is measured per page.
+The boxes of the fp32 model are used as reference for the accuracy of the quantized model
+(a box is found if a box of the same class overlaps it with an IoU >= 0.5).
+
+Usage:
+    python -m app.benchmarks.bench_table_detection
+"""
+import glob
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.config import TABLE_DETECTION_DPI, TORCH_NUM_THREADS
+from app.core.detection_models.table_detection import load_table_detection_model, predict_table_boundaries, \
+    render_page, in_json
+from app.core.extraction_modul.apis import TableStrategy
+from app.core.extraction_modul.extraction_model import PDF_Extraction
+
+PATH_TO_TEST_FILES = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../tests/testfiles')
+REPETITIONS = 3
+MIN_IOU = 0.5
+
+
+def get_candidate_pages() -> List[np.ndarray]:
+    """ Renders all pages with a table caption of the test documents. """
+    imgs = []
+    table_api = TableStrategy()
+    for path in sorted(glob.glob(os.path.join(PATH_TO_TEST_FILES, '**/*.pdf'), recursive=True)):
+        data = PDF_Extraction.read_pdf(path)
+        table_api.identify_table_descriptions(data)
+        for page in sorted(set([textBlock.pageNum for textBlock in data.tableDescriptions])):
+            imgs.append(render_page(data.document.load_page(page), TABLE_DETECTION_DPI))
+    return imgs
+
+
+def detect(model, imgs: List[np.ndarray]) -> (float, List[List[Dict]]):
+    """ Returns the mean latency per page (in seconds) and the boxes of every page. """
+    # The first run is not measured
+    predict_table_boundaries(model, imgs[0])
+    start = time.perf_counter()
+    for _ in range(REPETITIONS):
+        results = [predict_table_boundaries(model, img) for img in imgs]
+    latency = (time.perf_counter() - start) / (REPETITIONS * len(imgs))
+    return latency, [in_json(result, img, num, TABLE_DETECTION_DPI) for num, (result, img) in enumerate(zip(results, imgs))]
+
+
+def iou(box_1: Dict, box_2: Dict) -> float:
+    width = min(box_1['x2'], box_2['x2']) - max(box_1['x1'], box_2['x1'])
+    height = min(box_1['y2'], box_2['y2']) - max(box_1['y1'], box_2['y1'])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    area_1 = (box_1['x2'] - box_1['x1']) * (box_1['y2'] - box_1['y1'])
+    area_2 = (box_2['x2'] - box_2['x1']) * (box_2['y2'] - box_2['y1'])
+    return intersection / (area_1 + area_2 - intersection)
+
+
+def recall(reference: List[List[Dict]], boxes: List[List[Dict]]) -> float:
+    """ The share of the reference boxes that were found. """
+    number_of_boxes = sum([len(_) for _ in reference])
+    if number_of_boxes == 0:
+        return 1.0
+    found = 0
+    for reference_boxes, page_boxes in zip(reference, boxes):
+        for box in reference_boxes:
+            if any([iou(box, _) >= MIN_IOU and box['class'] == _['class'] for _ in page_boxes]):
+                found += 1
+    return found / number_of_boxes
+
+
+def main():
+    imgs = get_candidate_pages()
+    print(f"{len(imgs)} pages with a table caption, {TORCH_NUM_THREADS} threads, {TABLE_DETECTION_DPI} dpi")
+    if len(imgs) == 0:
+        return
+
+    fp32_latency, fp32_boxes = detect(load_table_detection_model(quantize=False), imgs)
+    int8_latency, int8_boxes = detect(load_table_detection_model(quantize=True), imgs)
+
+    print(f"{'profile':<10}{'latency/page [s]':>18}{'boxes':>8}{'recall':>9}")
+    print(f"{'fp32':<10}{fp32_latency:>18.3f}{sum([len(_) for _ in fp32_boxes]):>8}{1.0:>9.2f}")
+    print(f"{'int8':<10}{int8_latency:>18.3f}{sum([len(_) for _ in int8_boxes]):>8}"
+          f"{recall(fp32_boxes, int8_boxes):>9.2f}")
+    # The share of the int8 boxes that were found by the fp32 model
+    print(f"precision of int8: {recall(int8_boxes, fp32_boxes):.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,48 @@ INPUT_DIRECTORY = os.path.join(CURRENT_DIRECTORY, 'extraction_modul/logging/inpu
 IMAGE_DIRECTORY = os.path.join(CURRENT_DIRECTORY, 'extraction_modul/logging/images/')
 TMP_DIRECTORY = os.path.join(CURRENT_DIRECTORY, 'files/tmp')
 
+# Max. memory (estimated in bytes) that the parsed pages of a single document may use
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Number of worker processes for the extraction (0 runs the extraction in the process of the API)
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 2))
+
+# The size (in bytes) of the chunks in which the uploaded PDFs are written to the INPUT_DIRECTORY
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+
+# Limits of the results of the finished tasks that are kept in the memory (the JSON of the documents)
+RESULT_STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', 256 * 1024 * 1024))
+RESULT_STORE_MAX_ENTRIES = int(os.environ.get('RESULT_STORE_MAX_ENTRIES', 1000))
+# The time (in seconds) after which the results are dropped
+RESULT_STORE_TTL = float(os.environ.get('RESULT_STORE_TTL', 24 * 60 * 60))
+# The evicted results are moved to this SQLite database (an empty value drops them instead)
+RESULT_STORE_PATH = os.environ.get('RESULT_STORE_PATH', os.path.join(TMP_DIRECTORY, 'results.sqlite')) or None
+
+# The results of the extractions are cached by the hash of the PDF (an empty directory disables the cache)
+EXTRACTION_CACHE_DIRECTORY = os.environ.get('EXTRACTION_CACHE_DIRECTORY',
+                                            os.path.join(TMP_DIRECTORY, 'extraction_cache')) or None
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+# Has to be changed, if a change of the extraction changes the results (the cached results are not used then)
+PIPELINE_VERSION = os.environ.get('PIPELINE_VERSION', '1')
+
+# The number of tasks that are executed at the same time (by default one for every worker process)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', max(1, EXTRACTION_WORKERS)))
+# The max. number of waiting tasks, further tasks are rejected (429 Too Many Requests)
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))
+# The max. number of waiting tasks of a single client, so that a client can not fill the whole queue
+JOB_CLIENT_QUEUE_SIZE = int(os.environ.get('JOB_CLIENT_QUEUE_SIZE', 20))
+# The priorities of the clients as "<ip>=<priority>,...", the tasks of clients with a higher priority are executed first
+JOB_CLIENT_PRIORITIES = {client.strip(): int(priority) for client, priority in
+                         [_.split('=') for _ in os.environ.get('JOB_CLIENT_PRIORITIES', '').split(',') if '=' in _]}
+# The number of finished tasks whose states are kept for the status requests
+JOB_HISTORY_SIZE = int(os.environ.get('JOB_HISTORY_SIZE', 1000))
+
+# The spaCy model used for the POS-Tags and the dependencies
+SPACY_MODEL = os.environ.get('SPACY_MODEL', 'en_core_web_sm')
+# The batch size and the number of processes for nlp.pipe
+SPACY_BATCH_SIZE = int(os.environ.get('SPACY_BATCH_SIZE', 64))
+SPACY_N_PROCESS = int(os.environ.get('SPACY_N_PROCESS', 1))
+
 
 METADATA_PATTERNS = os.path.join(CURRENT_DIRECTORY, 'files/meta_data_pattern.json')
 
@@ -14,6 +56,27 @@ TABLE_MODEL_GPU = os.path.join(CURRENT_DIRECTORY, 'detection_models/models/gpu_t
 TABLE_MODEL_CPU = os.path.join(CURRENT_DIRECTORY, 'detection_models/models/cpu_table_detection_model.pth')
 TABLE_MODEL_CONFIG = os.path.join(CURRENT_DIRECTORY, 'detection_models/models/cascade_mask_rcnn_hrnetv2p_w32_20e_v2.py')
 
+# The table detection can be switched off (e.g. for text-only deployments)
+TABLE_DETECTION_ENABLED = os.environ.get('TABLE_DETECTION_ENABLED', 'true').lower() in ('true', '1', 'yes')
+# The resolution of the page images for the table detection (should match the resolution of the training data)
+TABLE_DETECTION_DPI = int(os.environ.get('TABLE_DETECTION_DPI', 72))
+# The number of page images that are passed together to the table detection
+TABLE_DETECTION_BATCH_SIZE = int(os.environ.get('TABLE_DETECTION_BATCH_SIZE', 4))
+# If set, the page images of the table detection are saved in this directory (only for debugging)
+TABLE_DETECTION_DEBUG_DIRECTORY = os.environ.get('TABLE_DETECTION_DEBUG_DIRECTORY')
+
+# The table regions are proposed by rules (text layer and ruling lines) first, the table detection model is
+# only used for the pages on which the rules are not confident enough
+TABLE_RULES_ENABLED = os.environ.get('TABLE_RULES_ENABLED', 'true').lower() in ('true', '1', 'yes')
+TABLE_RULES_MIN_CONFIDENCE = float(os.environ.get('TABLE_RULES_MIN_CONFIDENCE', 0.8))
+TABLE_RULES_MIN_ROWS = int(os.environ.get('TABLE_RULES_MIN_ROWS', 3))
+
+# The number of threads torch uses in every worker on the CPU (by default the cores are divided between the workers)
+TORCH_NUM_THREADS = int(os.environ.get('TORCH_NUM_THREADS', max(1, (os.cpu_count() or 1) // max(1, EXTRACTION_WORKERS))))
+TORCH_NUM_INTEROP_THREADS = int(os.environ.get('TORCH_NUM_INTEROP_THREADS', 1))
+# Quantizes the linear layers of the table detection model dynamically to int8 (only on the CPU)
+TABLE_MODEL_QUANTIZE = os.environ.get('TABLE_MODEL_QUANTIZE', 'false').lower() in ('true', '1', 'yes')
+
 TABLE_MODEL_CATEGORIES = {
               0: 'Bordered_Table',
               1: 'Cell',
@@ -1,28 +1,137 @@
-import torch
-from mmdet.apis import init_detector, inference_detector
-
-
 import app.core.config as config
 import numpy as np
+import fitz
+import os
+import resource
+import threading
+import time
+from typing import Iterable, List
+
+
+class TableDetectionModelManager:
+    """
+    Holds the table detection model of a process. Torch, mmdet and the model are only loaded
+    on the first use or with warm_up, so importing the extraction does not load them.
+    The time (in seconds) and the memory (increase of the max. resident size in bytes) needed
+    to load the model are saved in load_time and memory_usage.
+    """
+
+    def __init__(self, enabled: bool = config.TABLE_DETECTION_ENABLED):
+        self.enabled: bool = enabled
+        self.load_time: float = None
+        self.memory_usage: int = None
+        self._model = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self):
+        """ Returns the model, the model is loaded if it was not used before. """
+        if not self.enabled:
+            raise RuntimeError("The table detection is disabled (TABLE_DETECTION_ENABLED).")
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._load()
+        return self._model
 
+    def warm_up(self) -> None:
+        """ Loads the model in advance, if the table detection is enabled. """
+        if self.enabled:
+            self.get()
 
-def load_table_detection_model():
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self._model = load_table_detection_model()
+        self.load_time = time.perf_counter() - start
+        # ru_maxrss is given in kilobytes
+        self.memory_usage = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - max_rss) * 1024
+
+
+TABLE_DETECTION_MODELS: TableDetectionModelManager = TableDetectionModelManager()
+
+
+def load_table_detection_model(quantize: bool = config.TABLE_MODEL_QUANTIZE):
     """ Loads the detection model """
+    import torch
+    from mmdet.apis import init_detector
+
     if torch.cuda.is_available():
         print("gpu_mode")
         model = init_detector(config.TABLE_MODEL_CONFIG, config.TABLE_MODEL_GPU, device='cuda:0')
     else:
         print("cpu_mode")
-        model = init_detector(config.TABLE_MODEL_CONFIG, config.TABLE_MODEL_GPU, device='cpu', cfg_options={"map_location":'cpu'})
+        configure_cpu_threads()
+        # init_detector maps the checkpoint to the cpu, the gpu checkpoint is only used if there is no cpu checkpoint
+        checkpoint = config.TABLE_MODEL_CPU if os.path.exists(config.TABLE_MODEL_CPU) else config.TABLE_MODEL_GPU
+        model = init_detector(config.TABLE_MODEL_CONFIG, checkpoint, device='cpu')
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
     return model
 
 
-def predict_table_boundaries(model, img_path: str):
-    """ Predicts the boundaries of a file. """
-    result = inference_detector(model, img_path)
+def configure_cpu_threads(num_threads: int = config.TORCH_NUM_THREADS,
+                          num_interop_threads: int = config.TORCH_NUM_INTEROP_THREADS) -> None:
+    """ Limits the threads of torch, so several workers on a node do not oversubscribe the cores. """
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(num_interop_threads)
+    except RuntimeError:
+        # The inter-op threads can only be set once and before any inter-op work has started
+        pass
+
+
+def inference_mode():
+    """ Returns the context for the inference (torch.inference_mode, or torch.no_grad for older versions). """
+    import torch
+
+    if hasattr(torch, 'inference_mode'):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def render_page(page, dpi: int = config.TABLE_DETECTION_DPI) -> np.ndarray:
+    """ Renders a page as an image (BGR like an image loaded by mmcv) without using the file system. """
+    zoom = dpi / 72
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if config.TABLE_DETECTION_DEBUG_DIRECTORY is not None:
+        pix.writePNG(os.path.join(config.TABLE_DETECTION_DEBUG_DIRECTORY,
+                                  f"{os.getpid()}_{id(page)}_{page.number}.png"))
+    return np.ascontiguousarray(img[:, :, 2::-1])
+
+
+def predict_table_boundaries(model, img):
+    """ Predicts the boundaries of an image (a path or the image as an array). """
+    from mmdet.apis import inference_detector
+
+    with inference_mode():
+        result = inference_detector(model, img)
     return result
 
 
+def predict_table_boundaries_in_batches(model, imgs: Iterable, batch_size: int = config.TABLE_DETECTION_BATCH_SIZE) -> List:
+    """ Predicts the boundaries of several images. The images are passed in batches to the model,
+    the results are returned in the order of the images. """
+    from mmdet.apis import inference_detector
+
+    results = []
+    batch = []
+    with inference_mode():
+        for img in imgs:
+            batch.append(img)
+            if len(batch) == batch_size:
+                results.extend(inference_detector(model, batch))
+                batch = []
+        if len(batch) > 0:
+            results.extend(inference_detector(model, batch))
+    return results
+
+
 def get_bbox_class_tuple(result, img_path):
     """ Extracts the Coordinates and the class of the bbox. """
     if isinstance(result, tuple):
@@ -46,18 +155,20 @@ def get_bbox_class_tuple(result, img_path):
     return zip(x1, y1, x2, y2, scores, labels)
 
 
-def in_json(results, img, page):
-    """ Saves the output of the prediction as a dict. """
+def in_json(results, img, page, dpi: int = 72):
+    """ Saves the output of the prediction as a dict.
+    The coordinates are converted from the image (rendered with the dpi) to the coordinates of the page. """
     res = []
+    zoom = dpi / 72
 
     for x1, y1, x2, y2, score, label in get_bbox_class_tuple(results, img):
         if score > 0.9:
             res.append({
                 'page': page,
-                'x1': int(x1),
-                'y1': int(y1),
-                'x2': int(x2),
-                'y2': int(y2),
+                'x1': int(x1 / zoom),
+                'y1': int(y1 / zoom),
+                'x2': int(x2 / zoom),
+                'y2': int(y2 / zoom),
                 'score': float(score),
                 'class': config.TABLE_MODEL_CATEGORIES[label]
             })
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import app.core.config as config
+from app.core.detection_models.text_detection import are_grammatically_sentences
+from app.core.extraction_modul.datamodels.internal_models import Span
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+
+class RuleRow:
+    """ The lines of the text layer with (nearly) the same vertical position. """
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float):
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+        # The spans of the row as (x1, x2, text)
+        self.spans: List[Tuple[float, float, str]] = []
+        self.cells: List[Tuple[float, float, str]] = []
+
+    def add(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        self.x1, self.y1 = min(self.x1, x1), min(self.y1, y1)
+        self.x2, self.y2 = max(self.x2, x2), max(self.y2, y2)
+
+    def is_in_row(self, y1: float, y2: float) -> bool:
+        """ A line belongs to the row if its vertical center is inside the row. """
+        return self.y1 <= (y1 + y2) / 2 <= self.y2
+
+    def set_cells(self, width_of_space: float) -> None:
+        """ Merges the spans that are separated by a normal space into cells (like Row.identify_spans). """
+        cells = []
+        for x1, x2, text in sorted(self.spans):
+            if cells and x1 - cells[-1][1] <= width_of_space * 1.25:
+                prev_x1, prev_x2, prev_text = cells[-1]
+                cells[-1] = (prev_x1, max(prev_x2, x2), prev_text + text)
+            else:
+                cells.append((x1, x2, text))
+        self.cells = cells
+
+    def get_text(self) -> str:
+        return " ".join([text for _, _, text in self.cells])
+
+
+class TableRegionProposer:
+    """
+    Proposes the regions of tables from the text layer and the vector drawings of a page, without
+    rendering the page or using the table detection model.
+
+    A region starts directly below a table caption and contains the following rows with several cells
+    (the rules of Table.check_rulebased_table: a row is no sentence and has a similar number of cells
+    as the other rows). The confidence of a region is a weighted sum of
+        - the share of the rows that follow the rules,
+        - the share of the rows with the most common number of cells,
+        - the horizontal ruling lines (e.g. the top, mid and bottom rules) spanning the region and
+        - the distance between the caption and the first row.
+    A table without ruling lines does not reach the default min. confidence, so these pages are
+    passed to the table detection model.
+    """
+
+    WEIGHT_OF_RULES = 0.4
+    WEIGHT_OF_CONSISTENCY = 0.2
+    WEIGHT_OF_RULING_LINES = 0.25
+    WEIGHT_OF_CAPTION = 0.15
+    # The max. thickness of a drawing to be a ruling line
+    MAX_THICKNESS = 2
+
+    def __init__(self, min_confidence: float = config.TABLE_RULES_MIN_CONFIDENCE,
+                 min_rows: int = config.TABLE_RULES_MIN_ROWS):
+        self.min_confidence: float = min_confidence
+        self.min_rows: int = min_rows
+
+    def propose(self, page: Any, descriptions: List[Any], textBlocks: List[Any], layout: Any) -> List[Dict]:
+        """ Returns a region (in the format of the table detection) for every table caption of the page,
+        the confidence of the region is saved as score. """
+        lines = self.get_lines(descriptions, textBlocks)
+        horizontal_lines, vertical_lines = self.get_ruling_lines(page)
+
+        res = []
+        for description in descriptions:
+            x1, x2 = self.get_column(description, page.rect.x0, page.rect.x1)
+            rows = self.get_rows([spans for spans in lines
+                                  if x1 <= (spans[0].bbox[0] + spans[-1].bbox[2]) / 2 <= x2], layout)
+            region = self.propose_region(description, rows, horizontal_lines, vertical_lines)
+            if region is not None:
+                region['page'] = description.pageNum
+                res.append(region)
+        return res
+
+    def is_confident(self, proposals: List[Dict], descriptions: List[Any]) -> bool:
+        """ Checks if a confident region was found for every table caption of a page. """
+        confident = [_ for _ in proposals if _['score'] >= self.min_confidence]
+        return len(descriptions) > 0 and len(confident) == len(descriptions)
+
+    @staticmethod
+    def get_column(description: Any, x1: float, x2: float) -> (float, float):
+        """ Returns the horizontal area of the table: the whole page if the caption is centered on the page
+        or spans the most of it, otherwise the half of the page with the caption (e.g. in a two-column layout). """
+        center, width = (x1 + x2) / 2, x2 - x1
+        center_of_caption = (description.posX1 + description.posX2) / 2
+        if abs(center_of_caption - center) <= 0.1 * width or description.posX2 - description.posX1 >= 0.5 * width:
+            return x1, x2
+        return (x1, center) if center_of_caption < center else (center, x2)
+
+    @staticmethod
+    def get_lines(descriptions: List[Any], textBlocks: List[Any]) -> List[List[Span]]:
+        """ Returns the (non-empty) spans of every horizontal line of the text blocks except the captions. """
+        lines = []
+        ids_of_descriptions = set([id(description) for description in descriptions])
+        for textBlock in textBlocks:
+            if id(textBlock) in ids_of_descriptions:
+                continue
+            for line in textBlock.lines:
+                if abs(line.dir[0] - 1) > 0.01:
+                    continue
+                spans = [span for span in line.spans if span.text.strip()]
+                if spans:
+                    lines.append(spans)
+        return lines
+
+    @staticmethod
+    def get_rows(lines: List[List[Span]], layout: Any) -> List[RuleRow]:
+        """ Groups the lines into rows (from top to bottom). """
+        rows: List[RuleRow] = []
+        for spans in sorted(lines, key=lambda spans: min([span.bbox[1] for span in spans])):
+            x1 = min([span.bbox[0] for span in spans])
+            y1 = min([span.bbox[1] for span in spans])
+            x2 = max([span.bbox[2] for span in spans])
+            y2 = max([span.bbox[3] for span in spans])
+            if not rows or not rows[-1].is_in_row(y1, y2):
+                rows.append(RuleRow(x1, y1, x2, y2))
+            rows[-1].add(x1, y1, x2, y2)
+            rows[-1].spans.extend([(span.bbox[0], span.bbox[2], span.text) for span in spans])
+
+        for row in rows:
+            row.set_cells(layout.width_of_space)
+        return rows
+
+    def get_ruling_lines(self, page: Any) -> (List[Tuple], List[Tuple]):
+        """ Returns the horizontal and the vertical lines (x1, y1, x2, y2) of the vector drawings of a page. """
+        horizontal_lines, vertical_lines = [], []
+        for drawing in page.get_drawings():
+            for item in drawing['items']:
+                if item[0] == 'l':
+                    x1, y1, x2, y2 = min(item[1].x, item[2].x), min(item[1].y, item[2].y), \
+                                     max(item[1].x, item[2].x), max(item[1].y, item[2].y)
+                elif item[0] == 're':
+                    x1, y1, x2, y2 = item[1].x0, item[1].y0, item[1].x1, item[1].y1
+                else:
+                    continue
+                if y2 - y1 <= self.MAX_THICKNESS < x2 - x1:
+                    horizontal_lines.append((x1, y1, x2, y2))
+                elif x2 - x1 <= self.MAX_THICKNESS < y2 - y1:
+                    vertical_lines.append((x1, y1, x2, y2))
+        return self.merge_lines(horizontal_lines, 0), self.merge_lines(vertical_lines, 1)
+
+    def merge_lines(self, lines: List[Tuple], orientation: int) -> List[Tuple]:
+        """ Merges the touching segments of a line (e.g. a rule drawn separately for every cell).
+        The orientation is 0 for horizontal and 1 for vertical lines. """
+        if orientation == 1:
+            lines = [(y1, x1, y2, x2) for x1, y1, x2, y2 in lines]
+        res = []
+        # Sorted by the position of the line and then by the start of the segment
+        for x1, y1, x2, y2 in sorted(lines, key=lambda line: (round(line[1]), line[0])):
+            if res and abs(res[-1][1] - y1) <= 1 and x1 - res[-1][2] <= self.MAX_THICKNESS:
+                prev_x1, prev_y1, prev_x2, prev_y2 = res[-1]
+                res[-1] = (prev_x1, min(prev_y1, y1), max(prev_x2, x2), max(prev_y2, y2))
+            else:
+                res.append((x1, y1, x2, y2))
+        if orientation == 1:
+            res = [(x1, y1, x2, y2) for y1, x1, y2, x2 in res]
+        return res
+
+    def propose_region(self, description: Any, rows: List[RuleRow], horizontal_lines: List[Tuple],
+                       vertical_lines: List[Tuple]) -> Dict:
+        """ Collects the rows of the table below the caption and calculates the confidence of the region. """
+        table_rows = self.get_rows_below_caption(description, rows)
+        if len(table_rows) == 0:
+            return None
+
+        x1, x2 = min([row.x1 for row in table_rows]), max([row.x2 for row in table_rows])
+        y1, y2 = table_rows[0].y1, table_rows[-1].y2
+        height_of_row = sum([row.y2 - row.y1 for row in table_rows]) / len(table_rows)
+
+        # The ruling lines spanning at least the half of the region (including the rules directly above and below)
+        ruling_lines = [line for line in horizontal_lines
+                        if min(line[2], x2) - max(line[0], x1) >= 0.5 * (x2 - x1)
+                        and y1 - height_of_row <= line[1] <= y2 + height_of_row]
+        borders = [line for line in vertical_lines
+                   if x1 - height_of_row <= line[0] <= x2 + height_of_row
+                   and min(line[3], y2) - max(line[1], y1) >= 0.5 * (y2 - y1)]
+        for line in ruling_lines + borders:
+            x1, y1, x2, y2 = min(x1, line[0]), min(y1, line[1]), max(x2, line[2]), max(y2, line[3])
+
+        confidence = 0.0
+        if len(table_rows) >= self.min_rows:
+            number_of_cells = [len(row.cells) for row in table_rows]
+            average_number_of_cells = sum(number_of_cells) / len(number_of_cells)
+            are_sentences = are_grammatically_sentences([row.get_text() for row in table_rows])
+            rows_following_rules = [not is_sentence and len(row.cells) > 1
+                                    and 0.5 * average_number_of_cells <= len(row.cells) < 2 * average_number_of_cells
+                                    for row, is_sentence in zip(table_rows, are_sentences)]
+            most_common_number_of_cells = Counter(number_of_cells).most_common(1)[0][1]
+            caption_gap = table_rows[0].y1 - description.posY2
+
+            confidence += self.WEIGHT_OF_RULES * sum(rows_following_rules) / len(table_rows)
+            confidence += self.WEIGHT_OF_CONSISTENCY * most_common_number_of_cells / len(table_rows)
+            confidence += self.WEIGHT_OF_RULING_LINES * min(1.0, len(ruling_lines) / 2)
+            confidence += self.WEIGHT_OF_CAPTION * (1.0 if caption_gap <= 2 * height_of_row else 0.0)
+
+        return {
+            'x1': int(x1),
+            'y1': int(y1),
+            'x2': int(x2) + 1,
+            'y2': int(y2) + 1,
+            'score': round(confidence, 4),
+            'class': config.TABLE_MODEL_CATEGORIES[0 if len(borders) > 0 else 2]
+        }
+
+    def get_rows_below_caption(self, description: Any, rows: List[RuleRow]) -> List[RuleRow]:
+        """ Returns the rows with several cells directly below the caption.
+        A single row with one cell (e.g. a multi-line cell) is kept if it is followed by a row with several cells. """
+        column = [row for row in rows if row.y1 >= description.posY2 - 1]
+
+        table_rows: List[RuleRow] = []
+        prev_y2 = description.posY2
+        for num, row in enumerate(column):
+            if table_rows:
+                height_of_row = sum([_.y2 - _.y1 for _ in table_rows]) / len(table_rows)
+            else:
+                height_of_row = row.y2 - row.y1
+            if row.y1 - prev_y2 > 2 * height_of_row:
+                break
+            if row.get_text().lstrip().lower().startswith(("tab", "fig")):
+                break
+            if len(row.cells) <= 1:
+                is_followed_by_row = num + 1 < len(column) and len(column[num + 1].cells) > 1
+                if not table_rows or not is_followed_by_row:
+                    break
+            table_rows.append(row)
+            prev_y2 = row.y2
+        return table_rows
+
+
+TABLE_REGION_PROPOSER = TableRegionProposer()
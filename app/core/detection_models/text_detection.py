@@ -1,39 +1,192 @@
 import re
+import threading
+import time
 from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 
 import spacy
+from spacy.language import Language
+
+from app.core.config import SPACY_MODEL, SPACY_BATCH_SIZE, SPACY_N_PROCESS
+
+# is_grammatically_sentence and get_type_frequency only need the POS-Tags (tagger, attribute_ruler)
+# and the dependencies (parser), so the other components are not loaded.
+EXCLUDED_COMPONENTS: List[str] = ["ner", "lemmatizer"]
+
+
+class NLPModelRegistry:
+    """
+    Holds the spaCy models of a process. Each model is loaded only once, either on the first
+    use or with warm_up (e.g. at the startup of a worker). The time needed to load a model
+    is saved in load_times (in seconds).
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Language] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+
+    def get(self, name: str = SPACY_MODEL) -> Language:
+        """ Returns the model, the model is loaded if it was not used before. """
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._load(name)
+        return model
+
+    def warm_up(self, name: str = SPACY_MODEL) -> None:
+        """ Loads the model in advance. """
+        self.get(name)
+
+    def is_loaded(self, name: str = SPACY_MODEL) -> bool:
+        return name in self._models
+
+    def _load(self, name: str) -> Language:
+        start = time.perf_counter()
+        model = spacy.load(name, exclude=EXCLUDED_COMPONENTS)
+        self.load_times[name] = time.perf_counter() - start
+        self._models[name] = model
+        return model
+
+
+NLP_MODELS: NLPModelRegistry = NLPModelRegistry()
+
 
 def initalize_pos_model(state=False):
-    global MODEL_SPACY
+    """ Loads the model of the process in advance. The model is only loaded once. """
     if state:
-        MODEL_SPACY = spacy.load("en_core_web_sm")
+        NLP_MODELS.warm_up()
 
 
-def is_grammatically_sentence(sentence, verbs=1, nouns=2) -> bool:
-    # From a Dependency-POV a sentence consists at least from a ROOT a Subj and a Obj.
-    # From a Gramatical-POV a sentence consists at least from a Verb and two Nouns (one for the Obj, and one for the Obj).
+def _normalize_sentence(sentence: str) -> str:
     sentence = sentence.lstrip()
     sentence = sentence.rstrip()
-    sentence = re.sub(" +", " ", sentence)
-    if len(sentence) < 1: return False
-    try:
-        for token in MODEL_SPACY(sentence):
-            if token.pos_ in ["VERB", "AUX"] and token.dep_ == "ROOT": verbs -= 1
-            if token.pos_ in ["NOUN", "PROPN", "PRON"] and token.dep_ in ["nsubj", "csubj", "nsubjpass"]: nouns -= 1
-            if token.pos_ in ["NOUN", "PROPN", "PRON"] and token.dep_ in ["dobj", "pobj"]: nouns -= 1
-    except UnicodeEncodeError:
-        return False
+    return re.sub(" +", " ", sentence)
+
+
+def _is_grammatically_doc(doc, verbs: int, nouns: int) -> bool:
+    # From a Dependency-POV a sentence consists at least from a ROOT a Subj and a Obj.
+    # From a Gramatical-POV a sentence consists at least from a Verb and two Nouns (one for the Obj, and one for the Obj).
+    for token in doc:
+        if token.pos_ in ["VERB", "AUX"] and token.dep_ == "ROOT": verbs -= 1
+        if token.pos_ in ["NOUN", "PROPN", "PRON"] and token.dep_ in ["nsubj", "csubj", "nsubjpass"]: nouns -= 1
+        if token.pos_ in ["NOUN", "PROPN", "PRON"] and token.dep_ in ["dobj", "pobj"]: nouns -= 1
     if verbs < 1 and nouns < 1:
         return True
     else:
         return False
 
 
+# The results of are_grammatically_sentences by (normalized sentence, verbs, nouns)
+SENTENCE_CACHE: Dict[Tuple[str, int, int], bool] = {}
+MAX_CACHED_SENTENCES: int = 100000
+
+
+def are_grammatically_sentences(sentences: List[str], verbs=1, nouns=2, batch_size: int = SPACY_BATCH_SIZE,
+                                n_process: int = SPACY_N_PROCESS) -> List[bool]:
+    """ Checks for every sentence if it is a grammatically sentence (see is_grammatically_sentence).
+    The sentences that were not checked before are processed together with nlp.pipe. """
+    normalized = [_normalize_sentence(sentence) for sentence in sentences]
+    # The results of this call (the cache may be cleared below)
+    found: Dict[str, bool] = {}
+    missing = []
+    for sentence in dict.fromkeys(normalized):
+        if len(sentence) == 0:
+            continue
+        if (sentence, verbs, nouns) in SENTENCE_CACHE:
+            found[sentence] = SENTENCE_CACHE[(sentence, verbs, nouns)]
+        else:
+            missing.append(sentence)
+    if len(missing) > 0:
+        nlp = NLP_MODELS.get()
+        try:
+            results = [_is_grammatically_doc(doc, verbs, nouns)
+                       for doc in nlp.pipe(missing, batch_size=batch_size, n_process=n_process)]
+        except UnicodeEncodeError:
+            # Check the sentences one by one, so only the broken sentences are rejected
+            results = []
+            for sentence in missing:
+                try:
+                    results.append(_is_grammatically_doc(nlp(sentence), verbs, nouns))
+                except UnicodeEncodeError:
+                    results.append(False)
+        if len(SENTENCE_CACHE) + len(missing) > MAX_CACHED_SENTENCES:
+            SENTENCE_CACHE.clear()
+        for sentence, result in zip(missing, results):
+            found[sentence] = result
+            SENTENCE_CACHE[(sentence, verbs, nouns)] = result
+
+    return [found.get(sentence, False) for sentence in normalized]
+
+
+def is_grammatically_sentence(sentence, verbs=1, nouns=2) -> bool:
+    return are_grammatically_sentences([sentence], verbs, nouns)[0]
+
+
+# The results of get_type_frequencies by the text of a cell
+TYPE_FREQUENCY_CACHE: Dict[str, Tuple[int, List[Tuple[str, int]]]] = {}
+MAX_CACHED_CELLS: int = 100000
+
+# Tokens that are numbers without a doubt (e.g. 12, -3.5, 1,000, 45%)
+NUMBER_PATTERN = re.compile(r"^[+\-−]?\d+([.,]\d+)*%?$")
+# Tokens consisting of letters, that can be tagged as numbers (number words and roman numerals)
+NUMBER_WORDS = {"one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+                "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen", "twenty",
+                "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "hundred", "thousand",
+                "million", "billion", "dozen", "zero"}
+ROMAN_NUMERAL_PATTERN = re.compile(r"^[IVXLCDM]+$")
+
+
+def get_type_frequencies(texts: List[str], batch_size: int = SPACY_BATCH_SIZE) -> List[Tuple[int, List[Tuple[str, int]]]]:
+    """ Returns for every text the number of words and the frequency of the types (NUM, WORD, UNKNOWN) of the words.
+    The texts are only tokenized, the type of a word is found by its text if possible. Only the texts with
+    ambiguous words are tagged by spaCy (together with nlp.pipe). The results are cached by the text. """
+    # The results of this call (the cache may be cleared below)
+    found: Dict[str, Tuple[int, List[Tuple[str, int]]]] = {}
+    missing = []
+    for text in dict.fromkeys(texts):
+        if text in TYPE_FREQUENCY_CACHE:
+            found[text] = TYPE_FREQUENCY_CACHE[text]
+        else:
+            missing.append(text)
+    if len(missing) > 0:
+        nlp = NLP_MODELS.get()
+        ambiguous_texts = []
+        for text in missing:
+            tokens = [token.text for token in nlp.tokenizer(text)]
+            types = [_get_token_type_by_text(token) for token in tokens]
+            if None in types:
+                ambiguous_texts.append(text)
+            else:
+                found[text] = _count_types(types)
+
+        try:
+            for text, doc in zip(ambiguous_texts, nlp.pipe(ambiguous_texts, batch_size=batch_size)):
+                found[text] = _count_types([_get_token_type(token) for token in doc])
+        except UnicodeEncodeError:
+            for text in ambiguous_texts:
+                if text not in found:
+                    found[text] = _get_type_frequency_with_spacy(nlp, text)
+
+        if len(TYPE_FREQUENCY_CACHE) + len(missing) > MAX_CACHED_CELLS:
+            TYPE_FREQUENCY_CACHE.clear()
+        for text in missing:
+            TYPE_FREQUENCY_CACHE[text] = found[text]
+
+    return [found[text] for text in texts]
+
+
 def get_type_frequency(text):
+    return get_type_frequencies([text])[0]
+
+
+def _get_type_frequency_with_spacy(nlp, text):
     numberOfWords = 0
     typesOfWord = defaultdict(int)
     try:
-        for num, token in enumerate(MODEL_SPACY(text)):
+        for num, token in enumerate(nlp(text)):
             tokenType = _get_token_type(token)
             typesOfWord[tokenType] += 1
             numberOfWords = num
@@ -44,10 +197,32 @@ def get_type_frequency(text):
     typesOfWord.sort(key=lambda x: x[1], reverse=True)
     return numberOfWords, typesOfWord
 
+
+def _count_types(types: List[str]) -> Tuple[int, List[Tuple[str, int]]]:
+    numberOfWords = max(len(types) - 1, 0)
+    typesOfWord = defaultdict(int)
+    for tokenType in types:
+        typesOfWord[tokenType] += 1
+    typesOfWord = [(typ, count) for typ, count in typesOfWord.items()]
+    typesOfWord.sort(key=lambda x: x[1], reverse=True)
+    return numberOfWords, typesOfWord
+
+
+def _get_token_type_by_text(text: str) -> Optional[str]:
+    """ Returns the type of a token only by its text, or None if the POS-Tag is needed. """
+    if text in ['N/A', '-', ' - ', '/', "."] or len(text) < 3:
+        return "UNKNOWN"
+    if NUMBER_PATTERN.match(text):
+        return "NUM"
+    if text.isalpha() and text.lower() not in NUMBER_WORDS and not ROMAN_NUMERAL_PATTERN.match(text):
+        return "WORD"
+    return None
+
+
 def _get_token_type(token):
     if token.text in ['N/A', '-', ' - ', '/', "."] or len(token.text) < 3:
         return "UNKNOWN"
     if token.pos_ == "NUM":
         return "NUM"
     else:
-        return "WORD"
\ No newline at end of file
+        return "WORD"
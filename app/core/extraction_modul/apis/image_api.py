@@ -3,7 +3,9 @@ from ..extraction_model import PDF_Extraction
 from app.core.config import IMAGE_DIRECTORY
 from ..datamodels.image_models import Image
 from ..datamodels.internal_models import TextBlock
+from ...detection_models.text_detection import are_grammatically_sentences
 from typing import List
+from segtok.segmenter import split_single
 class ImageStrategy(TransformationStrategy):
     ''' An Agent performing all necessary tasks for the extraction and transformation of the image_file. '''
 
@@ -17,7 +19,7 @@ class ImageStrategy(TransformationStrategy):
         image_descriptions = self.identify_image_descriptions(data)
 
         for imageBlock in image_descriptions:
-            image = Image(imageBlock)
+            image = Image(imageBlock, data.layout)
             data.images.append(image)
 
         self.identify_surrounding_text_blocks(data)
@@ -40,6 +42,9 @@ class ImageStrategy(TransformationStrategy):
         :return:
         '''
         res = []
+        # Checks the sentences of all descriptions at once, the single images will use the cached results.
+        are_grammatically_sentences([sentence for image in data.images
+                                     for sentence in split_single(image.descriptionText)])
         for image in data.images:
             image.checkIsImage()
             if image.is_image:
@@ -48,7 +53,7 @@ class ImageStrategy(TransformationStrategy):
 
     def identify_coordinates_for_images(self, data: PDF_Extraction)-> None:
         for image in data.images:
-            image.setCoordinatesOfPicture()
+            image.setCoordinatesOfPicture(data.spatial_index)
 
     def identify_surrounding_text_blocks(self, data: PDF_Extraction) -> None:
         '''
@@ -56,9 +61,7 @@ class ImageStrategy(TransformationStrategy):
         :return:
         '''
 
-        def is_centered(textBlock, other_textBlocks):
-            textBlocks = [_ for _ in other_textBlocks if _.isPartOfText]
-            centers = [_.posX1 + (_.posX2 - _.posX1) / 2 for _ in textBlocks]
+        def is_centered(textBlock, centers):
             center_tBlock = textBlock.posX1 + (textBlock.posX2 - textBlock.posX1) / 2
             for center in centers:
                 if center * 0.9 <= center_tBlock <= center * 1.1:
@@ -66,8 +69,11 @@ class ImageStrategy(TransformationStrategy):
             return True
 
 
+        # The centers of the textblocks of the text, they are the same for every image
+        centers = [_.posX1 + (_.posX2 - _.posX1) / 2 for _ in data.textBlocks if _.isPartOfText]
+
         for image in data.images:
-            textBlocks = [_ for _ in data.textBlocks if _.pageNum == image.pageNum]
+            textBlocks = data.spatial_index.get_page(image.pageNum)
             textBlock = None
 
             for tBlock in textBlocks:
@@ -76,7 +82,7 @@ class ImageStrategy(TransformationStrategy):
 
             textBlocks.remove(textBlock)
 
-            is_in_center: bool = is_centered(textBlock, data.textBlocks)
+            is_in_center: bool = is_centered(textBlock, centers)
 
             if is_in_center:
                 image.set_upper_and_lower(textBlock, textBlocks)
@@ -80,8 +80,8 @@ class MetadataStrategy(TransformationStrategy):
 
         for idx_, textBlock in enumerate(textBlocks):
             first_page: bool = textBlock.pageNum < 2
-            has_normal_font: bool = textBlock.get_font() == TextBlock.FONTS[0][0]
-            has_normal_size: bool = TextBlock.SIZES[0][0] - 1 <= textBlock.get_size() <= TextBlock.SIZES[0][0] + 1
+            has_normal_font: bool = textBlock.get_font() == data.layout.fonts[0][0]
+            has_normal_size: bool = data.layout.sizes[0][0] - 1 <= textBlock.get_size() <= data.layout.sizes[0][0] + 1
             is_long: bool = len(textBlock.text) > 80  # the textBlock contains at least 50 chars
             other_metadata: bool = textBlock.isPartOfMeta
 
@@ -128,7 +128,7 @@ class MetadataStrategy(TransformationStrategy):
                         previousLine) -> bool:
         only_chapter_name: bool = "abstract" == previousLine.textInLine.lower().rstrip().lstrip()
         normalDistanceBetweenPoints: bool = linePosY1 - previousLinePosY2 <= \
-                                            textBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES * 1.25
+                                            textBlock.layout.distance_between_lines * 1.25
         sameFont: bool = any([True for font in line.fontsInLine if font in previousFonts])
         sameFontSize: bool = any([True for fontSize in line.fontSizesInLine if fontSize in previousFontSizes])
 
@@ -1,14 +1,15 @@
 from ._base_api_ import TransformationStrategy
 from ..extraction_model import PDF_Extraction
-from app.core.detection_models.table_detection import load_table_detection_model, predict_table_boundaries, in_json
+from app.core.detection_models.table_detection import TABLE_DETECTION_MODELS, predict_table_boundaries, in_json, \
+    render_page, predict_table_boundaries_in_batches
+from app.core.detection_models.table_rules import TABLE_REGION_PROPOSER
 from app.core.extraction_modul.datamodels.table_models import Table, Row, Column
-from app.core.config import TMP_DIRECTORY
-import os
-import fitz
+from app.core.config import TABLE_DETECTION_DPI, TABLE_DETECTION_BATCH_SIZE, TABLE_RULES_ENABLED
+from typing import Dict, List, Optional
+import numpy as np
 
 class TableStrategy(TransformationStrategy):
     """ An Agent performing all necessary tasks for the extraction and transformation of the table. """
-    TABLE_DETECTION_MODEL = load_table_detection_model()
     def __init__(self):
         super().__init__()
 
@@ -21,24 +22,24 @@ class TableStrategy(TransformationStrategy):
 
     def process_data(self, data: PDF_Extraction) -> None:
         """ Processes the found tables. """
+        if not TABLE_DETECTION_MODELS.enabled:
+            data.tables = []
+            return
+
         # Get the relevant pages
         pages = list(set([textBlock.pageNum for textBlock in data.tableDescriptions]))
 
         # Identify the boundaries of the tables
-        boundaries = []
-        for page in pages:
-            path = self.page_as_image(data, page)
-
-            boundaries.extend(self.get_boundaries(TableStrategy.TABLE_DETECTION_MODEL,
-                                                  path,
-                                                  page))
+        boundaries = self.get_boundaries_of_documents([data])[0]
 
 
         data.tables = Table.from_boundaries(boundaries,
                                             data.textBlocks,
                                             data.tableDescriptions,
                                             pages,
-                                            data.document)
+                                            data.document,
+                                            data.layout,
+                                            data.spatial_index)
 
     def identify_table_descriptions(self, data: PDF_Extraction):
         for textBlock in data.textBlocks:
@@ -47,18 +48,49 @@ class TableStrategy(TransformationStrategy):
             if text.startswith("tab"):
                 data.tableDescriptions.append(textBlock)
 
-    def get_boundaries(self, model, path, page):
-        prediction_res = predict_table_boundaries(model, path)
-        return in_json(prediction_res, path, page)
-
-    def page_as_image(self, data: PDF_Extraction, page: fitz.Page):
-
-        path_to_image = os.path.join(TMP_DIRECTORY, f"tables/{page}.png")
-        doc = data.document
-        page = doc.load_page(page)
-        pix = page.get_pixmap()
-        pix.writePNG(path_to_image)
-        return path_to_image
+    def get_boundaries_of_documents(self, documents: List[PDF_Extraction],
+                                    batch_size: int = TABLE_DETECTION_BATCH_SIZE) -> List[List[Dict]]:
+        """ Identifies the boundaries of the tables on all pages with a table description.
+        The regions proposed by the rules are used if they are confident, the remaining pages of all documents
+        are passed in batches to the model. Returns the boundaries per document. """
+        boundaries_of_pages: Dict = {}
+        candidates = []
+        for num, data in enumerate(documents):
+            for page in sorted(set([textBlock.pageNum for textBlock in data.tableDescriptions])):
+                proposals = self.get_proposed_boundaries(data, page) if TABLE_RULES_ENABLED else None
+                if proposals is not None:
+                    boundaries_of_pages[(num, page)] = proposals
+                else:
+                    candidates.append((num, page))
+
+        if len(candidates) > 0:
+            # The pages are rendered one after another while the batches are filled
+            imgs = (self.page_as_image(documents[num], page) for num, page in candidates)
+            results = predict_table_boundaries_in_batches(TABLE_DETECTION_MODELS.get(), imgs, batch_size)
+            for (num, page), prediction_res in zip(candidates, results):
+                boundaries_of_pages[(num, page)] = in_json(prediction_res, None, page, TABLE_DETECTION_DPI)
+
+        boundaries = [[] for _ in documents]
+        for num, page in sorted(boundaries_of_pages.keys()):
+            boundaries[num].extend(boundaries_of_pages[(num, page)])
+        return boundaries
+
+    def get_proposed_boundaries(self, data: PDF_Extraction, page: int) -> Optional[List[Dict]]:
+        """ Returns the table regions of a page proposed by the rules or None if the rules are not confident. """
+        descriptions = [textBlock for textBlock in data.tableDescriptions if textBlock.pageNum == page]
+        proposals = TABLE_REGION_PROPOSER.propose(data.document.load_page(page), descriptions,
+                                                  data.spatial_index.get_page(page), data.layout)
+        if TABLE_REGION_PROPOSER.is_confident(proposals, descriptions):
+            return proposals
+        return None
+
+    def get_boundaries(self, model, img, page):
+        prediction_res = predict_table_boundaries(model, img)
+        return in_json(prediction_res, img, page, TABLE_DETECTION_DPI)
+
+    def page_as_image(self, data: PDF_Extraction, page: int) -> np.ndarray:
+        """ Renders the page in memory, so concurrent extractions do not share any files. """
+        return render_page(data.document.load_page(page), TABLE_DETECTION_DPI)
 
 
     def identify_table_headers(self, data: PDF_Extraction) -> None:
@@ -4,13 +4,13 @@ from ._base_api_ import TransformationStrategy
 from ..extraction_model import PDF_Extraction
 import copy
 from typing import List, Tuple
-from ...detection_models.text_detection import is_grammatically_sentence
+from ...detection_models.text_detection import are_grammatically_sentences
 from ..datamodels.text_models import Text, Header, Chapter
 from ..datamodels.internal_models import TextBlock
+from ..layout_statistics import LayoutContext
 from ..datamodels.table_models import Table
 from ..datamodels.image_models import Image
-from ...extraction_modul.apis.util_functions import is_metadata
-import json
+from ...extraction_modul.apis.util_functions import is_metadata, METADATA_MATCHER
 
 
 class TextStrategy(TransformationStrategy):
@@ -21,11 +21,7 @@ class TextStrategy(TransformationStrategy):
 
     def preprocess_data(self, data: PDF_Extraction) -> None:
         ''' Identifies text. '''
-        data.text = Text(data.textBlocks,
-                         TextBlock.NORMAL_WIDTH_OF_A_SPACE,
-                         TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES,
-                         TextBlock.SIZES,
-                         TextBlock.FONTS)
+        data.text = Text(data.textBlocks, data.layout)
 
         # Check Inconsistencies in Layout.
         self.identify_text_area(data)
@@ -49,7 +45,7 @@ class TextStrategy(TransformationStrategy):
         # Split the text in chapters, paragraphs, sentences
         chapters = self._split_text(data.text)
         chapters = self._remove_empty_chapters(chapters)
-        chapters = self._set_headers(chapters, data.text.headers)
+        chapters = self._set_headers(chapters, data.text.headers, data.layout)
 
         data.text.chapters = chapters
 
@@ -165,6 +161,7 @@ class TextStrategy(TransformationStrategy):
 
         most_common_font_sizes = text.get_most_common_text_sizes()
         most_common_font = text.get_most_common_fonts()
+        metadata = METADATA_MATCHER.classify([tBlock.text for tBlock in partOfTextTextBlocks])
         for _idx, tBlock in enumerate(partOfTextTextBlocks):
             # Formatbased rules
             # Checking the fontsize
@@ -173,7 +170,7 @@ class TextStrategy(TransformationStrategy):
 
             is_in_order: bool = most_common_text_positions[int((tBlock.posX1 - minX) / colum_length)]
             has_correct_width: bool = 0.95 <= int(tBlock.posX2 - tBlock.posX1) / int(normal_width) <= 1.05
-            is_metadata_: bool = is_metadata(tBlock.text)
+            is_metadata_: bool = metadata[_idx] is not None
 
             case_1: bool = (has_most_common_font or has_most_common_size) and has_correct_width and not is_metadata_
             case_2: bool = is_in_order and has_correct_width and not is_metadata_
@@ -187,16 +184,10 @@ class TextStrategy(TransformationStrategy):
         text.partOfTextTextBlocks = [_ for _ in tBlocks if _.isPartOfText]
 
     def is_meta_data(self, text: str):
-        with open(METADATA_PATTERNS, mode="rb") as read_file:
-            metadataPatterns = json.load(read_file)
-        for metaData, pattern in metadataPatterns.items():
-            res = re.findall(pattern, text.lower())
-            if res != []:
-                return True
-        return False
-
-    def _set_headers(self, chapters: List[Chapter], headers) -> List[Chapter]:
-        lineheight: int = TextBlock.SIZES[0][0]  # the most common height of a line
+        return is_metadata(text)
+
+    def _set_headers(self, chapters: List[Chapter], headers, layout: LayoutContext) -> List[Chapter]:
+        lineheight: int = layout.sizes[0][0]  # the most common height of a line
         headers = copy.copy(headers)
 
         # Look for the header that is next to a chapter
@@ -229,8 +220,8 @@ class TextStrategy(TransformationStrategy):
     def _remove_empty_chapters(self, chapters: List[Chapter]) -> List[Chapter]:
         """ Removes chapters that contain no full sentence. """
         chapters_to_remove = []
-        for chapter in chapters:
-            is_sentence: bool = is_grammatically_sentence(chapter.textInChapter)
+        are_sentences: List[bool] = are_grammatically_sentences([chapter.textInChapter for chapter in chapters])
+        for chapter, is_sentence in zip(chapters, are_sentences):
             if not is_sentence:
                 chapters_to_remove.append(chapter)
         for chapter in chapters_to_remove:
@@ -407,13 +398,15 @@ class TextStrategy(TransformationStrategy):
     def _delete_images(self, data: PDF_Extraction) -> None:
         """ Deletes/Deactivates the image_file information from the text"""
         images: List[Image] = data.images
+        textBlocksInText = set(id(textBlock) for textBlock in data.text.textBlocks)
         for image in images:
             if image.is_image:
                 for textBlock in image.textBlocksOfImage:
                     textBlock.isPartOfText = False
                 # If the textBlock is inside the image_file
-                for textBlock in data.text.textBlocks:
-                    if textBlock.pageNum == image.pageNum:
+                for textBlock in data.spatial_index.query_rect(image.pageNum, image.posX1, image.posY1,
+                                                               image.posX2, image.posY2):
+                    if id(textBlock) in textBlocksInText:
                         if image.posX1 < textBlock.posX1 < image.posX2 and image.posY1 < textBlock.posY1 < image.posY2:
                             textBlock.isPartOfText = False
                         if image.posX1 < textBlock.posX2 < image.posX2 and image.posY1 < textBlock.posY2 < image.posY2:
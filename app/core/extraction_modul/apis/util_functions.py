@@ -1,21 +1,82 @@
 from app.core.config import METADATA_PATTERNS
 from app.core.extraction_modul.datamodels.internal_models import TextBlock
-from typing import List
+from typing import List, Optional, Pattern, Tuple
 import json
+import os
 import re
+import threading
+import time
+
+
+class MetadataMatcher:
+    """
+    Checks if a text contains metadata (e.g. an email or a doi) as defined by the patterns in the
+    metadata pattern file. The patterns are compiled once into a single regex (one named group per
+    pattern). The file is checked for changes at most every RELOAD_INTERVAL seconds and reloaded
+    if it was modified.
+    """
+    RELOAD_INTERVAL = 1.0
+
+    def __init__(self, path: str = METADATA_PATTERNS):
+        self.path: str = path
+        # The compiled regex and the names of its patterns (replaced together on a reload)
+        self._patterns: Tuple[Pattern, List[str]] = None
+        self._modified: float = None
+        self._last_check: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return self._get_regex()[1]
+
+    def match(self, text: str) -> Optional[str]:
+        """ Returns the name of the pattern that matched the text, or None if the text is no metadata. """
+        regex, names = self._get_regex()
+        res = regex.search(text.lower())
+        if res is None:
+            return None
+        for num, name in enumerate(names):
+            if res.group(f"pattern{num}") is not None:
+                return name
+
+    def classify(self, texts: List[str]) -> List[Optional[str]]:
+        """ Returns for every text the name of the pattern that matched (or None). """
+        return [self.match(text) for text in texts]
+
+    def _get_regex(self) -> Tuple[Pattern, List[str]]:
+        """ Returns the regex and the names of its patterns, reloaded if the file was modified.
+        If the file can not be read (e.g. it is written at the moment), the last patterns are kept
+        and the file is read again on the next check. """
+        now = time.monotonic()
+        if self._patterns is None or now - self._last_check >= self.RELOAD_INTERVAL:
+            with self._lock:
+                self._last_check = now
+                try:
+                    modified = os.stat(self.path).st_mtime
+                    if modified != self._modified:
+                        self._load()
+                        self._modified = modified
+                except (OSError, ValueError, re.error):
+                    if self._patterns is None:
+                        raise
+        return self._patterns
+
+    def _load(self) -> None:
+        with open(self.path, mode="rb") as read_file:
+            metadataPatterns = json.load(read_file)
+        names = list(metadataPatterns.keys())
+        regex = re.compile("|".join([f"(?P<pattern{num}>{metadataPatterns[name]})"
+                                     for num, name in enumerate(names)]))
+        self._patterns = (regex, names)
+
+METADATA_MATCHER: MetadataMatcher = MetadataMatcher()
+
 
 def check_for_metadata(textBlocks: List[TextBlock]):
-    for textBlock in textBlocks:
-        if is_metadata(textBlock.text):
+    for textBlock, metaData in zip(textBlocks, METADATA_MATCHER.classify([_.text for _ in textBlocks])):
+        if metaData is not None:
             textBlock.isPartOfText = False
     return textBlocks
 
 def is_metadata(text) -> bool:
-    with open(METADATA_PATTERNS, mode="rb") as read_file:
-        metadataPatterns = json.load(read_file)
-    for metaData, pattern in metadataPatterns.items():
-        res = re.findall(pattern, text.lower())
-        if res != [] :
-            return True
-
-    return False
\ No newline at end of file
+    return METADATA_MATCHER.match(text) is not None
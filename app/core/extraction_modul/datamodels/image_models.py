@@ -1,8 +1,11 @@
 from typing import List, Type, Tuple, Dict
 from app.core.extraction_modul.datamodels.internal_models import TextBlock
+from app.core.extraction_modul.layout_statistics import LayoutContext
+from app.core.extraction_modul.spatial_index import SpatialIndex
 from segtok.segmenter import split_single
-from app.core.detection_models.text_detection import is_grammatically_sentence
+from app.core.detection_models.text_detection import are_grammatically_sentences
 import app.core.schemas.datamodels as io
+import math
 import re
 import base64
 import os
@@ -11,12 +14,9 @@ import fitz
 
 
 class Image:
-    MAX_HEIGHT_OF_PAGE: int = 9999
-    MIN_HEIGHT_OF_PAGE: int = 0
-    MAX_WIDTH_OF_PAGE: int = 9999
-    MIN_WIDTH_OF_PAGE: int = 0
 
-    def __init__(self, datablock):
+    def __init__(self, datablock, layout: LayoutContext):
+        self.layout: LayoutContext = layout
         self.pageNum: int = datablock.pageNum
         self.position: Tuple[int, int, int, int] = datablock.position
         self.posX1: int = datablock.position[0] if datablock.position[0] > 0 else 0
@@ -92,25 +92,14 @@ class Image:
                     return True
         return False
 
-    @classmethod
-    def setPageCoordinates(cls, max_height, min_height, max_width, min_width):
-        Image.MAX_HEIGHT_OF_PAGE = max_height
-        Image.MIN_HEIGHT_OF_PAGE = min_height
-        Image.MAX_WIDTH_OF_PAGE = max_width
-        Image.MIN_WIDTH_OF_PAGE = min_width
-
     def checkIsImage(self) -> None:
         # If the Text contains more as two sentences it is probably not a ImageDescription
         if self.hasNumberOfSentences() > 2:
             self.is_image = False
 
     def hasNumberOfSentences(self):
-        sentenceCounter = 0
         sentences = split_single(self.descriptionText)
-        for sentence in sentences:
-            if is_grammatically_sentence(sentence):
-                sentenceCounter += 1
-        return sentenceCounter
+        return sum(are_grammatically_sentences(sentences))
 
     def set_upper_and_lower(self, imageBlock, textBlocks):
         for tBlock in textBlocks:
@@ -127,27 +116,47 @@ class Image:
                     self.surroundingDataBlocks.append(tBlock)
 
 
-    def setCoordinatesOfPicture(self):
+    def setCoordinatesOfPicture(self, spatial_index: SpatialIndex = None):
         '''
         A description of the idea of this algorithmn can be found in the documentation.
         :return:
         '''
 
         # TBlockR := Textblock Right To Description Block
-        TBlockL: TextBlock = self.getTextNextToDescriptionBlock(self.surroundingDataBlocks, 0)  # Evtl hier
-        TBlockR: TextBlock = self.getTextNextToDescriptionBlock(self.surroundingDataBlocks, 1)
-        TBlockO: TextBlock = self.getTextNextToDescriptionBlock(self.surroundingDataBlocks, 2)
-        TBlockU: TextBlock = self.getTextNextToDescriptionBlock(self.surroundingDataBlocks, 3)
+        TBlockL: TextBlock = self.getTextNextToDescriptionBlock(self._getSurroundingBlocksOfSide(spatial_index, 0), 0)  # Evtl hier
+        TBlockR: TextBlock = self.getTextNextToDescriptionBlock(self._getSurroundingBlocksOfSide(spatial_index, 1), 1)
+        TBlockO: TextBlock = self.getTextNextToDescriptionBlock(self._getSurroundingBlocksOfSide(spatial_index, 2), 2)
+        TBlockU: TextBlock = self.getTextNextToDescriptionBlock(self._getSurroundingBlocksOfSide(spatial_index, 3), 3)
 
         # pictureIsBellow: bool = imageExtractor.HEIGHT_OF_PAGE - self.posY2 > self.posY1 - TBlockO.posY2
 
-        posX1 = TBlockL.posX2 if TBlockL is not None else Image.MIN_WIDTH_OF_PAGE
-        posX2 = TBlockR.posX1 if TBlockR is not None else Image.MAX_WIDTH_OF_PAGE
-        posY1 = TBlockO.posY2 if TBlockO is not None else Image.MIN_HEIGHT_OF_PAGE
-        posY2 = TBlockU.posY1 if TBlockU is not None else Image.MAX_HEIGHT_OF_PAGE
+        posX1 = TBlockL.posX2 if TBlockL is not None else self.layout.min_width_of_page
+        posX2 = TBlockR.posX1 if TBlockR is not None else self.layout.max_width_of_page
+        posY1 = TBlockO.posY2 if TBlockO is not None else self.layout.min_height_of_page
+        posY2 = TBlockU.posY1 if TBlockU is not None else self.layout.max_height_of_page
         self.coordinatesOfPicture = [posX1, posY1,
                                      posX2, posY2]
 
+    def _getSurroundingBlocksOfSide(self, spatial_index: SpatialIndex, side: int) -> List[TextBlock]:
+        ''' Returns the surrounding blocks that are on the side of the description block and near enough
+        to be relevant (see _getOnlyRelevantTextBlocks). Without an index all surrounding blocks are returned. '''
+        if spatial_index is None:
+            return self.surroundingDataBlocks
+
+        distance = 10 * self.layout.distance_between_lines
+        if side == 0:
+            rect = (-math.inf, self.posY1 - distance, self.posX1, self.posY2 + distance)
+        elif side == 1:
+            rect = (self.posX2, self.posY1 - distance, math.inf, self.posY2 + distance)
+        elif side == 2:
+            rect = (self.posX1 - distance, -math.inf, self.posX2 + distance, self.posY1)
+        else:
+            rect = (self.posX1 - distance, self.posY2, self.posX2 + distance, math.inf)
+
+        surroundingBlocks = set(id(textBlock) for textBlock in self.surroundingDataBlocks)
+        return [textBlock for textBlock in spatial_index.query_rect(self.pageNum, *rect)
+                if id(textBlock) in surroundingBlocks]
+
     def _getFirstCoordinate(self, textBlock, side):
         # To the right
         if side == 0:
@@ -180,6 +189,7 @@ class Image:
             return is_longer_as_a_few_words and not end_with_point
 
         res = []
+        distance = 10 * self.layout.distance_between_lines
 
         for textBlock in surroundingBlocks:
 
@@ -191,15 +201,15 @@ class Image:
                 if not is_part_of_text:
                     continue
             if side == 0 or side == 1:
-                if self.posY1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= textBlock.posY1 <= self.posY2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES or self.posY1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= textBlock.posY2 <= self.posY2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES:
+                if self.posY1 - distance <= textBlock.posY1 <= self.posY2 + distance or self.posY1 - distance <= textBlock.posY2 <= self.posY2 + distance:
                     res.append(textBlock)
-                elif textBlock.posY1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= self.posY1 <= textBlock.posY2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES or textBlock.posY1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= self.posY2 <= textBlock.posY2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES:
+                elif textBlock.posY1 - distance <= self.posY1 <= textBlock.posY2 + distance or textBlock.posY1 - distance <= self.posY2 <= textBlock.posY2 + distance:
                     res.append(textBlock)
             else:
 
-                if self.posX1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= textBlock.posX1 <= self.posX2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES or self.posX1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= textBlock.posX2 <= self.posX2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES:
+                if self.posX1 - distance <= textBlock.posX1 <= self.posX2 + distance or self.posX1 - distance <= textBlock.posX2 <= self.posX2 + distance:
                     res.append(textBlock)
-                elif textBlock.posX1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= self.posX1 <= textBlock.posX2 + 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES or textBlock.posX1 - 10 * TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES <= self.posX2 <= textBlock.posX2:
+                elif textBlock.posX1 - distance <= self.posX1 <= textBlock.posX2 + distance or textBlock.posX1 - distance <= self.posX2 <= textBlock.posX2:
                     res.append(textBlock)
 
         return res
@@ -1,10 +1,13 @@
 from __future__ import annotations
+import bisect
 import re
 from collections import defaultdict
-from typing import List, Tuple, Dict
-import copy
+from typing import List, NamedTuple, Tuple, Dict
 import fitz
 
+from app.core.extraction_modul.page_cache import PageCache
+from app.core.extraction_modul.layout_statistics import LayoutContext
+
 
 ################################################################################
 ################################################################################
@@ -16,7 +19,7 @@ class DataBlock:
     Position of the Block on a Site, and the Page in the Document.
     It is the Interface to the Library PyMuPdf.
     '''
-
+    __slots__ = ('posX1', 'posY1', 'posX2', 'posY2', 'position', 'absY1', 'absY2', 'pageNum', 'ID')
 
     def __init__(self, dataBlockID: int, pageNum: int = 9999, dataBlock: DataBlock = None):
         posX1, posY1, posX2, posY2 = self.extractPositionOfDataBlock(dataBlock)
@@ -51,12 +54,14 @@ class ImageBlock(DataBlock):
 ################################################################################
 ################################################################################
 class TextBlock(DataBlock):
-    NORMAL_WIDTH_OF_A_SPACE = 2
-    NORMAL_DISTANCE_BETWEEN_TWO_LINES = 2
-    FONTS = []
-    SIZES = []
-    def __init__(self, dataBlockID: int, pageNum: int = -9999, dataBlock = None, rawDataBlock= None):
+    __slots__ = ('layout', 'text', 'startsLower', 'endsWithoutPoint', 'isPartOfText', 'isPartOfTable', 'isPartOfImage',
+                 'isPartOfMeta', 'isHeader', 'startsWith', 'endsWith', 'isRecurringElement', 'lines', 'orientation',
+                 'size', 'font')
+
+    def __init__(self, dataBlockID: int, pageNum: int = -9999, dataBlock = None, rawDataBlock= None,
+                 layout: LayoutContext = None):
         super().__init__(dataBlockID, pageNum, dataBlock)
+        self.layout: LayoutContext = layout if layout is not None else LayoutContext()
         self.text: str = " "
         self.startsLower: bool = None
         self.endsWithoutPoint: bool = None
@@ -81,23 +86,25 @@ class TextBlock(DataBlock):
     def create_from_pages(cls, pages, width, height):
         res = []
         dataBlockID = 0
-        for pageNum, page in enumerate(pages):
-            blocks = TextBlock.update_data(page.getText("dict"))
-            blocks_raw = TextBlock.update_data(page.getText("rawdict"))
+        page_cache = PageCache(pages)
+        layout = LayoutContext.from_page_cache(page_cache, width)
+        for pageNum in range(len(page_cache)):
+            blocks = TextBlock.update_data(page_cache.get_dict(pageNum), layout)
+            blocks_raw = TextBlock.update_data(page_cache.get_rawdict(pageNum), layout)
 
 
             for num, dataBlock in enumerate(blocks["blocks"]):
                 dataBlockID += 1
                 # Datablock is a Text
                 if dataBlock["type"] == 0:
-                    textB = TextBlock(dataBlockID, pageNum, dataBlock, blocks_raw['blocks'][num])
+                    textB = TextBlock(dataBlockID, pageNum, dataBlock, blocks_raw['blocks'][num], layout)
                     res.append(textB)
 
         return res
 
 
     @staticmethod
-    def update_data(data) -> Dict:
+    def update_data(data, layout: LayoutContext) -> Dict:
         ''' Controlls the textblock. '''
 
 
@@ -107,7 +114,7 @@ class TextBlock(DataBlock):
             if block['type'] == 1:
                 new_blocks.extend(TextBlock._update_image_block(block))
             else:
-                new_blocks.extend(TextBlock._update_text_block(block))
+                new_blocks.extend(TextBlock._update_text_block(block, layout))
 
 
 
@@ -117,7 +124,7 @@ class TextBlock(DataBlock):
                 }
 
     @staticmethod
-    def _update_text_block(text_block: Dict) -> List[Dict]:
+    def _update_text_block(text_block: Dict, layout: LayoutContext) -> List[Dict]:
         ''' Controlls the image_file block'''
         bboxs = []
         lines: List[Dict] = text_block['lines']
@@ -138,7 +145,7 @@ class TextBlock(DataBlock):
                 y1 = line['bbox'][1]
                 y2 = line['bbox'][3]
 
-                distance_is_longer_than_a_normal_height: bool = y1 - prevY2 > TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES * 1.05
+                distance_is_longer_than_a_normal_height: bool = y1 - prevY2 > layout.distance_between_lines * 1.05
                 is_in_same_line: bool = y1 <= prevY1 <= y2 or y1 <= prevY2 <= y2 or prevY1 <= y1 <= prevY2 or prevY1 <= y1 <= prevY2
                 if distance_is_longer_than_a_normal_height and not is_in_same_line:
                     new_block = {'type': 0,
@@ -238,205 +245,6 @@ class TextBlock(DataBlock):
 
 
 
-    @staticmethod
-    def setSpaceSize(space: float):
-        TextBlock.NORMAL_WIDTH_OF_A_SPACE = space
-
-    @staticmethod
-    def setSizes(sizes: List[Tuple[int, int]]):
-        TextBlock.SIZES = sizes
-
-    @staticmethod
-    def setFonts(fonts: List[Tuple[int, int]]):
-        TextBlock.FONTS = fonts
-
-    @staticmethod
-    def setDistanceBetweenTwoLines(distance: float):
-        TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES = distance
-
-    @staticmethod
-    def _getHeightsBetweenLines2(pages) -> List:
-        heights = defaultdict(int)
-        lines = []
-
-        # Get all lines
-        for pageNum, page in enumerate(pages):
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            for textBlock in dataBlocks:
-                if textBlock['type'] == 0: # If it is of type text
-                    for line in textBlock['lines']:
-                        line.update({'page': pageNum})
-                    lines.extend(textBlock['lines'])
-
-
-        # count the distance between each line of the textBlocks
-        for idx_, line in enumerate(lines[1:]):
-            prevLine = lines[idx_ - 1]
-            prevPage = prevLine['page']
-            page = line['page']
-            prevY1 = prevLine['bbox'][1]
-            prevY2 = prevLine['bbox'][3]
-            y1 = line['bbox'][1]
-            y2 = line['bbox'][3]
-            delta = int(y1 - prevY2)
-            is_in_same_line: bool = y1 <= prevY1 <= y2 or y1 <= prevY2 <= y2 or prevY1 <= y1 <= prevY2 or prevY1 <= y1 <= prevY2
-            if 0 <= delta and prevPage == page and not is_in_same_line:
-                heights[delta] += 1
-
-        heights: List = list(heights.items())
-        heights.sort(key=lambda x: x[1], reverse=True)
-        return heights
-
-    def _getHeightsBetweenLines(self, pages) -> List:
-
-
-        heightBetweenLines = {}
-        for page in pages:
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
-            for textBlock in textBlocks:
-                prevPosY2 = -9999
-                for line in textBlock["lines"]:
-                    if prevPosY2 == -9999:
-                        prevPosY2 = line['bbox'][3]
-                    else:
-                        # Calculation of the Distance between two lines
-                        heightBetweenTwoLines = int(prevPosY2 - line['bbox'][1])
-                        prevPosY2 = line['bbox'][3]
-                        if heightBetweenTwoLines >= 0:
-                            if str(heightBetweenTwoLines) not in heightBetweenLines:
-                                heightBetweenLines[str(heightBetweenTwoLines)] = 1
-                            else:
-                                heightBetweenLines[str(heightBetweenTwoLines)] += 1
-
-        heightBetweenLines = [(int(distance), count) for distance, count in heightBetweenLines.items()]
-        heightBetweenLines.sort(key=lambda x: x[1], reverse=True)
-        return heightBetweenLines
-
-
-
-    @staticmethod
-    def _get_space_between_chars(pages: fitz.Page) -> List:
-        distancesBetweenTwoChars = {}
-        for page in pages:
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
-            for textBlock in textBlocks:
-                for line in textBlock["lines"]:
-                    for span in line["spans"]:
-                        prevCharPosX2 = -9999
-                        for char in span["chars"]:
-                            if prevCharPosX2 == -9999:
-                                prevCharPosX2 = char['bbox'][2]
-                            else:
-                                # Calculation of the Space between two Chars
-                                distanceBetweenTwoChars = int(prevCharPosX2 - char['bbox'][0])
-                                prevCharPosX2 = char['bbox'][2]
-                                if distanceBetweenTwoChars >= 0:
-                                    if str(distanceBetweenTwoChars) not in distancesBetweenTwoChars:
-                                        distancesBetweenTwoChars[str(distanceBetweenTwoChars)] = 1
-                                    else:
-                                        distancesBetweenTwoChars[str(distanceBetweenTwoChars)] += 1
-        distancesBetweenTwoChars = [(int(distance), count) for distance, count in distancesBetweenTwoChars.items()]
-        distancesBetweenTwoChars.sort(key=lambda x: x[1], reverse=True)
-        return distancesBetweenTwoChars
-
-    @staticmethod
-    def _get_space_between_chars(pages, width: int) -> List:
-        distancesBetweenTwoChars = defaultdict(int)
-
-        chars = []
-
-        # Get all chars
-        for page in pages:
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
-            for textBlock in textBlocks:
-                for line in textBlock["lines"]:
-                    for span in line["spans"]:
-                        chars.extend(span["chars"])
-
-        # Calculate the difference between two chars
-        for idx_, char in enumerate(chars[1:]):
-            prev_char_x2 = chars[idx_ - 1]['bbox'][2]
-            char_x1 = char['bbox'][0]
-            # Calculation of the Space between two Chars
-            delta = int(char_x1 - prev_char_x2)
-
-            if 0 <= delta <= width:
-                distancesBetweenTwoChars[delta] += 1
-
-        distancesBetweenTwoChars = list(distancesBetweenTwoChars.items())
-        distancesBetweenTwoChars.sort(key=lambda x: x[1], reverse=True)
-        return distancesBetweenTwoChars
-
-    @staticmethod
-    def _get_sizes(pages) -> List:
-
-        typesOfSizes = defaultdict(int)
-        for page in pages:
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
-            for textBlock in textBlocks:
-                for line in textBlock["lines"]:
-                    size = int(line["spans"][0]['size'])
-
-                    typesOfSizes[size] += 1
-
-        sizes = list(typesOfSizes.items())
-
-        sizes.sort(key=lambda x: x[1], reverse=True)
-        return sizes
-
-    @staticmethod
-    def _get_fonts(pages) -> List:
-        typesOfFonts = defaultdict(int)
-        for page in pages:
-            dataBlocks = [_dataBlocks for key, _dataBlocks in page.getText("rawdict").items() if key == "blocks"][0]
-            textBlocks = [textBlock for textBlock in dataBlocks if textBlock['type'] == 0]
-            for textBlock in textBlocks:
-                for line in textBlock["lines"]:
-                    font = line["spans"][0]['font']
-                    typesOfFonts[font] += 1
-
-
-
-        fonts = list(typesOfFonts.items())
-        fonts.sort(key=lambda x: x[1], reverse=True)
-
-        return fonts
-
-
-    @staticmethod
-    def initializeParameters(pages, width):
-
-        # Calculates the initliation parameters
-        distancesBetweenTwoChars = TextBlock._get_space_between_chars(pages, width)
-        heightBetweenLines = TextBlock._getHeightsBetweenLines2(pages)
-        sizes = TextBlock._get_sizes(pages)
-        fonts = TextBlock._get_fonts(pages)
-
-
-        TextBlock.NORMAL_WIDTH_OF_A_SPACE = TextBlock.getHigherDistance(distancesBetweenTwoChars)
-        TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES = TextBlock.getHigherDistance(heightBetweenLines)
-        TextBlock.FONTS = fonts
-        TextBlock.SIZES = sizes
-
-    @staticmethod
-    def getHigherDistance(values):
-        # Get the next bigger value to 1
-        if len(values) > 1:
-            # Get the next higher distance to 0
-            _values = [distance for distance, __ in values if distance > 1]
-            return _values[0]
-        else:
-            return 2
-
-
-
-
-
-
     def isParagraph(self) -> bool:
         '''
         Checks if a TextBlock is a Paragraph
@@ -474,7 +282,7 @@ class TextBlock(DataBlock):
 
             # Checks the distance between two spans
             if num > 0:
-                if spanPosY1 - prevSpanPosY2 > TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES:
+                if spanPosY1 - prevSpanPosY2 > self.layout.distance_between_lines:
                     textLine.append(" ")
             # Checks for "-" before new Line
             textLines = self.identifyNewLine(line, prevSpanText, textLine, textLines)
@@ -546,21 +354,95 @@ class TextBlock(DataBlock):
         lines = []
         if textBlock is None:
             return lines
-        textBlockLines = copy.copy(textBlock['lines'])
-        while(True):
-            if len(textBlockLines) == 0: break
-            textBlockLine = textBlockLines.pop(0)
+        textBlockLines = RemainingLines(textBlock['lines'])
+        while len(textBlockLines) > 0:
+            textBlockLine = textBlockLines.pop_first()
             line = Line(textBlockLine, textBlockLines, self, pageNum)
-            for element in line.getLinesToDelete():
-                if element in textBlockLines:
-                    textBlockLines.remove(element)
+            textBlockLines.remove_all(line.getLinesToDelete())
+            # The text, the fonts and the spans are extracted, so the dicts of PyMuPDF are not needed anymore
+            line.linesInDict = []
             lines.append(line)
 
-
         return lines
 
 
+class RemainingLines:
+    """
+    The lines (dicts of PyMuPDF) of a TextBlock that are not yet part of a Line, in their original order.
+    The lines are sorted once by their upper border, so the lines of the same row are found by a binary search
+    instead of comparing every line with all the remaining lines.
+    """
+
+    def __init__(self, lines: List[Dict]):
+        self.lines: List[Dict] = lines
+        self._ids: Dict[int, int] = {id(line): idx for idx, line in enumerate(lines)}
+        # A linked list of the remaining lines (the index -1 and len(lines) are the ends)
+        self._prev: List[int] = list(range(-1, len(lines) - 1))
+        self._next: List[int] = list(range(1, len(lines) + 1))
+        self._first: int = 0
+        self._number_of_lines: int = len(lines)
+        self._removed: List[bool] = [False] * len(lines)
+        # The remaining lines sorted by (upper border, index)
+        self._by_top: List[Tuple[int, int]] = sorted([(int(line['bbox'][1]), idx) for idx, line in enumerate(lines)])
+
+    def __len__(self) -> int:
+        return self._number_of_lines
+
+    def pop_first(self) -> Dict:
+        """ Removes and returns the first remaining line. """
+        line = self.lines[self._first]
+        self.remove(self._first)
+        return line
+
+    def get_previous(self, idx: int) -> Dict:
+        """ Returns the remaining line before the line (or None if it is the first one). """
+        prev = self._prev[idx]
+        return self.lines[prev] if prev >= 0 else None
+
+    def get_lines_in_row(self, y1: float, y2: float, tolerance: float) -> List[int]:
+        """ Returns the indices of the remaining lines (in their order) whose upper border is at most the
+        tolerance away from y1 and whose lower border is at most the tolerance away from y2. """
+        start = bisect.bisect_left(self._by_top, (y1 - tolerance, -1))
+        res = []
+        for top, idx in self._by_top[start:]:
+            if top > y1 + tolerance:
+                break
+            if y2 - tolerance <= int(self.lines[idx]['bbox'][3]) <= y2 + tolerance:
+                res.append(idx)
+        res.sort()
+        return res
+
+    def remove(self, idx: int) -> None:
+        if self._removed[idx]:
+            return
+        self._removed[idx] = True
+        self._number_of_lines -= 1
+        prev, following = self._prev[idx], self._next[idx]
+        if prev >= 0:
+            self._next[prev] = following
+        else:
+            self._first = following
+        if following < len(self.lines):
+            self._prev[following] = prev
+        del self._by_top[bisect.bisect_left(self._by_top, (int(self.lines[idx]['bbox'][1]), idx))]
+
+    def remove_all(self, lines: List[Dict]) -> None:
+        for line in lines:
+            idx = self._ids.get(id(line))
+            if idx is not None:
+                self.remove(idx)
+
+
+class Span(NamedTuple):
+    """ The position and the text of a span of PyMuPDF. """
+    bbox: Tuple[float, float, float, float]
+    text: str
+
+
 class Line:
+    __slots__ = ('posX1', 'posY1', 'posX2', 'posY2', 'absY1', 'absY2', 'pageNum', 'layout', 'dir', 'linesInDict',
+                 'spans', 'width', 'position', 'textInLine', 'mostCommonSizeInTextBlock', 'mostCommonFontInTextBlock',
+                 'fontsInLine', 'fontSizesInLine')
 
     def __init__(self, line, lines, textBlock, pageNum):
         posX1, posY1, posX2, posY2 = self.extractPositionOfLine(line)
@@ -571,6 +453,7 @@ class Line:
         self.absY2 = 0
         self.absY1 = 0
         self.pageNum = pageNum
+        self.layout: LayoutContext = textBlock.layout
         self.dir: Tuple = line['dir']
         self.linesInDict = []
         self.width = self.posY2 - self.posY1
@@ -581,6 +464,7 @@ class Line:
         self.mostCommonFontInTextBlock: str = ''
         self.fontsInLine = self.extractFontsInLine()
         self.fontSizesInLine = self.extractFontSizesInLine()
+        self.spans: Tuple[Span, ...] = self.extractSpansOfLine()
 
 
         self.updateCoordinates()
@@ -638,40 +522,38 @@ class Line:
             if span['bbox'][3] > posY2: posY2 = span['bbox'][3]
         return posX1, posY1, posX2, posY2
 
-    def extractTextInLine(self, line, lines, textBlock: TextBlock):
+    def extractTextInLine(self, line, lines: RemainingLines, textBlock: TextBlock):
 
         text = "".join([_['text'] for _ in line['spans']])
-        HEIGHT_OF_LINE  = textBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES
-        WIDTH_OF_SPACE = textBlock.NORMAL_WIDTH_OF_A_SPACE
+        HEIGHT_OF_LINE  = textBlock.layout.distance_between_lines
+        WIDTH_OF_SPACE = textBlock.layout.width_of_space
         linesToDelete = []
         linesToDelete.append(line)
-        prevX2 = self.posX2
-        for lineInTextBlock in lines:
-            if lineInTextBlock is not line:
-                sameRow: bool = self.posY1 - 0.5 * HEIGHT_OF_LINE <= int(lineInTextBlock['bbox'][1]) <= self.posY1 + 0.5 * \
-                                   HEIGHT_OF_LINE and self.posY2 - 0.5 * HEIGHT_OF_LINE <= int(lineInTextBlock['bbox'][3]) <= \
-                                   self.posY2 + 0.5 * HEIGHT_OF_LINE
-
-                if sameRow:
-                    for span in lineInTextBlock['spans']:
-                        if -0.5 * WIDTH_OF_SPACE <= span['bbox'][0] - prevX2 <= 0.5 * WIDTH_OF_SPACE:
-                            text += span['text']
-                        else:
-                            text += " " + span['text']
-                        prevX2 = span['bbox'][2]
-                    linesToDelete.append(lineInTextBlock)
-            prevX2 = lineInTextBlock['bbox'][2]
+        # The lines in the same row (the upper and the lower border differ by at most half a line)
+        for idx in lines.get_lines_in_row(self.posY1, self.posY2, 0.5 * HEIGHT_OF_LINE):
+            lineInTextBlock = lines.lines[idx]
+            # The distance of the first span is measured to the end of the line before (in the order of the block)
+            prevLine = lines.get_previous(idx)
+            prevX2 = prevLine['bbox'][2] if prevLine is not None else self.posX2
+            for span in lineInTextBlock['spans']:
+                if -0.5 * WIDTH_OF_SPACE <= span['bbox'][0] - prevX2 <= 0.5 * WIDTH_OF_SPACE:
+                    text += span['text']
+                else:
+                    text += " " + span['text']
+                prevX2 = span['bbox'][2]
+            linesToDelete.append(lineInTextBlock)
 
         self.linesInDict = linesToDelete
         return text
 
 
-    def getSpans(self, orientation):
-        res = []
-        for line in self.linesInDict:
-            res.extend(line['spans'])
+    def extractSpansOfLine(self) -> Tuple[Span, ...]:
+        return tuple([Span(tuple(span['bbox']), span['text']) for line in self.linesInDict for span in line['spans']])
+
+    def getSpans(self, orientation) -> List[Span]:
+        res = list(self.spans)
         if orientation == 1:
-            res.sort(key=lambda x: x['bbox'][1], reverse=True)
+            res.sort(key=lambda x: x.bbox[1], reverse=True)
         elif orientation == 0:
-            res.sort(key=lambda x: x['bbox'][0])
+            res.sort(key=lambda x: x.bbox[0])
         return res
\ No newline at end of file
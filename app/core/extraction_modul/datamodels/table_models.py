@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import copy
 import math
+import numpy as np
 from collections import defaultdict
 from typing import List, Type, Tuple, Dict, Union
 import spacy
@@ -9,11 +10,14 @@ import re
 import fitz
 import os
 
-from app.core.detection_models.text_detection import is_grammatically_sentence, get_type_frequency
+from app.core.detection_models.text_detection import are_grammatically_sentences, get_type_frequency, \
+    get_type_frequencies
 from PIL import Image
 import base64
 from app.core.detection_models import table_detection
-from app.core.extraction_modul.datamodels.internal_models import TextBlock, Line
+from app.core.extraction_modul.datamodels.internal_models import TextBlock, Line, Span
+from app.core.extraction_modul.layout_statistics import LayoutContext
+from app.core.extraction_modul.spatial_index import SpatialIndex
 import app.core.schemas.datamodels as io
 from app.core.config import TMP_DIRECTORY
 
@@ -21,10 +25,11 @@ from app.core.config import TMP_DIRECTORY
 class Table:
     IDCounter = 0
 
-    def __init__(self, tableDescription, textBlocks, x1, y1, x2, y2):
+    def __init__(self, tableDescription, textBlocks, x1, y1, x2, y2, layout: LayoutContext):
         """
         docstring
         """
+        self.layout: LayoutContext = layout
         self.pageNum = tableDescription.pageNum
         self.descriptionBlock = tableDescription
         self.textBlocksOfTable = []
@@ -91,13 +96,16 @@ class Table:
 
     @classmethod
     def from_boundaries(cls, boundaries: Dict, textBlocks: List[TextBlock], tableDescriptions: List[TextBlock], pages,
-                        fitz_doc: str) -> List[Table]:
+                        fitz_doc: str, layout: LayoutContext, spatial_index: SpatialIndex = None) -> List[Table]:
 
         def average_height(textBlocks: List[TextBlock]) -> float:
             ''' Helper function to calculate the average height of a list of textBlocks. '''
 
             return sum([_.size for _ in textBlocks]) / len(textBlocks)
 
+        if spatial_index is None:
+            spatial_index = SpatialIndex(textBlocks)
+
         res: List[Table] = []
         _tableDescription = copy.copy(tableDescriptions)
         for boundary in boundaries:
@@ -133,7 +141,8 @@ class Table:
             _tableDescription.remove(bestFit)
 
             # Find the textBlocks inside the boundary
-            for textBlock in textBlocks:
+            for textBlock in spatial_index.query_rect(boundary['page'], boundary["x1"], boundary["y1"],
+                                                      boundary["x2"], boundary["y2"]):
                 if textBlock.is_part_of(boundary['page'], boundary["x1"], boundary["y1"], boundary["x2"],
                                         boundary["y2"]):
                     tableData.append(textBlock)
@@ -142,7 +151,7 @@ class Table:
             height = boundary['y2'] - boundary['y1']
 
             # Create a Table
-            table = cls(bestFit, tableData, boundary["x1"], boundary["y1"], boundary["x2"], boundary["y2"])
+            table = cls(bestFit, tableData, boundary["x1"], boundary["y1"], boundary["x2"], boundary["y2"], layout)
             table.create_rows()
             table.create_cells()
             table.setColumns(boundary["x1"], boundary["y1"], boundary["x2"], boundary["y2"])
@@ -161,7 +170,7 @@ class Table:
 
     def create_rows(self, height) -> None:
         # Get the line with the max. number of rows
-        max_number_of_rows = height / TextBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES
+        max_number_of_rows = height / self.layout.distance_between_lines
         # Get the lines
         lines = []
         for tBlock in self.textBlocks:
@@ -419,36 +428,57 @@ class Table:
 
     def setColumns(self, x1, x2, y1, y2):
 
-        def get_rows():
-            zwerg = []
-            for row in self.rows:
-                zwerg.extend(row.cells)
+        def get_bands(cells):
+            """ Splits the cells into bands of overlapping cells (sorted by their position). Cells of different
+            bands do not overlap, so they can not be in the same column. The cells of a band keep their order. """
+            bands = []
+            band, end_of_band = [], None
+            for idx in sorted(range(len(cells)), key=lambda idx: cells[idx].posX1):
+                cell = cells[idx]
+                if band and cell.posX1 > end_of_band:
+                    bands.append([cells[_] for _ in sorted(band)])
+                    band = []
+                if not band:
+                    end_of_band = cell.posX2
+                band.append(idx)
+                end_of_band = max(end_of_band, cell.posX2)
+            if band:
+                bands.append([cells[_] for _ in sorted(band)])
+            return bands
+
+        def get_rows_of_band(cells):
+            """ Merges the cells of a band into columns. A column is represented by one of its cells. """
             rows = []
-            while (len(zwerg) > 0):
-                cell = zwerg.pop(0)
-                rows.append(cell)
-                to_remove = []
+            while len(cells) > 0:
+                cell = cells[0]
+                to_remove = {id(cell)}
                 counter = 1
-                while (counter != 0):
+                while counter != 0:
                     counter = 0
-                    for _cell in zwerg:
-                        if _cell not in to_remove:
+                    for _cell in cells:
+                        if id(_cell) not in to_remove:
                             delta_1 = cell.posX2 - cell.posX1
                             delta_2 = _cell.posX2 - _cell.posX1
                             if delta_2 > delta_1:
                                 if _cell.posX1 <= cell.centerX <= _cell.posX2:
-                                    to_remove.append(_cell)
+                                    to_remove.add(id(_cell))
                                     counter += 1
                             else:
                                 if cell.posX1 <= _cell.centerX <= cell.posX2:
-                                    rows.remove(cell)
-                                    rows.append(_cell)
                                     cell = _cell
-                                    to_remove.append(_cell)
+                                    to_remove.add(id(_cell))
                                     counter += 1
-                for cell in to_remove:
-                    if cell in zwerg:
-                        zwerg.remove(cell)
+                rows.append(cell)
+                cells = [_cell for _cell in cells if id(_cell) not in to_remove]
+            return rows
+
+        def get_rows():
+            zwerg = []
+            for row in self.rows:
+                zwerg.extend(row.cells)
+            rows = []
+            for band in get_bands(zwerg):
+                rows.extend(get_rows_of_band(band))
             return rows
 
         width = x2 - x1
@@ -473,31 +503,9 @@ class Table:
         print("ok")
 
     def update_cell_positions(self):
-        class container:
-            def __init__(self, x1, x2, y1, y2, row, column):
-                self.x1 = x1
-                self.x2 = x2
-                self.y1 = y1
-                self.y2 = y2
-                self.centerX = x1 + (x2 - x1) / 2
-                self.centerY = y1 + (y2 - y1) / 2
-                self.row = row
-                self.column = column
-                self.distances = {}
-
-        # get all cells
-        zwerg = []
-        zwerg_2 = []
-        # calculate for each cell the distance to all row-column-cells
-        for row in self.rows:
-            for column in self.columns:
-                zwerg_2.append(container(column.posX1, column.posX2, row.posY1, row.posY2, row, column))
-
-        for cell in self.cells:
-            cell.distances = {}
-            for c in zwerg_2:
-                cell.distances[c] = ((cell.centerX - c.centerX) ** 2 + (cell.centerY - c.centerY) ** 2) ** (1 / 2)
-
+        """ Moves every cell into the grid of rows and columns. The distances between the centers of all cells and
+        all grid elements are calculated at once. Every cell is assigned to its nearest grid element, the cells
+        with the smaller distances are assigned first (so a nearer cell is overwritten by a farther one). """
         new_rows = []
         for row in self.rows:
             new_row = Row(row.rowNumber, line=None, table=row.table)
@@ -509,26 +517,39 @@ class Table:
             for column in self.columns:
                 new_row.cells.append(Cell((column.posX1, row.posY1, column.posX2, row.posY2), " ", row, None))
 
-        def get_cell_with_smallest_distance():
-            zwerg = []
-            for cell in self.cells:
-                if cell.not_activated:
-                    options = []
-                    for key, distance in cell.distances.items():
-                        options.append((distance, key, cell))
-
-                    options.sort(key=lambda x: x[0])
-                    zwerg.append(options[0])
-
-            zwerg.sort(key=lambda x: x[0])
-            return zwerg[0][1], zwerg[0][2]
-
-        # Get the cell that is next to a given cell_container
-        while (any([_.not_activated for _ in self.cells])):
-            key, cell = get_cell_with_smallest_distance()
-            for row in new_rows:
-                for _cell in row.cells:
-                    if _cell.posX1 <= key.centerX <= _cell.posX2 and _cell.posY1 <= key.centerY <= _cell.posY2:
+        if len(self.cells) > 0 and len(self.rows) > 0 and len(self.columns) > 0:
+            columns_x1 = np.array([column.posX1 for column in self.columns], dtype=float)
+            columns_x2 = np.array([column.posX2 for column in self.columns], dtype=float)
+            rows_y1 = np.array([row.posY1 for row in self.rows], dtype=float)
+            rows_y2 = np.array([row.posY2 for row in self.rows], dtype=float)
+            # The centers of the grid elements (row by row)
+            centers_x = np.tile(columns_x1 + (columns_x2 - columns_x1) / 2, len(self.rows))
+            centers_y = np.repeat(rows_y1 + (rows_y2 - rows_y1) / 2, len(self.columns))
+
+            centers_of_cells_x = np.array([cell.centerX for cell in self.cells], dtype=float)
+            centers_of_cells_y = np.array([cell.centerY for cell in self.cells], dtype=float)
+            distances = np.sqrt((centers_of_cells_x[:, None] - centers_x[None, :]) ** 2 +
+                                (centers_of_cells_y[:, None] - centers_y[None, :]) ** 2)
+            # On equal distances the first grid element and the first cell are used
+            nearest = np.argmin(distances, axis=1)
+            order = np.argsort(distances[np.arange(len(self.cells)), nearest], kind='stable')
+
+            # The grid elements containing the center of a grid element (more than one if rows or columns overlap)
+            cells_x1 = np.array([cell.posX1 for cell in new_rows[0].cells], dtype=float)
+            cells_x2 = np.array([cell.posX2 for cell in new_rows[0].cells], dtype=float)
+            cells_y1 = np.array([row.cells[0].posY1 for row in new_rows], dtype=float)
+            cells_y2 = np.array([row.cells[0].posY2 for row in new_rows], dtype=float)
+            columns_contain = (cells_x1[None, :] <= centers_x[:len(self.columns), None]) & \
+                              (centers_x[:len(self.columns), None] <= cells_x2[None, :])
+            rows_contain = (cells_y1[None, :] <= centers_y[::len(self.columns), None]) & \
+                           (centers_y[::len(self.columns), None] <= cells_y2[None, :])
+
+            for idx in order:
+                cell = self.cells[idx]
+                row_number, column_number = divmod(int(nearest[idx]), len(self.columns))
+                for _row_number in np.flatnonzero(rows_contain[row_number]):
+                    for _column_number in np.flatnonzero(columns_contain[column_number]):
+                        _cell = new_rows[_row_number].cells[_column_number]
                         _cell.text = cell.text
                         _cell.mostCommonTypeOfWord = cell.mostCommonTypeOfWord
                         _cell.numberOfWords = cell.numberOfWords
@@ -542,9 +563,6 @@ class Table:
             for row in self.rows:
                 column.cells.append(row.cells[num])
 
-        print("ok")
-        # Calculate the error for the complete table
-
     def do_magic(self):
 
         class c:
@@ -730,13 +748,9 @@ class Table:
         return len(textLengthOfTable.split(" "))
 
     def numberOfSentencesInTable(self):
-        counter = 0
         relevant_rows = [row for row in self.rows if row.is_row]
         text_in_rows = [_.rowInformation[0].textInLine for _ in relevant_rows]
-        for text in text_in_rows:
-            if is_grammatically_sentence(text):
-                counter += 1
-        return counter
+        return sum(are_grammatically_sentences(text_in_rows))
 
     def averageNumberOfElementsInRow(self) -> float:
         numberOfElementsInTable = 0
@@ -892,10 +906,11 @@ class Table:
             average_number_of_cells = sum([len(row.cells) for row in relevant_rows]) / len(relevant_rows)
         else:
             average_number_of_cells = 0
-        for row in self.rows:
-            text = " ".join([cell.text for cell in row.cells])
+        are_sentences: List[bool] = are_grammatically_sentences([" ".join([cell.text for cell in row.cells])
+                                                                 for row in self.rows])
+        for row, is_sentence in zip(self.rows, are_sentences):
             # if the row is a sentence it is not a row
-            if is_grammatically_sentence(text):
+            if is_sentence:
                 row.is_row = False
             # if a row has just one cell it is not a row
             if len(row.cells) <= 1:
@@ -1022,7 +1037,7 @@ class Table:
                 if textBlock not in textBlocksOfTable:
 
                     if textBlock.orientation == orientation and textBlock.pageNum == previousTextBlock.pageNum:
-                        if 2.5 * (spaceBetweenTwoLines + self.descriptionBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES) >= \
+                        if 2.5 * (spaceBetweenTwoLines + self.layout.distance_between_lines) >= \
                                 self.getSpaceBetweenTwoLines(
                                     orientation, previousTextBlock, textBlock):
 
@@ -1099,11 +1114,14 @@ class Table:
 
 
 class Row:
+    __slots__ = ('rowNumber', 'table', 'layout', 'isHeader', 'posX1', 'posY1', 'posX2', 'posY2', 'line', 'id', 'is_row',
+                 'orientation', 'is_table_header', 'cells', 'numberOfCols')
     IDCounter = 0
 
     def __init__(self, rowNumber: int, line, table: Table):
         self.rowNumber = rowNumber
         self.table: Table = table
+        self.layout: LayoutContext = table.layout
         self.isHeader: bool = False
         self.posX1 = line.posX1 if line is not None else 0
         self.posY1 = line.posY1 if line is not None else 0
@@ -1137,13 +1155,12 @@ class Row:
 
     def set_cells(self) -> None:
         cells = []
-        spans = []
-        for line in self.line.linesInDict:
-            spans.extend(line['spans'])
-        spans = self.identify_spans(spans)
+        spans = self.identify_spans(list(self.line.spans))
 
-        for span in spans:
-            cell = Cell(span['bbox'], span['text'])
+        # Types the words of all cells at once, the cells will use the cached results
+        get_type_frequencies([text for _, text in spans])
+        for bbox, text in spans:
+            cell = Cell(bbox, text)
             cells.append(cell)
 
         self.cells = cells
@@ -1193,26 +1210,23 @@ class Row:
 
     def merge_spans(self, span_1, span_2, orientation):
         bbox = (
-            min(span_1['bbox'][0], span_2['bbox'][0]),
-            min(span_1['bbox'][1], span_2['bbox'][1]),
-            max(span_1['bbox'][2], span_2['bbox'][2]),
-            max(span_1['bbox'][3], span_2['bbox'][3]),
+            min(span_1.bbox[0], span_2.bbox[0]),
+            min(span_1.bbox[1], span_2.bbox[1]),
+            max(span_1.bbox[2], span_2.bbox[2]),
+            max(span_1.bbox[3], span_2.bbox[3]),
         )
         if orientation == 1:
-            if span_1['bbox'][1] > span_2['bbox'][1]:
-                text = span_1['text'] + span_2['text']
+            if span_1.bbox[1] > span_2.bbox[1]:
+                text = span_1.text + span_2.text
             else:
-                text = span_2['text'] + span_1['text']
+                text = span_2.text + span_1.text
 
         elif orientation == 0:
-            if span_1['bbox'][0] < span_2['bbox'][0]:
-                text = span_1['text'] + span_2['text']
+            if span_1.bbox[0] < span_2.bbox[0]:
+                text = span_1.text + span_2.text
             else:
-                text = span_2['text'] + span_1['text']
-        return {
-            'bbox': bbox,
-            'text': text
-        }
+                text = span_2.text + span_1.text
+        return Span(bbox, text)
 
     def getCells(self):
         elements = []
@@ -1221,18 +1235,70 @@ class Row:
             spans = line.getSpans(self.orientation)
             res = self.identify_spans(spans)
 
-            for span in res:
-                element = Cell(span['bbox'], span['text'])
+            get_type_frequencies([text for _, text in res])
+            for bbox, text in res:
+                element = Cell(bbox, text)
                 elements.append(element)
         return elements
 
-    def identify_spans(self, spans):
+    def identify_spans(self, spans: List[Span]) -> List[Span]:
+        """ Merges the spans that are separated by at most a normal space into cells.
+        Returns the bounding box and the text of every cell. """
+        if len(spans) == 0:
+            return []
+        # The start and the end of the spans in the reading direction and the position that orders the texts
+        if self.orientation == 0:
+            positions = [(span.bbox[0], span.bbox[2], span.bbox[0]) for span in spans]
+        elif self.orientation == 1:
+            # The spans are read from the bottom to the top
+            positions = [(-span.bbox[3], -span.bbox[1], -span.bbox[1]) for span in spans]
+        else:
+            positions = None
+
+        max_distance = self.layout.width_of_space * 1.25
+        if positions is None or not self._are_sorted_spans(positions, max_distance):
+            return self._identify_spans_pairwise(spans)
+
+        # Sweep: a span is merged with the last cell if it starts at most a normal space after the end of the cell
+        x1, y1, x2, y2 = spans[0].bbox[:4]
+        texts = [spans[0].text]
+        end = positions[0][1]
+        res = []
+        for span, (_start, _end, _) in zip(spans[1:], positions[1:]):
+            bbox = span.bbox
+            if _start - end <= max_distance:
+                x1, y1, x2, y2 = min(x1, bbox[0]), min(y1, bbox[1]), max(x2, bbox[2]), max(y2, bbox[3])
+                texts.append(span.text)
+            else:
+                res.append(Span((x1, y1, x2, y2), "".join(texts)))
+                x1, y1, x2, y2 = bbox[:4]
+                texts = [span.text]
+            end = max(end, _end)
+        res.append(Span((x1, y1, x2, y2), "".join(texts)))
+        return res
+
+    @staticmethod
+    def _are_sorted_spans(positions: List[Tuple[float, float, float]], max_distance: float) -> bool:
+        """ Checks if the spans are sorted (by their start and the position of the texts) and overlap the spans
+        before by at most max_distance. Then a span can only be appended to the last cell, like in the
+        pairwise comparison. """
+        end = None
+        for num, (start, _end, order) in enumerate(positions):
+            if start > _end:
+                return False
+            if num > 0 and (start < positions[num - 1][0] or order < positions[num - 1][2] or
+                            start < end - max_distance):
+                return False
+            end = _end if end is None else max(end, _end)
+        return True
+
+    def _identify_spans_pairwise(self, spans):
         res = [spans[0]]
         for span_1 in spans[1:]:
             is_in_span = False
             for span_2 in res:
                 if self.get_distance_between_two_spans(span_1, span_2,
-                                                       self.orientation) <= self.table.descriptionBlock.NORMAL_WIDTH_OF_A_SPACE * 1.25:
+                                                       self.orientation) <= self.layout.width_of_space * 1.25:
                     res.remove(span_2)
                     span_2 = self.merge_spans(span_1, span_2, self.orientation)
                     res.append(span_2)
@@ -1243,9 +1309,9 @@ class Row:
 
     def get_distance_between_two_spans(self, span_1, span_2, orientation):
         if orientation == 1:
-            return min(abs(span_1['bbox'][1] - span_2['bbox'][3]), abs(span_1['bbox'][3] - span_2['bbox'][1]))
+            return min(abs(span_1.bbox[1] - span_2.bbox[3]), abs(span_1.bbox[3] - span_2.bbox[1]))
         else:
-            return min(abs(span_1['bbox'][0] - span_2['bbox'][2]), abs(span_1['bbox'][2] - span_2['bbox'][0]))
+            return min(abs(span_1.bbox[0] - span_2.bbox[2]), abs(span_1.bbox[2] - span_2.bbox[0]))
 
     def rearangeCells(self):
         if self.orientation == 0 or self.orientation == 2:
@@ -1292,6 +1358,8 @@ class Column:
 
 
 class Cell:
+    __slots__ = ('posX1', 'posY1', 'posX2', 'posY2', 'centerX', 'centerY', 'text', 'id', 'numberOfWords',
+                 'mostCommonTypeOfWord', 'isLabel', 'column', 'row', 'not_activated')
     IDCounter = 0
 
     def __init__(self, coordinates, text, column=None, row=None):
@@ -3,11 +3,12 @@ from __future__ import annotations
 import copy
 from collections import defaultdict
 from typing import List
-from fuzzywuzzy import fuzz
 from app.core.extraction_modul.datamodels.internal_models import TextBlock
+from app.core.extraction_modul.layout_statistics import LayoutContext
+from app.core.extraction_modul.duplicate_detection import TextualDuplicateIndex
 from segtok.segmenter import split_single
 
-from ...detection_models.text_detection import is_grammatically_sentence
+from ...detection_models.text_detection import are_grammatically_sentences
 import app.core.schemas.datamodels as io
 from ..apis.util_functions import check_for_metadata
 import re
@@ -16,11 +17,12 @@ import re
 class Text:
     IDCounter = 0
 
-    def __init__(self, textBlocks, width_of_space: int, distance_between_lines: int, sizes: list, fonts: list):
-        self.width_of_space = width_of_space
-        self.distance_between_lines = distance_between_lines
-        self.sizes = sizes
-        self.fonts = fonts
+    def __init__(self, textBlocks, layout: LayoutContext):
+        self.layout: LayoutContext = layout
+        self.width_of_space = layout.width_of_space
+        self.distance_between_lines = layout.distance_between_lines
+        self.sizes = layout.sizes
+        self.fonts = layout.fonts
         self.textBlocks: List[TextBlock] = textBlocks
         self.fullText: str = ""
         self.abstract: Chapter = None
@@ -88,7 +90,7 @@ class Text:
 
 
     def set_headers(self):
-        lineheight = TextBlock.SIZES[0][0] # the most common height of a line
+        lineheight = self.sizes[0][0] # the most common height of a line
         headers = copy.copy(self.headers)
 
         # Look for the header that is next to a chapter
@@ -216,8 +218,9 @@ class Text:
 
     def remove_empty_chapters(self):
         chapters_to_remove = []
-        for chapter in self._chapters:
-            if not is_grammatically_sentence(chapter.textInChapter):
+        are_sentences: List[bool] = are_grammatically_sentences([chapter.textInChapter for chapter in self._chapters])
+        for chapter, is_sentence in zip(self._chapters, are_sentences):
+            if not is_sentence:
                 chapters_to_remove.append(chapter)
         for chapter in chapters_to_remove:
             self._chapters.remove(chapter)
@@ -226,7 +229,7 @@ class Text:
 
 
     def is_part_of_chapter(self, line, linePosY1, previousFontSizes, previousFonts, previousLinePosY2, textBlock, previousLine) -> bool:
-        normalDistanceBetweenLines: bool = abs(linePosY1 - previousLinePosY2) <= textBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES * 1.25
+        normalDistanceBetweenLines: bool = abs(linePosY1 - previousLinePosY2) <= textBlock.layout.distance_between_lines * 1.25
         startsNotWithNumber: bool = re.search("^ *\d", line.textInLine) is None
         sameFont: bool = any([True for font in line.fontsInLine if font in previousFonts])
         sameFontSize: bool = any([True for fontSize in line.fontSizesInLine if fontSize in previousFontSizes])
@@ -285,8 +288,8 @@ class Text:
         return differentWidths1
 
     def isPartOfPreviousSentence(self, textBlock, relevantTextBlocks):
-        HEIGHT_BETWEEN_LINES = textBlock.NORMAL_DISTANCE_BETWEEN_TWO_LINES
-        WIDTH_BETWEEN_WORDS = textBlock.NORMAL_WIDTH_OF_A_SPACE
+        HEIGHT_BETWEEN_LINES = textBlock.layout.distance_between_lines
+        WIDTH_BETWEEN_WORDS = textBlock.layout.width_of_space
         prevTextBlock = relevantTextBlocks[relevantTextBlocks.index(textBlock) - 1]
 
         endsWithoutPoint: bool = not prevTextBlock.text.rstrip().endswith(".")
@@ -315,14 +318,15 @@ class Text:
 
 
     def checkGrammaticalySentences(self, textBlocks):
-        for textBlock in textBlocks:
-            correctSentences: List[bool] = []
-            sentences = split_single(textBlock.text)
+        # The sentences of all textblocks are checked at once
+        sentencesOfTextBlocks: List[List[str]] = [split_single(textBlock.text) for textBlock in textBlocks]
+        correctSentences: List[bool] = are_grammatically_sentences(
+            [sentence for sentences in sentencesOfTextBlocks for sentence in sentences])
+        start = 0
+        for textBlock, sentences in zip(textBlocks, sentencesOfTextBlocks):
             if len(sentences) == 0: textBlock.isPartOfText = False
-            for sentence in sentences:
-                correctSentences.append(is_grammatically_sentence(sentence))
-
-            if not any(correctSentences): textBlock.isPartOfText = False
+            if not any(correctSentences[start:start + len(sentences)]): textBlock.isPartOfText = False
+            start += len(sentences)
 
         return textBlocks
 
@@ -337,12 +341,15 @@ class Text:
 
     def get_textual_duplicates(self, textBlocks, duplicates, threshold: int = 50, confidence: int = 95) -> List[TextBlock]:
         res = duplicates
-        for textBlock in textBlocks:
+        # Only the textBlocks that share a bucket of the index are compared
+        index = TextualDuplicateIndex([textBlock.text for textBlock in textBlocks], threshold, confidence)
+        for idx, textBlock in enumerate(textBlocks):
             if not textBlock.isPartOfText:
                 continue
             zwerg = [textBlock]
 
-            for textBlock2 in textBlocks:
+            for idx2 in index.get_candidates(idx):
+                textBlock2 = textBlocks[idx2]
 
                 if not textBlock2.isPartOfText:
                     continue
@@ -350,20 +357,9 @@ class Text:
                 if textBlock == textBlock2:
                     continue
 
-                tBlockText1 = re.sub('\W', '', textBlock.text)
-                tBlockText2 = re.sub('\W', '', textBlock2.text)
-
-                if tBlockText1 == tBlockText2:
+                if index.is_duplicate(idx, idx2):
                     zwerg.append(textBlock2)
 
-                elif min(len(tBlockText1) / 2, len(tBlockText2) / 2) < threshold:
-                    if fuzz.ratio(tBlockText1[-threshold:], tBlockText2[-threshold:]) > confidence:
-                        zwerg.append(textBlock2)
-                else:
-                    if fuzz.ratio(tBlockText1[:threshold], tBlockText2[:threshold]) > confidence:
-                        if fuzz.ratio(tBlockText1[-threshold:], tBlockText2[-threshold:]) > confidence:
-                            zwerg.append(textBlock2)
-
             if len(zwerg) > 1:
                 # Deactivate all textBlocks that have the less information (len of text)
                 zwerg.sort(key=lambda x: len(x.text), reverse=True)
@@ -616,7 +612,7 @@ class Chapter:
         :param line:
         :return:
         '''
-        NORMAL_WIDTH = TextBlock.NORMAL_WIDTH_OF_A_SPACE
+        NORMAL_WIDTH = line.layout.width_of_space
         if self.textLines[-1] is line:
             return False
 
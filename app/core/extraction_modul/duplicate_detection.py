@@ -0,0 +1,85 @@
+from __future__ import annotations
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from fuzzywuzzy import fuzz
+
+
+class TextualDuplicateIndex:
+    """
+    Finds the candidates for textual duplicates (e.g. recurring headers or footers) without comparing
+    every text with every other text.
+
+    Two texts are duplicates if their normalized texts are equal or if the ends (the last `threshold` chars)
+    and, for long texts, the beginnings are similar (fuzz.ratio > confidence). So every fuzzy duplicate has
+    an end that differs from the other end by at most a few edits. The ends are split into
+    (number of edits + 1) pieces, which are saved in buckets. Following the pigeonhole principle
+    one of the pieces of a duplicate is not touched by the edits, so it is found in the buckets
+    (at a position shifted by at most the number of edits).
+    The fuzzy comparison is only done for the texts that share a bucket.
+    """
+
+    def __init__(self, texts: List[str], threshold: int = 50, confidence: int = 95):
+        self.threshold: int = threshold
+        self.confidence: int = confidence
+        self.texts: List[str] = [re.sub(r'\W', '', text) for text in texts]
+
+        # fuzz.ratio > confidence allows at most this number of insertions and deletions between two ends.
+        self.max_edits: int = int(2 * threshold * (100 - confidence - 0.5) / 100)
+        self.size_of_piece: int = threshold // (self.max_edits + 1)
+
+        self._exact_buckets: Dict[str, List[int]] = defaultdict(list)
+        self._piece_buckets: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+        for idx, text in enumerate(self.texts):
+            self._exact_buckets[text].append(idx)
+            if self.size_of_piece > 0:
+                for piece in self._get_pieces(text[-threshold:]):
+                    self._piece_buckets[piece].append(idx)
+
+    def get_candidates(self, idx: int) -> List[int]:
+        """ Returns the (sorted) indices of all texts that can be a duplicate of the text. """
+        if self.size_of_piece == 0:
+            return [_ for _ in range(len(self.texts)) if _ != idx]
+
+        text = self.texts[idx]
+        candidates = set(self._exact_buckets[text])
+        for piece in self._get_shifted_pieces(text[-self.threshold:]):
+            candidates.update(self._piece_buckets.get(piece, []))
+        candidates.discard(idx)
+        return sorted(candidates)
+
+    def is_duplicate(self, idx1: int, idx2: int) -> bool:
+        """ Compares two texts like the former pairwise comparison. """
+        text1, text2 = self.texts[idx1], self.texts[idx2]
+        threshold, confidence = self.threshold, self.confidence
+        if text1 == text2:
+            return True
+        elif min(len(text1) / 2, len(text2) / 2) < threshold:
+            return fuzz.ratio(text1[-threshold:], text2[-threshold:]) > confidence
+        else:
+            return fuzz.ratio(text1[:threshold], text2[:threshold]) > confidence and \
+                   fuzz.ratio(text1[-threshold:], text2[-threshold:]) > confidence
+
+    def _get_piece(self, text: str, num: int, shift: int = 0) -> str:
+        """ Returns the num-th piece (counted from the end) of the text. The last piece
+        contains the rest of the text from the beginning. """
+        end = len(text) - num * self.size_of_piece + shift
+        if num == self.max_edits:
+            start = 0
+        else:
+            start = max(0, end - self.size_of_piece)
+        return text[start:end] if end > 0 else ""
+
+    def _get_pieces(self, text: str) -> List[Tuple[int, str]]:
+        pieces = [(num, self._get_piece(text, num)) for num in range(self.max_edits + 1)]
+        return [(num, piece) for num, piece in pieces if len(piece) > 0]
+
+    def _get_shifted_pieces(self, text: str) -> List[Tuple[int, str]]:
+        pieces = set()
+        for num in range(self.max_edits + 1):
+            for shift in range(-self.max_edits, self.max_edits + 1):
+                piece = self._get_piece(text, num, shift)
+                if len(piece) > 0:
+                    pieces.add((num, piece))
+        return list(pieces)
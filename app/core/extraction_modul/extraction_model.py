@@ -9,7 +9,9 @@ from app.core.extraction_modul.datamodels.text_models import Text
 from app.core.extraction_modul.datamodels.table_models import Table
 from app.core.extraction_modul.datamodels.image_models import Image
 from app.core.extraction_modul.datamodels.meta_data_models import Metadata
-from ..detection_models.text_detection import initalize_pos_model
+from app.core.extraction_modul.page_cache import PageCache
+from app.core.extraction_modul.layout_statistics import LayoutContext
+from app.core.extraction_modul.spatial_index import SpatialIndex
 
 
 class PDF_Extraction(BaseModel):
@@ -18,7 +20,10 @@ class PDF_Extraction(BaseModel):
     path_to_pdf: str
     document: fitz.Document = None
     pages: List[fitz.Page] = []
+    page_cache: PageCache = None
+    layout: LayoutContext = None
     textBlocks: List[TextBlock] = Field(default=[])
+    spatial_index: SpatialIndex = None
     numberOfPages: int = -1
     text: Text = None
     tables: List[Table] = []
@@ -84,19 +89,27 @@ class PDF_Extraction(BaseModel):
                :return: Returns True when it was able to extract the data
        """
 
-        initalize_pos_model(True)
         doc = fitz.open(path_to_pdf)
         pages = [doc[i] for i in range(doc.pageCount)]
+        page_cache = PageCache(pages)
 
         max_width, max_height = PDF_Extraction._get_sizes(pages)
+        # Initializes the parameters of the layout that will be used for every textblock
+        layout = LayoutContext.from_page_cache(page_cache, max_width)
         # Initializes the PDF_Extraction
         extract = cls(path_to_pdf=path_to_pdf,
                       document=doc,
                       pages=pages,
+                      page_cache=page_cache,
+                      layout=layout,
                       numberOfPages=doc.pageCount,
                       max_width=max_width,
                       max_height=max_height,
-                      textBlocks=PDF_Extraction._extract_textBlocks(pages, max_width))
+                      textBlocks=PDF_Extraction._extract_textBlocks(page_cache, layout))
+        # The index for all the geometrical queries on the textblocks
+        extract.spatial_index = SpatialIndex(extract.textBlocks)
+        # The text blocks keep only the spans they need, so the cached dicts of the pages are dropped
+        page_cache.clear()
 
         return extract
 
@@ -116,22 +129,19 @@ class PDF_Extraction(BaseModel):
         return int(max_width), int(max_height)
 
     @staticmethod
-    def _extract_textBlocks(pages, max_width) -> List[TextBlock]:
-        """ Extracts the textblocks from the pages. """
+    def _extract_textBlocks(page_cache: PageCache, layout: LayoutContext) -> List[TextBlock]:
+        """ Extracts the textblocks from the pages. Every page will be parsed only once (see PageCache). """
         res = []
 
-        # Initializes Parameters that will be used for every textblock
-        TextBlock.initializeParameters(pages, max_width)
-
         block_id = 0
-        for pageNum, page in enumerate(pages):
-            blocks = TextBlock.update_data(page.getText("dict"))
-            blocks_raw = TextBlock.update_data(page.getText("rawdict"))
+        for pageNum in range(len(page_cache)):
+            blocks = TextBlock.update_data(page_cache.get_dict(pageNum), layout)
+            blocks_raw = TextBlock.update_data(page_cache.get_rawdict(pageNum), layout)
 
             for num, dataBlock in enumerate(blocks["blocks"]):
                 block_id += 1
                 # Datablock is a Text
                 if dataBlock["type"] == 0:
-                    res.append(TextBlock(block_id, pageNum, dataBlock, blocks_raw['blocks'][num]))
+                    res.append(TextBlock(block_id, pageNum, dataBlock, blocks_raw['blocks'][num], layout))
 
         return res
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.core.extraction_modul.page_cache import PageCache
+
+
+class LayoutStatistics:
+    """
+    Collects the statistics of the layout of a document (distances between chars, distances between
+    lines, font sizes and fonts) in a single pass over the pages.
+    The pages are added one after another, only the histograms and the last two elements of the
+    previous page are kept, so the memory does not depend on the size of the document.
+
+    Like in the former implementation every char (line) is compared to the char (line) two positions
+    before it, and the second char (line) of the document is compared to the last one.
+    """
+
+    def __init__(self, width: int):
+        self.width: int = width
+        self._distances_between_chars: Dict[int, int] = defaultdict(int)
+        self._heights_between_lines: Dict[int, int] = defaultdict(int)
+        self._sizes: Dict[int, int] = defaultdict(int)
+        self._fonts: Dict[str, int] = defaultdict(int)
+
+        # The last two chars of the previous pages (x2) and the x1 of the second char of the document.
+        self._number_of_chars: int = 0
+        self._prev_chars_x2: np.ndarray = np.empty(0)
+        self._second_char_x1: float = None
+
+        # The last two lines of the previous pages (page, y1, y2) and the second line of the document.
+        self._number_of_lines: int = 0
+        self._prev_lines: List[Tuple[int, float, float]] = []
+        self._second_line: Tuple[int, float, float] = None
+
+    @classmethod
+    def from_page_cache(cls, page_cache: PageCache, width: int) -> LayoutStatistics:
+        """ Calculates the statistics of all pages of a document. """
+        statistics = cls(width)
+        for pageNum in range(len(page_cache)):
+            statistics.add_page(pageNum, page_cache.get_text_blocks(pageNum))
+        return statistics
+
+    def add_page(self, pageNum: int, text_blocks: List[Dict]) -> None:
+        """ Adds the text blocks (rawdict) of a page to the statistics. """
+        x1: List[float] = []
+        x2: List[float] = []
+        lines: List[Tuple[int, float, float]] = []
+        for textBlock in text_blocks:
+            for line in textBlock['lines']:
+                first_span = line['spans'][0]
+                self._sizes[int(first_span['size'])] += 1
+                self._fonts[first_span['font']] += 1
+                lines.append((pageNum, line['bbox'][1], line['bbox'][3]))
+                for span in line['spans']:
+                    for char in span['chars']:
+                        bbox = char['bbox']
+                        x1.append(bbox[0])
+                        x2.append(bbox[2])
+
+        self._add_chars(np.array(x1, dtype=np.float64), np.array(x2, dtype=np.float64))
+        self._add_lines(lines)
+
+    def _add_chars(self, x1: np.ndarray, x2: np.ndarray) -> None:
+        """ Counts the distances between the chars of a page with vectorized operations. """
+        if len(x1) == 0:
+            return
+        start = self._number_of_chars
+        self._number_of_chars += len(x1)
+        if start <= 1 < self._number_of_chars:
+            self._second_char_x1 = x1[1 - start]
+
+        # Each char i (i >= 2 in the document) is compared with the char i-2
+        all_x2 = np.concatenate([self._prev_chars_x2, x2])
+        offset = len(self._prev_chars_x2)
+        first = max(0, 2 - start)
+        if first < len(x1):
+            indices = np.arange(first, len(x1))
+            deltas = np.trunc(x1[indices] - all_x2[indices + offset - 2]).astype(np.int64)
+            deltas = deltas[(0 <= deltas) & (deltas <= self.width)]
+            self._count_in_order(self._distances_between_chars, deltas)
+
+        self._prev_chars_x2 = all_x2[-2:]
+
+    def _add_lines(self, lines: List[Tuple[int, float, float]]) -> None:
+        """ Counts the distances between the lines of a page. """
+        start = self._number_of_lines
+        self._number_of_lines += len(lines)
+        if start <= 1 < self._number_of_lines:
+            self._second_line = lines[1 - start]
+
+        all_lines = self._prev_lines + lines
+        offset = len(self._prev_lines)
+        for idx in range(max(0, 2 - start), len(lines)):
+            self._count_height(all_lines[idx + offset - 2], lines[idx], self._heights_between_lines)
+
+        self._prev_lines = all_lines[-2:]
+
+    @staticmethod
+    def _count_height(prevLine: Tuple[int, float, float], line: Tuple[int, float, float], heights: Dict) -> None:
+        """ Counts the distance between two lines if they are on the same page and not in the same row. """
+        prevPage, prevY1, prevY2 = prevLine
+        page, y1, y2 = line
+        delta = int(y1 - prevY2)
+        is_in_same_line: bool = y1 <= prevY1 <= y2 or y1 <= prevY2 <= y2 or prevY1 <= y1 <= prevY2
+        if 0 <= delta and prevPage == page and not is_in_same_line:
+            heights[delta] += 1
+
+    @staticmethod
+    def _count_in_order(histogram: Dict[int, int], values: np.ndarray) -> None:
+        """ Adds the values to the histogram. New values are added in the order of their first occurrence. """
+        if len(values) == 0:
+            return
+        unique, first_index, counts = np.unique(values, return_index=True, return_counts=True)
+        for idx in np.argsort(first_index, kind='stable'):
+            histogram[int(unique[idx])] += int(counts[idx])
+
+    @staticmethod
+    def _as_sorted_list(histogram: Dict) -> List[Tuple]:
+        """ Returns the histogram as a list of (value, count) tuples sorted by the count. """
+        values = list(histogram.items())
+        values.sort(key=lambda x: x[1], reverse=True)
+        return values
+
+    @staticmethod
+    def _prepend(histogram: Dict, value) -> Dict:
+        """ Counts a value as if it was the first value added to the histogram. """
+        res = defaultdict(int)
+        res[value] = histogram.get(value, 0) + 1
+        for key, count in histogram.items():
+            if key != value:
+                res[key] = count
+        return res
+
+    def get_distances_between_chars(self) -> List[Tuple[int, int]]:
+        histogram = self._distances_between_chars
+        if self._number_of_chars > 1:
+            # The second char of the document is compared to the last char of the document
+            delta = int(self._second_char_x1 - self._prev_chars_x2[-1])
+            if 0 <= delta <= self.width:
+                histogram = self._prepend(histogram, delta)
+        return self._as_sorted_list(histogram)
+
+    def get_heights_between_lines(self) -> List[Tuple[int, int]]:
+        histogram = self._heights_between_lines
+        if self._number_of_lines > 1:
+            # The second line of the document is compared to the last line of the document
+            heights = defaultdict(int)
+            self._count_height(self._prev_lines[-1], self._second_line, heights)
+            for delta in heights:
+                histogram = self._prepend(histogram, delta)
+        return self._as_sorted_list(histogram)
+
+    def get_sizes(self) -> List[Tuple[int, int]]:
+        return self._as_sorted_list(self._sizes)
+
+    def get_fonts(self) -> List[Tuple[str, int]]:
+        return self._as_sorted_list(self._fonts)
+
+
+class LayoutContext:
+    """
+    The layout parameters of a single document (e.g. the normal width of a space or the normal
+    distance between two lines). The context is created once per document and passed to all
+    the models that need these parameters, so several documents can be processed at the same
+    time in one process.
+    """
+
+    def __init__(self, width_of_space: int = 2, distance_between_lines: int = 2, fonts: List = None,
+                 sizes: List = None):
+        self.width_of_space: int = width_of_space
+        self.distance_between_lines: int = distance_between_lines
+        self.fonts: List[Tuple[str, int]] = fonts if fonts is not None else []
+        self.sizes: List[Tuple[int, int]] = sizes if sizes is not None else []
+        # The boundaries of a page used for the images
+        self.max_height_of_page: int = 9999
+        self.min_height_of_page: int = 0
+        self.max_width_of_page: int = 9999
+        self.min_width_of_page: int = 0
+
+    @classmethod
+    def from_page_cache(cls, page_cache: PageCache, width: int) -> LayoutContext:
+        """ Calculates the layout parameters of a document. """
+        statistics = LayoutStatistics.from_page_cache(page_cache, width)
+        return cls(width_of_space=cls.get_higher_distance(statistics.get_distances_between_chars()),
+                   distance_between_lines=cls.get_higher_distance(statistics.get_heights_between_lines()),
+                   fonts=statistics.get_fonts(),
+                   sizes=statistics.get_sizes())
+
+    @staticmethod
+    def get_higher_distance(values) -> int:
+        # Get the next bigger value to 1
+        if len(values) > 1:
+            # Get the next higher distance to 0
+            _values = [distance for distance, __ in values if distance > 1]
+            return _values[0]
+        else:
+            return 2
+
+    def set_page_coordinates(self, max_height, min_height, max_width, min_width) -> None:
+        self.max_height_of_page = max_height
+        self.min_height_of_page = min_height
+        self.max_width_of_page = max_width
+        self.min_width_of_page = min_width
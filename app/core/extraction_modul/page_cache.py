@@ -0,0 +1,107 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import fitz
+
+from app.core.config import PAGE_CACHE_MAX_BYTES
+
+
+class PageCache:
+    """
+    Holds the parsed content of the pages of a single document.
+    Every page is converted once with PyMuPDF (rawdict) and shared by all the steps that need
+    the content of the page (the statistics of the layout and the creation of the textblocks).
+    The "dict" representation is derived from the "rawdict" representation, so that the page
+    has not to be parsed a second time.
+
+    To keep the memory usage of large documents low, the cache has a (estimated) memory cap.
+    If the cap is reached the least recently used pages will be dropped and rebuild on the
+    next access.
+    """
+
+    # Rough estimation of the memory usage of the PyMuPDF dicts (in bytes)
+    BYTES_PER_CHAR = 600
+    BYTES_PER_SPAN = 1000
+    BYTES_PER_LINE = 500
+
+    def __init__(self, pages: List[fitz.Page], max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.pages: List[fitz.Page] = pages
+        self.max_bytes: int = max_bytes
+        self.size_in_bytes: int = 0
+        self.number_of_extractions: int = 0
+        self._pages: OrderedDict[int, Tuple[Dict, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def get_rawdict(self, pageNum: int) -> Dict:
+        """ Returns the content of the page as extracted by page.getText('rawdict'). """
+        if pageNum in self._pages:
+            self._pages.move_to_end(pageNum)
+            return self._pages[pageNum][0]
+
+        content = self.pages[pageNum].getText("rawdict")
+        self.number_of_extractions += 1
+        size = self._estimate_size(content)
+        self._pages[pageNum] = (content, size)
+        self.size_in_bytes += size
+        self._evict()
+        return content
+
+    def get_dict(self, pageNum: int) -> Dict:
+        """ Returns the content of the page as extracted by page.getText('dict'). """
+        content = self.get_rawdict(pageNum)
+        blocks = []
+        for block in content['blocks']:
+            if block['type'] == 0:
+                block = dict(block)
+                block['lines'] = [self._line_as_dict(line) for line in block['lines']]
+            blocks.append(block)
+
+        return {'width': content['width'],
+                'height': content['height'],
+                'blocks': blocks}
+
+    def get_text_blocks(self, pageNum: int) -> List[Dict]:
+        """ Returns the blocks of type text (rawdict) of a page. """
+        return [block for block in self.get_rawdict(pageNum)['blocks'] if block['type'] == 0]
+
+    def clear(self) -> None:
+        """ Drops all cached pages. """
+        self._pages.clear()
+        self.size_in_bytes = 0
+
+    def _evict(self) -> None:
+        """ Drops the least recently used pages until the cache fits into the memory cap.
+        The most recent page will always be kept. """
+        while self.size_in_bytes > self.max_bytes and len(self._pages) > 1:
+            _, (__, size) = self._pages.popitem(last=False)
+            self.size_in_bytes -= size
+
+    @staticmethod
+    def _line_as_dict(line: Dict) -> Dict:
+        """ Converts a line of the rawdict into a line of the dict (the chars are merged to a text). """
+        line = dict(line)
+        spans = []
+        for span in line['spans']:
+            text = "".join([char['c'] for char in span['chars']])
+            span = {key: value for key, value in span.items() if key != 'chars'}
+            span['text'] = text
+            spans.append(span)
+        line['spans'] = spans
+        return line
+
+    @staticmethod
+    def _estimate_size(content: Dict) -> int:
+        """ Estimates the memory usage of a rawdict. """
+        size = 0
+        for block in content['blocks']:
+            if block['type'] != 0:
+                size += len(block.get('image', b''))
+                continue
+            for line in block['lines']:
+                size += PageCache.BYTES_PER_LINE
+                for span in line['spans']:
+                    size += PageCache.BYTES_PER_SPAN + PageCache.BYTES_PER_CHAR * len(span['chars'])
+        return size
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import math
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+
+class SpatialIndex:
+    """
+    A grid index over the bounding boxes of the elements of a document (e.g. TextBlocks or Lines).
+    Every page is divided into square cells and every element is saved in all the cells its
+    bounding box touches. A query has only to look at the cells of the queried area instead of
+    all the elements of the document.
+
+    The elements need the attributes pageNum, posX1, posY1, posX2 and posY2.
+    All queries return the elements in the order they were added to the index.
+    """
+
+    CELL_SIZE = 50
+
+    def __init__(self, elements: Iterable[Any] = (), cell_size: int = CELL_SIZE):
+        self.cell_size: int = cell_size
+        self._elements: List[Any] = []
+        self._elements_of_page: Dict[int, List[int]] = defaultdict(list)
+        self._grids: Dict[int, Dict[Tuple[int, int], List[int]]] = defaultdict(lambda: defaultdict(list))
+        # The min. and max. cells (x1, y1, x2, y2) that are used on a page
+        self._extents: Dict[int, List[int]] = {}
+        for element in elements:
+            self.insert(element)
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def insert(self, element: Any) -> None:
+        """ Adds an element to the index. """
+        idx = len(self._elements)
+        self._elements.append(element)
+        page = element.pageNum
+        self._elements_of_page[page].append(idx)
+
+        cx1, cy1, cx2, cy2 = self._get_cells(element.posX1, element.posY1, element.posX2, element.posY2)
+        grid = self._grids[page]
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                grid[(cx, cy)].append(idx)
+
+        extent = self._extents.get(page)
+        if extent is None:
+            self._extents[page] = [cx1, cy1, cx2, cy2]
+        else:
+            self._extents[page] = [min(extent[0], cx1), min(extent[1], cy1),
+                                   max(extent[2], cx2), max(extent[3], cy2)]
+
+    def get_page(self, page: int) -> List[Any]:
+        """ Returns all the elements of a page. """
+        return [self._elements[idx] for idx in self._elements_of_page.get(page, [])]
+
+    def query_rect(self, page: int, x1: float, y1: float, x2: float, y2: float) -> List[Any]:
+        """ Returns the elements of a page that intersect the rectangle (including the border).
+        The bounds can be infinite (e.g. to query everything left of a position). """
+        return [self._elements[idx] for idx in self._query(page, x1, y1, x2, y2)
+                if self._intersects(self._elements[idx], x1, y1, x2, y2)]
+
+    def query_contained(self, page: int, x1: float, y1: float, x2: float, y2: float) -> List[Any]:
+        """ Returns the elements of a page that are completely inside the rectangle. """
+        return [element for element in self.query_rect(page, x1, y1, x2, y2)
+                if x1 <= element.posX1 and element.posX2 <= x2 and y1 <= element.posY1 and element.posY2 <= y2]
+
+    def nearest(self, page: int, x: float, y: float, condition: Callable[[Any], bool] = None) -> Any:
+        """ Returns the element of a page with the smallest distance between its bounding box and the point.
+        Only elements that fulfill the condition are considered. If two elements have the same distance,
+        the element that was added first is returned. """
+        extent = self._extents.get(page)
+        if extent is None:
+            return None
+        grid = self._grids[page]
+        cx, cy = self._get_cell(x), self._get_cell(y)
+        max_radius = max(abs(cx - extent[0]), abs(cx - extent[2]), abs(cy - extent[1]), abs(cy - extent[3]))
+
+        best, best_distance = None, math.inf
+        visited: Set[int] = set()
+        for radius in range(max_radius + 1):
+            # Elements in the cells of the ring have at least this distance to the point
+            if best is not None and (radius - 1) * self.cell_size > best_distance:
+                break
+            for cell in self._get_ring(cx, cy, radius):
+                for idx in grid.get(cell, []):
+                    if idx in visited:
+                        continue
+                    visited.add(idx)
+                    element = self._elements[idx]
+                    if condition is not None and not condition(element):
+                        continue
+                    distance = self._distance(element, x, y)
+                    if distance < best_distance or (distance == best_distance and idx < best):
+                        best, best_distance = idx, distance
+        return self._elements[best] if best is not None else None
+
+    def _query(self, page: int, x1: float, y1: float, x2: float, y2: float) -> List[int]:
+        """ Returns the (sorted) ids of all elements in the cells of the rectangle. """
+        extent = self._extents.get(page)
+        if extent is None:
+            return []
+        cx1, cy1 = max(self._get_cell(x1), extent[0]), max(self._get_cell(y1), extent[1])
+        cx2, cy2 = min(self._get_cell(x2), extent[2]), min(self._get_cell(y2), extent[3])
+        grid = self._grids[page]
+        ids: Set[int] = set()
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                ids.update(grid.get((cx, cy), []))
+        return sorted(ids)
+
+    def _get_cell(self, value: float) -> int:
+        if value == math.inf:
+            return 2 ** 31
+        if value == -math.inf:
+            return -2 ** 31
+        return int(math.floor(value / self.cell_size))
+
+    def _get_cells(self, x1: float, y1: float, x2: float, y2: float) -> Tuple[int, int, int, int]:
+        return self._get_cell(min(x1, x2)), self._get_cell(min(y1, y2)), \
+               self._get_cell(max(x1, x2)), self._get_cell(max(y1, y2))
+
+    @staticmethod
+    def _get_ring(cx: int, cy: int, radius: int) -> List[Tuple[int, int]]:
+        """ Returns the cells with the (chebyshev) distance radius to the cell (cx, cy). """
+        if radius == 0:
+            return [(cx, cy)]
+        cells = [(x, cy - radius) for x in range(cx - radius, cx + radius + 1)]
+        cells += [(x, cy + radius) for x in range(cx - radius, cx + radius + 1)]
+        cells += [(cx - radius, y) for y in range(cy - radius + 1, cy + radius)]
+        cells += [(cx + radius, y) for y in range(cy - radius + 1, cy + radius)]
+        return cells
+
+    @staticmethod
+    def _intersects(element: Any, x1: float, y1: float, x2: float, y2: float) -> bool:
+        ex1, ex2 = min(element.posX1, element.posX2), max(element.posX1, element.posX2)
+        ey1, ey2 = min(element.posY1, element.posY2), max(element.posY1, element.posY2)
+        return ex1 <= x2 and x1 <= ex2 and ey1 <= y2 and y1 <= ey2
+
+    @staticmethod
+    def _distance(element: Any, x: float, y: float) -> float:
+        dx = max(element.posX1 - x, 0, x - element.posX2)
+        dy = max(element.posY1 - y, 0, y - element.posY2)
+        return (dx ** 2 + dy ** 2) ** (1 / 2)
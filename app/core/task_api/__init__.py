@@ -1,6 +1,7 @@
 from __future__ import annotations
+import hashlib
 import os
-from typing import Any
+from typing import Any, AsyncIterator, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -9,6 +10,8 @@ import aiofiles
 from ..config import INPUT_DIRECTORY
 from ..extraction_modul.apis import TextStrategy, TableStrategy, MetadataStrategy, ImageStrategy
 from ..extraction_modul.extraction_model import PDF_Extraction
+from .extraction_cache import ExtractionCache
+from .scheduler import JobScheduler
 
 
 textAPI: TextStrategy = TextStrategy()
@@ -37,7 +40,22 @@ class Task:
     @staticmethod
     def execute_pdf_extraction(task_settings: TaskSettings) -> None:
         """ Extracts Text, Tables, Images, and Metadata from the PDF. """
-        data = PDF_Extraction.read_pdf(path_to_pdf=task_settings.path_to_input_file)
+        data = Task.extract_pdf(task_settings.path_to_input_file)
+
+        task_settings.data = data.to_output_model(task_settings.document_id)
+        task_settings.status = 'finished'
+
+    @staticmethod
+    def execute_serialized_pdf_extraction(path_to_pdf: str, document_id: str) -> str:
+        """ Extracts the PDF and returns the output model as JSON.
+        Used by the worker processes, so only a string has to be sent back to the API. """
+        data = Task.extract_pdf(path_to_pdf)
+        return data.to_output_model(document_id).json()
+
+    @staticmethod
+    def extract_pdf(path_to_pdf: str) -> PDF_Extraction:
+        """ Runs all the steps of the extraction on a PDF. """
+        data = PDF_Extraction.read_pdf(path_to_pdf=path_to_pdf)
 
         textAPI.preprocess_data(data)
         tableAPI.preprocess_data(data)
@@ -53,12 +71,10 @@ class Task:
         tableAPI.postprocess_data(data)
         textAPI.postprocess_data(data)
 
+        return data
 
-        task_settings.data = data
-        task_settings.status = 'finished'
-
-async def asy_save_pdf(pdf: str):
-    """ Util function to save a file. """
+async def asy_save_pdf(pdf: str) -> Tuple[str, str]:
+    """ Util function to save a file. Returns the path and the SHA-256 hash of the content. """
     now = datetime.now()
     date_and_time: str = now.strftime('%m_%d_%Y_%H_%M_%S_%f')
     path_to_pdf = os.path.join(INPUT_DIRECTORY, f'./{date_and_time}.pdf')
@@ -67,7 +83,22 @@ async def asy_save_pdf(pdf: str):
         content = await pdf.read()
         await pdf_doc.write(content)
 
-    return path_to_pdf
+    return path_to_pdf, hashlib.sha256(content).hexdigest()
+
+async def asy_save_pdf_stream(chunks: AsyncIterator[bytes]) -> Tuple[str, str]:
+    """ Util function to save a file that is received in chunks, without holding the whole file in the memory.
+    Returns the path and the SHA-256 hash of the content. """
+    now = datetime.now()
+    date_and_time: str = now.strftime('%m_%d_%Y_%H_%M_%S_%f')
+    path_to_pdf = os.path.join(INPUT_DIRECTORY, f'./{date_and_time}.pdf')
+
+    content_hash = hashlib.sha256()
+    async with aiofiles.open(path_to_pdf, 'wb') as pdf_doc:
+        async for chunk in chunks:
+            content_hash.update(chunk)
+            await pdf_doc.write(chunk)
+
+    return path_to_pdf, content_hash.hexdigest()
 
 def save_pdf(pdf: str):
     """ Util function to save a file. """
@@ -89,8 +120,17 @@ class TaskSettings(BaseModel):
                                     description="The path to the input file.")
     path_to_output_file: str = Field(default="",
                                      description="The path to the output file. ")
-    status: str = 'working'
-    data: Any = Field(default=None)
+    status: str = Field(default='queued',
+                        description="The state of the task: 'queued', 'running', 'finished' or 'failed'. ")
+    queued_at: Optional[datetime] = Field(default=None, description="The time the task was queued. ")
+    started_at: Optional[datetime] = Field(default=None, description="The time the task was started. ")
+    finished_at: Optional[datetime] = Field(default=None, description="The time the task was finished or failed. ")
+    data: Any = Field(default=None,
+                      description="The output model (document) of the task. ")
+    serialized_data: str = Field(default=None,
+                                 description="The output model (document) of the task as JSON. ")
+    content_hash: str = Field(default="",
+                              description="The SHA-256 hash of the input file. ")
 
 
     @classmethod
@@ -98,10 +138,11 @@ class TaskSettings(BaseModel):
         """ Creates a new Task asynchronicity. """
         self = cls(**data)
         pdf_file = data['file']
-        pdf_path = await asy_save_pdf(pdf_file)
+        pdf_path, content_hash = await asy_save_pdf(pdf_file)
         log_path = pdf_path.replace('input', 'output').replace('pdf', 'json')
         self.path_to_input_file = pdf_path
         self.path_to_output_file = log_path
+        self.content_hash = content_hash
         return self
 
     @classmethod
@@ -113,6 +154,15 @@ class TaskSettings(BaseModel):
         log_path = pdf_path.replace('input', 'output').replace('pdf', 'json')
         self.path_to_input_file = pdf_path
         self.path_to_output_file = log_path
+        self.content_hash = hashlib.sha256(pdf_file).hexdigest()
+        return self
+
+    @classmethod
+    def from_file(cls, path_to_input_file: str, **data):
+        """ Creates a new Task for a file that is already saved in the INPUT_DIRECTORY. """
+        self = cls(**data)
+        self.path_to_input_file = path_to_input_file
+        self.path_to_output_file = path_to_input_file.replace('input', 'output').replace('pdf', 'json')
         return self
 
     def finish_task(self) -> None:
@@ -124,13 +174,17 @@ class TaskSettings(BaseModel):
 
 
 class TaskBuilder:
-    """ A Builder Class to create Tasksettings. """
+    """ A Builder Class to create Tasksettings.
+    The results of the tasks are cached by the hash of the input file (see ExtractionCache),
+    the other tasks are executed by the JobScheduler. """
 
     # Add here additional Tasks
     tasks = {'pdf_to_data': Task.execute_pdf_extraction}
 
-    def __init__(self):
+    def __init__(self, cache: ExtractionCache = None, scheduler: JobScheduler = None):
         self.tasks = {}
+        self.cache: ExtractionCache = cache if cache is not None else ExtractionCache()
+        self.scheduler: JobScheduler = scheduler if scheduler is not None else JobScheduler()
 
     async def asy_create_task(self, task: str, **args) -> TaskSettings:
         """ Creates a new Task asynchronicity. """
@@ -146,16 +200,48 @@ class TaskBuilder:
         self.tasks[task_settings.document_id] = task
         return task_settings
 
+    def create_task_from_file(self, task: str, path_to_input_file: str, **args) -> TaskSettings:
+        """ Creates a new Task for a file that is already saved (e.g. a streamed upload). """
+        task = TaskBuilder.tasks[task]
+        task_settings = TaskSettings.from_file(path_to_input_file, **args)
+        self.tasks[task_settings.document_id] = task
+        return task_settings
+
     def perform_task(self, task_settings) -> None:
         """ Executes the task as defined in the TaskSettings. """
+        if self.load_from_cache(task_settings):
+            return
         executable = self.tasks[task_settings.document_id]
         executable(task_settings)
+        self.save_to_cache(task_settings)
+
+    def load_from_cache(self, task_settings: TaskSettings) -> bool:
+        """ Finishes the task with the cached result of the same input file, if there is one. """
+        result = self.cache.get(task_settings.content_hash, task_settings.document_id)
+        if result is None:
+            return False
+        task_settings.serialized_data = result
+        task_settings.status = 'finished'
+        return True
+
+    def save_to_cache(self, task_settings: TaskSettings) -> None:
+        """ Saves the result of a finished task in the cache. """
+        if task_settings.status != 'finished':
+            return
+        result = task_settings.serialized_data
+        if result is None:
+            result = task_settings.data.json()
+        self.cache.add(task_settings.content_hash, result)
 
 
 class TaskStatus(BaseModel):
     """ An Model that defines the dataformat for the output. """
-    status: str = Field(description="The Status of the task. This can be either 'working' or 'finished'. "
-                                    "If the status is 'working' the results of the task are not ready for the response."
-                                    "If the status is 'finished' call the api /extraction/get_data/{document_id}.")
+    status: str = Field(description="The Status of the task. This can be 'queued', 'running', 'finished' or 'failed'. "
+                                    "If the status is 'queued' or 'running' the results of the task are not ready "
+                                    "for the response. If the status is 'finished' call the api "
+                                    "/extraction/get_task_extraction/.")
     document_id: str = Field(description="An id specified by the user to distinguish the extraction tasks. ")
+    queued_at: Optional[datetime] = Field(default=None, description="The time the task was queued. ")
+    started_at: Optional[datetime] = Field(default=None, description="The time the task was started. ")
+    finished_at: Optional[datetime] = Field(default=None, description="The time the task was finished or failed. ")
 
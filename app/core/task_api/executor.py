@@ -0,0 +1,91 @@
+from __future__ import annotations
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List
+
+from . import Task, TaskSettings
+from ..config import EXTRACTION_WORKERS
+from ..detection_models.text_detection import NLP_MODELS
+from ..detection_models.table_detection import TABLE_DETECTION_MODELS
+
+
+def initialize_worker() -> None:
+    """ Loads the models once when a worker process is started, so the single extractions
+    do not have to load them again. """
+    NLP_MODELS.warm_up()
+    TABLE_DETECTION_MODELS.warm_up()
+
+
+def _warm_up() -> Dict[str, float]:
+    """ An empty job to start a worker process (and with it the initializer).
+    Returns the load times of the models in the worker. """
+    load_times = dict(NLP_MODELS.load_times)
+    if TABLE_DETECTION_MODELS.is_loaded():
+        load_times['table_detection'] = TABLE_DETECTION_MODELS.load_time
+    return load_times
+
+
+class ExtractionExecutor:
+    """
+    Executes the extractions of the PDFs in a pool of worker processes.
+    The extraction is CPU-bound, so it is moved out of the process of the API; otherwise a
+    single large PDF blocks all the other requests (e.g. the status polls).
+    The workers send the results back as JSON, which is kept as it is (see ResultStore).
+
+    With max_workers = 0 the extraction runs in the calling thread.
+    """
+
+    def __init__(self, max_workers: int = EXTRACTION_WORKERS):
+        self.max_workers: int = max_workers
+        self._pool: ProcessPoolExecutor = None
+        # The load times of the models (in seconds) for each worker
+        self.model_load_times: List[Dict[str, float]] = []
+
+    def start(self) -> None:
+        """ Starts the worker processes and waits until all of them have loaded the models. """
+        if self._pool is not None:
+            return
+        if self.max_workers <= 0:
+            initialize_worker()
+            self.model_load_times = [_warm_up()]
+            return
+        # The processes are spawned, because forking a process with loaded torch models is not safe.
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=initialize_worker)
+        futures = [self._pool.submit(_warm_up) for _ in range(self.max_workers)]
+        self.model_load_times = [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        """ Stops the worker processes. """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, task_settings: TaskSettings) -> Future:
+        """ Submits the extraction of a PDF. If the returned future is done, the results are saved
+        in the TaskSettings and the status is either 'finished' or 'failed'. """
+        if self.max_workers <= 0:
+            future = Future()
+            try:
+                future.set_result(Task.execute_serialized_pdf_extraction(task_settings.path_to_input_file,
+                                                                         task_settings.document_id))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            if self._pool is None:
+                self.start()
+            future = self._pool.submit(Task.execute_serialized_pdf_extraction,
+                                       task_settings.path_to_input_file,
+                                       task_settings.document_id)
+
+        future.add_done_callback(lambda _future: self._set_results(task_settings, _future))
+        return future
+
+    @staticmethod
+    def _set_results(task_settings: TaskSettings, future: Future) -> None:
+        if future.exception() is not None:
+            task_settings.status = 'failed'
+            return
+        task_settings.serialized_data = future.result()
+        task_settings.status = 'finished'
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..config import EXTRACTION_CACHE_DIRECTORY, EXTRACTION_CACHE_MAX_BYTES, PIPELINE_VERSION, SPACY_MODEL, \
+    TABLE_DETECTION_ENABLED, TABLE_DETECTION_DPI, TABLE_RULES_ENABLED, TABLE_RULES_MIN_CONFIDENCE, \
+    TABLE_RULES_MIN_ROWS
+
+
+def get_pipeline_version() -> str:
+    """ Returns a key of the version of the extraction and of the settings that change its results.
+    The cached results of another version will not be used. """
+    settings = [PIPELINE_VERSION, SPACY_MODEL, TABLE_DETECTION_ENABLED, TABLE_DETECTION_DPI, TABLE_RULES_ENABLED,
+                TABLE_RULES_MIN_CONFIDENCE, TABLE_RULES_MIN_ROWS]
+    return hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()[:16]
+
+
+class ExtractionCache:
+    """
+    A persistent cache of the results of the extractions (the documents as JSON), keyed by the hash of
+    the content of the PDF and the version of the pipeline. The same PDF is often submitted again under
+    another document_id, which is then answered from the cache without extracting the PDF again.
+
+    Every result is saved as a file in the directory of the cache. If the cache exceeds the max. size
+    (in bytes), the least recently used results are deleted.
+
+    The directory can be shared by several processes (e.g. the workers of uvicorn): a result that is
+    not known to a process is looked up in the directory. The size is counted by every process for the
+    files it knows, so the directory may exceed the max. size until these files are used by a process.
+
+    With directory = None the cache is disabled.
+    """
+
+    # The age (in seconds) after which an incomplete result (a temporary file) is deleted
+    MAX_AGE_OF_TMP_FILES = 60 * 60
+
+    def __init__(self, directory: Optional[str] = EXTRACTION_CACHE_DIRECTORY,
+                 max_bytes: int = EXTRACTION_CACHE_MAX_BYTES, pipeline_version: str = None):
+        self.directory: Optional[str] = directory
+        self.max_bytes: int = max_bytes
+        self.pipeline_version: str = pipeline_version if pipeline_version is not None else get_pipeline_version()
+        self.size_in_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        # The names of the files and their sizes, from the least to the most recently used
+        self._files: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            self._load_directory()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, content_hash: str, document_id: str) -> Optional[str]:
+        """ Returns the cached result of a PDF (with the given document_id) or None, if there is no result. """
+        if self.directory is None or not content_hash:
+            return None
+        name = self._get_name(content_hash)
+        with self._lock:
+            if name not in self._files and not self._register(name):
+                self.misses += 1
+                return None
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as file:
+                    result = json.load(file)
+                # Saves the access on the disk as well, so the order of the usage survives a restart
+                os.utime(os.path.join(self.directory, name))
+            except (OSError, ValueError):
+                self._delete(name)
+                self.misses += 1
+                return None
+            self._files.move_to_end(name)
+            self.hits += 1
+        result['document_id'] = document_id
+        return json.dumps(result)
+
+    def add(self, content_hash: str, result: str) -> None:
+        """ Saves the result (the document as JSON) of the extraction of a PDF. """
+        if self.directory is None or not content_hash:
+            return
+        name = self._get_name(content_hash)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if name in self._files:
+                self._delete(name)
+            # The file is renamed after it is written, so that an incomplete result is never read
+            # (the name of the temporary file is unique for every process, which shares the directory)
+            path_to_tmp = f'{path}.{os.getpid()}.tmp'
+            with open(path_to_tmp, 'w', encoding='utf-8') as file:
+                file.write(result)
+            os.replace(path_to_tmp, path)
+            self._files[name] = os.path.getsize(path)
+            self.size_in_bytes += self._files[name]
+            self._evict()
+
+    def statistics(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._files),
+                'size_in_bytes': self.size_in_bytes}
+
+    def _get_name(self, content_hash: str) -> str:
+        return f'{content_hash}_{self.pipeline_version}.json'
+
+    def _load_directory(self) -> None:
+        """ Reads the results saved by a former run of the service (ordered by the last usage). """
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for name in os.listdir(self.directory):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+                if name.endswith('.tmp') and time.time() - stat.st_mtime > self.MAX_AGE_OF_TMP_FILES:
+                    # A result that was not completely written (e.g. the process was killed), the newer
+                    # files may be written by another process at the moment
+                    os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            if not name.endswith('.json'):
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._files[name] = size
+            self.size_in_bytes += size
+        self._evict()
+
+    def _register(self, name: str) -> bool:
+        """ Adds a result to the index, that was saved by another process. """
+        try:
+            size = os.path.getsize(os.path.join(self.directory, name))
+        except OSError:
+            return False
+        self._files[name] = size
+        self.size_in_bytes += size
+        return True
+
+    def _evict(self) -> None:
+        """ Deletes the least recently used results until the cache fits into the max. size.
+        The most recent result will always be kept. """
+        while self.size_in_bytes > self.max_bytes and len(self._files) > 1:
+            name = next(iter(self._files))
+            self._delete(name)
+
+    def _delete(self, name: str) -> None:
+        self.size_in_bytes -= self._files.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
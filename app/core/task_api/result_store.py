@@ -0,0 +1,208 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from ..config import RESULT_STORE_MAX_BYTES, RESULT_STORE_MAX_ENTRIES, RESULT_STORE_TTL, RESULT_STORE_PATH
+from ..schemas.datamodels import Document
+
+
+class SerializedDocument:
+    """
+    The output model (document) of a task, rendered once to JSON for all the responses.
+    Every field of the document is kept as a JSON fragment, from which the whole document and the
+    sections of it (e.g. only the images) are joined. The sections have the same format as the
+    output model with only the fields of the section (the other fields have their default values).
+    """
+
+    # The fields of the document in each section
+    SECTIONS = {
+        'document': ('document_id', 'metadata', 'text', 'tables', 'images'),
+        'images': ('document_id', 'images'),
+        'metadata': ('document_id', 'metadata'),
+        'text': ('document_id', 'text'),
+        'tables': ('document_id', 'tables'),
+    }
+
+    def __init__(self, fragments: Dict[str, bytes]):
+        # The JSON of every field of the document
+        self.fragments: Dict[str, bytes] = fragments
+        self.size_in_bytes: int = sum([len(fragment) for fragment in fragments.values()])
+        self.etags: Dict[str, str] = {section: '"' + hashlib.sha1(self.get_section(section)).hexdigest() + '"'
+                                      for section in self.SECTIONS}
+
+    @classmethod
+    def from_json(cls, result: str) -> SerializedDocument:
+        """ Creates the fragments from the JSON of the whole document (as created by Document.json()). """
+        document = json.loads(result)
+        return cls({name: json.dumps(document[name]).encode('utf-8') for name in Document.__fields__})
+
+    def get_section(self, section: str) -> bytes:
+        """ Returns the JSON of a section of the document. """
+        fields = self.SECTIONS[section]
+        res = []
+        for name, field in Document.__fields__.items():
+            fragment = self.fragments[name] if name in fields else json.dumps(field.default).encode('utf-8')
+            res.append(json.dumps(name).encode('utf-8') + b': ' + fragment)
+        return b'{' + b', '.join(res) + b'}'
+
+    def to_json(self) -> str:
+        """ Returns the JSON of the whole document. """
+        return self.get_section('document').decode('utf-8')
+
+
+class ResultStore:
+    """
+    Holds the results of the finished tasks until they are fetched by the clients.
+    Only the serialized output model (see SerializedDocument) is kept, not the extraction itself
+    (with the opened PDF, the pages and the images).
+
+    The results in the memory are limited by a number of entries and a memory cap (in bytes of the JSON).
+    If a limit is reached, the least recently used results are moved to an on-disk store (SQLite),
+    from which they are read (and moved back into the memory) on the next access.
+    Results older than the TTL (in seconds) are dropped in both stores.
+
+    With path = None the evicted results are dropped instead.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_STORE_MAX_BYTES, max_entries: int = RESULT_STORE_MAX_ENTRIES,
+                 ttl: float = RESULT_STORE_TTL, path: Optional[str] = RESULT_STORE_PATH):
+        self.max_bytes: int = max_bytes
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.path: Optional[str] = path
+        self.size_in_bytes: int = 0
+        # document_id -> (serialized document, time of creation)
+        self._results: OrderedDict[str, Tuple[SerializedDocument, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def __contains__(self, document_id: str) -> bool:
+        return self.has(document_id)
+
+    def __len__(self) -> int:
+        """ The number of results in the memory. """
+        return len(self._results)
+
+    def add(self, document_id: str, result: str) -> None:
+        """ Saves the result (the document as JSON) of a task. An older result of the document is replaced. """
+        with self._lock:
+            self._remove(document_id)
+            serialized = SerializedDocument.from_json(result)
+            self._results[document_id] = (serialized, time.time())
+            self.size_in_bytes += serialized.size_in_bytes
+            self._evict()
+
+    def has(self, document_id: str) -> bool:
+        """ Checks if there is an (unexpired) result of a task. Unlike get, the result is not read
+        and not moved back into the memory (e.g. for the polls of the status). """
+        with self._lock:
+            if document_id in self._results:
+                return not self._is_expired(self._results[document_id][1])
+            connection = self._get_connection()
+            if connection is None:
+                return False
+            row = connection.execute("SELECT created FROM results WHERE document_id = ?", (document_id,)).fetchone()
+            return row is not None and not self._is_expired(row[0])
+
+    def get(self, document_id: str) -> Optional[SerializedDocument]:
+        """ Returns the result of a task or None, if there is no (unexpired) result. """
+        with self._lock:
+            if document_id in self._results:
+                result, created = self._results[document_id]
+                if self._is_expired(created):
+                    self._remove(document_id)
+                    return None
+                self._results.move_to_end(document_id)
+                return result
+
+            row = self._read_from_disk(document_id)
+            if row is None:
+                return None
+            result, created = row
+            self._delete_from_disk(document_id)
+            if self._is_expired(created):
+                return None
+            serialized = SerializedDocument.from_json(result)
+            self._results[document_id] = (serialized, created)
+            self.size_in_bytes += serialized.size_in_bytes
+            self._evict()
+            return serialized
+
+    def remove(self, document_id: str) -> None:
+        """ Drops the result of a task. """
+        with self._lock:
+            self._remove(document_id)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _is_expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl
+
+    def _remove(self, document_id: str) -> None:
+        if document_id in self._results:
+            result, _ = self._results.pop(document_id)
+            self.size_in_bytes -= result.size_in_bytes
+        self._delete_from_disk(document_id)
+
+    def _evict(self) -> None:
+        """ Moves the expired and the least recently used results out of the memory, until the limits are kept.
+        The most recent result will always be kept in the memory. """
+        now = time.time()
+        for document_id in [key for key, (_, created) in self._results.items() if now - created > self.ttl]:
+            result, _ = self._results.pop(document_id)
+            self.size_in_bytes -= result.size_in_bytes
+
+        while len(self._results) > 1 and (self.size_in_bytes > self.max_bytes or
+                                          len(self._results) > self.max_entries):
+            document_id, (result, created) = self._results.popitem(last=False)
+            self.size_in_bytes -= result.size_in_bytes
+            self._write_to_disk(document_id, result.to_json(), created)
+
+        if self._get_connection() is not None:
+            self._connection.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            self._connection.commit()
+
+    def _get_connection(self) -> Optional[sqlite3.Connection]:
+        """ Opens the on-disk store on the first use. """
+        if self.path is None:
+            return None
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # The store is used by the threads of the API and by the callbacks of the executor (guarded by the lock)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                     "(document_id TEXT PRIMARY KEY, result TEXT, created REAL)")
+        return self._connection
+
+    def _write_to_disk(self, document_id: str, result: str, created: float) -> None:
+        connection = self._get_connection()
+        if connection is None:
+            return
+        connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (document_id, result, created))
+        connection.commit()
+
+    def _read_from_disk(self, document_id: str) -> Optional[Tuple[str, float]]:
+        connection = self._get_connection()
+        if connection is None:
+            return None
+        return connection.execute("SELECT result, created FROM results WHERE document_id = ?",
+                                  (document_id,)).fetchone()
+
+    def _delete_from_disk(self, document_id: str) -> None:
+        connection = self._get_connection()
+        if connection is None:
+            return
+        connection.execute("DELETE FROM results WHERE document_id = ?", (document_id,))
+        connection.commit()
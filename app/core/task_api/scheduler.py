@@ -0,0 +1,175 @@
+from __future__ import annotations
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from ..config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_CLIENT_QUEUE_SIZE, JOB_CLIENT_PRIORITIES, JOB_HISTORY_SIZE
+
+if TYPE_CHECKING:
+    from . import TaskSettings
+
+
+class QueueFullError(Exception):
+    """ Raised if a job is submitted to a full queue. """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"The queue is full, retry after {retry_after} seconds.")
+        # The estimated time (in seconds) until a place in the queue is free
+        self.retry_after: int = retry_after
+
+
+class JobScheduler:
+    """
+    Schedules the tasks of the TaskBuilder on a fixed number of worker threads.
+
+    The waiting tasks are kept in a queue per client. The queues are bounded in total and per client, so
+    that a single client can not fill the whole queue. The next task is taken from the clients with the
+    highest priority (see JOB_CLIENT_PRIORITIES), between these clients in turns, so that a client with
+    many tasks does not block the other clients. If a queue is full, new tasks are rejected with a
+    QueueFullError (with an estimation when to retry).
+
+    The state of a task moves from 'queued' to 'running' to 'finished' or 'failed', the times of the
+    changes are saved in the TaskSettings. The last finished tasks are kept for the status requests.
+    """
+
+    # The estimated duration (in seconds) of a task, before the first task is done
+    DEFAULT_DURATION = 30.0
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue_size: int = JOB_QUEUE_SIZE,
+                 max_client_queue_size: int = JOB_CLIENT_QUEUE_SIZE, priorities: Dict[str, int] = None,
+                 history_size: int = JOB_HISTORY_SIZE):
+        self.workers: int = max(1, workers)
+        self.max_queue_size: int = max_queue_size
+        self.max_client_queue_size: int = max_client_queue_size
+        self.priorities: Dict[str, int] = priorities if priorities is not None else JOB_CLIENT_PRIORITIES
+        self.history_size: int = history_size
+        self.number_of_running_jobs: int = 0
+        self.number_of_finished_jobs: int = 0
+        self.number_of_failed_jobs: int = 0
+        self.number_of_rejected_jobs: int = 0
+        self.average_duration: float = self.DEFAULT_DURATION
+        # client -> queued tasks (in the order in which the clients are served)
+        self._queues: OrderedDict[str, Deque[Tuple[TaskSettings, Callable]]] = OrderedDict()
+        self._number_of_queued_jobs: int = 0
+        # document_id -> task, of the queued and running tasks and of the last finished tasks
+        self._jobs: OrderedDict[str, TaskSettings] = OrderedDict()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopped: bool = False
+
+    def submit(self, task_settings: TaskSettings, execute: Callable[[TaskSettings], None]) -> None:
+        """ Queues a task. The function execute is called with the task in a worker thread, the task fails
+        if it raises an exception. Raises a QueueFullError if the queue (or the queue of the client) is full. """
+        with self._condition:
+            if self._is_full(task_settings.client):
+                self.number_of_rejected_jobs += 1
+                raise QueueFullError(self.get_retry_after())
+            self._start()
+            task_settings.status = 'queued'
+            task_settings.queued_at = datetime.now()
+            self._queues.setdefault(task_settings.client, deque()).append((task_settings, execute))
+            self._number_of_queued_jobs += 1
+            self._jobs.pop(task_settings.document_id, None)
+            self._jobs[task_settings.document_id] = task_settings
+            self._condition.notify()
+
+    def is_full(self, client: str) -> bool:
+        """ Checks if a task of the client would be rejected. """
+        with self._condition:
+            return self._is_full(client)
+
+    def get_job(self, document_id: str) -> Optional[TaskSettings]:
+        """ Returns the task of a document, if it is queued, running or one of the last finished tasks. """
+        with self._condition:
+            return self._jobs.get(document_id)
+
+    def get_retry_after(self) -> int:
+        """ Estimates the time (in seconds) until the queue has a free place (a worker takes the next task). """
+        return min(3600, max(1, math.ceil(self.average_duration / self.workers)))
+
+    def statistics(self) -> Dict:
+        with self._condition:
+            return {'queued': self._number_of_queued_jobs,
+                    'queued_per_client': {client: len(queue) for client, queue in self._queues.items()},
+                    'running': self.number_of_running_jobs,
+                    'finished': self.number_of_finished_jobs,
+                    'failed': self.number_of_failed_jobs,
+                    'rejected': self.number_of_rejected_jobs,
+                    'max_queue_size': self.max_queue_size,
+                    'max_client_queue_size': self.max_client_queue_size,
+                    'workers': self.workers,
+                    'average_duration': round(self.average_duration, 3)}
+
+    def shutdown(self) -> None:
+        """ Stops the worker threads after their current tasks. The queued tasks are not executed. """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _is_full(self, client: str) -> bool:
+        return (self._number_of_queued_jobs >= self.max_queue_size or
+                len(self._queues.get(client, ())) >= self.max_client_queue_size)
+
+    def _start(self) -> None:
+        """ Starts the worker threads on the first submitted task. """
+        if self._threads:
+            return
+        self._stopped = False
+        for num in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{num}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _pop_next(self) -> Tuple[TaskSettings, Callable]:
+        """ Takes the next task of the clients with the highest priority, the client is moved to the end. """
+        priority = max([self.priorities.get(client, 0) for client in self._queues])
+        client = next(client for client in self._queues if self.priorities.get(client, 0) == priority)
+        queue = self._queues.pop(client)
+        job = queue.popleft()
+        if queue:
+            self._queues[client] = queue
+        self._number_of_queued_jobs -= 1
+        return job
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped and self._number_of_queued_jobs == 0:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                task_settings, execute = self._pop_next()
+                task_settings.status = 'running'
+                task_settings.started_at = datetime.now()
+                self.number_of_running_jobs += 1
+
+            try:
+                execute(task_settings)
+                failed = task_settings.status == 'failed'
+            except Exception:
+                failed = True
+
+            with self._condition:
+                task_settings.status = 'failed' if failed else 'finished'
+                task_settings.finished_at = datetime.now()
+                self.number_of_running_jobs -= 1
+                if failed:
+                    self.number_of_failed_jobs += 1
+                else:
+                    self.number_of_finished_jobs += 1
+                # Moving average of the durations, for the estimation of Retry-After
+                duration = (task_settings.finished_at - task_settings.started_at).total_seconds()
+                self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+                self._forget_finished_jobs()
+
+    def _forget_finished_jobs(self) -> None:
+        """ Keeps only the last finished tasks (the queued and running tasks are always kept). """
+        finished = [document_id for document_id, task in self._jobs.items() if task.status in ('finished', 'failed')]
+        for document_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[document_id]
+
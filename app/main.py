@@ -3,8 +3,9 @@ from typing import List
 
 import uvicorn
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.status import HTTP_429_TOO_MANY_REQUESTS
 
 from routers import extraction
 
@@ -16,9 +17,8 @@ subprocesses: List[subprocess.Popen] = []
 
 @app.on_event("startup")
 async def startup_event():
-    """ Start GrobID in the Background. """
-
-    pass
+    """ Start the worker processes for the extraction. """
+    extraction.extractionExecutor.start()
 
 
 @app.on_event("shutdown")
@@ -26,12 +26,20 @@ def shutdown_event():
     """ Stopp all subprocesses if this program stops. """
     for process in subprocesses:
         process.kill()
+    extraction.taskBuilderAPI.scheduler.shutdown()
+    extraction.extractionExecutor.shutdown()
+    extraction.finished_tasks_database.close()
 
 
 @app.exception_handler(StarletteHTTPException)
 async def custom_http_exception_handler(request, exc):
-    """ Redirects every wrong Request to the docs. """
+    """ Redirects every wrong Request to the docs.
+    Only a rejected task (the queue is full) is answered with 429 and Retry-After, so that the client can retry. """
+    if exc.status_code == HTTP_429_TOO_MANY_REQUESTS:
+        return JSONResponse({'detail': exc.detail}, status_code=exc.status_code, headers=getattr(exc, 'headers', None))
     return RedirectResponse("/docs")
 
 
-uvicorn.run(app, port=8002, host='0.0.0.0')
+# The guard is needed, because the worker processes import this module again.
+if __name__ == '__main__':
+    uvicorn.run(app, port=8002, host='0.0.0.0')
@@ -1,10 +1,19 @@
 import base64
+import os
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
-from fastapi import APIRouter, File, UploadFile, BackgroundTasks, Request, Form, HTTPException, Response
-from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND, HTTP_200_OK
+from fastapi import APIRouter, File, UploadFile, Request, Form, HTTPException, Response, Header
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT, HTTP_404_NOT_FOUND, HTTP_200_OK, \
+    HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST, HTTP_429_TOO_MANY_REQUESTS
 
+from app.core.config import UPLOAD_CHUNK_SIZE
 from app.core.schemas.datamodels import Document
-from app.core.task_api import TaskBuilder, TaskStatus
+from app.core.task_api import TaskBuilder, TaskStatus, TaskSettings, asy_save_pdf_stream
+from app.core.task_api.executor import ExtractionExecutor
+from app.core.task_api.result_store import ResultStore
+from app.core.task_api.scheduler import QueueFullError
 
 from pydantic import BaseModel
 
@@ -13,7 +22,8 @@ router = APIRouter()
 # The APIs necessary for the tasks
 
 taskBuilderAPI: TaskBuilder = TaskBuilder()
-finished_tasks_database = dict()
+extractionExecutor: ExtractionExecutor = ExtractionExecutor()
+finished_tasks_database: ResultStore = ResultStore()
 
 
 class Data(BaseModel):
@@ -23,96 +33,57 @@ class Data(BaseModel):
 
 def get_state(document_id: str):
     """ Gets the state of the document. If the document is ready for the response to the Requester the state finished
-    will be called."""
+    will be called. Otherwise the state of the task in the queue is returned ('working' for an unknown document). """
     if document_id in finished_tasks_database:
         return 'finished'
-    else:
-        return 'working'
-
-
-def get_results(document_id: str) -> Document:
-    """ Returns the results of the document as the outputmodel (document). """
-    return finished_tasks_database[document_id].data.to_output_model(document_id)
-
-
-def get_results_images(document_id: str) -> Document:
-    """ Returns the images of a result of the document as the outputmodel (document). """
-    return finished_tasks_database[document_id].data.to_image_model(document_id)
-
-
-def get_results_metadata(document_id: str) -> Document:
-    """ Returns the metadata of a result of the document as the outputmodel (document). """
-    return finished_tasks_database[document_id].data.to_metadata_model(document_id)
+    task = taskBuilderAPI.scheduler.get_job(document_id)
+    if task is not None and task.status != 'finished':
+        return task.status
+    return 'working'
 
 
-def get_results_text(document_id: str) -> Document:
-    """ Returns the text of a result of the document as the outputmodel (document). """
-    return finished_tasks_database[document_id].data.to_text_model(document_id)
-
-
-def get_results_tables(document_id: str) -> Document:
-    """ Returns the tables of a result of the document as the outputmodel (document). """
-    return finished_tasks_database[document_id].data.to_table_model(document_id)
+def get_results(document_id: str, section: str, if_none_match: Optional[str]) -> Response:
+    """ Returns the pre-rendered JSON of a section of the results of the document (see SerializedDocument).
+    If the client has the current version already (If-None-Match), only the status 304 is returned. """
+    result = finished_tasks_database.get(document_id)
+    if result is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
+                            detail="Document not ready or not found")
+    etag = result.etags[section]
+    if if_none_match is not None and (if_none_match.strip() == '*' or
+                                      etag in [_.strip() for _ in if_none_match.split(',')]):
+        return Response(status_code=HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(content=result.get_section(section), media_type='application/json', headers={'ETag': etag})
 
 
 @router.get('/extraction/get_task_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
+def get_task_extraction(document_id: str, if_none_match: Optional[str] = Header(None)):
     """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+    return get_results(document_id, 'document', if_none_match)
 
 
 @router.get('/extraction/get_image_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
-    """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results_images(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+def get_image_extraction(document_id: str, if_none_match: Optional[str] = Header(None)):
+    """ An API to get the images of the extraction of the task. """
+    return get_results(document_id, 'images', if_none_match)
 
 
 @router.get('/extraction/get_metadata_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
-    """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results_metadata(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+def get_metadata_extraction(document_id: str, if_none_match: Optional[str] = Header(None)):
+    """ An API to get the metadata of the extraction of the task. """
+    return get_results(document_id, 'metadata', if_none_match)
 
 
 @router.get('/extraction/get_text_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
-    """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results_text(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+def get_text_extraction(document_id: str, if_none_match: Optional[str] = Header(None)):
+    """ An API to get the text of the extraction of the task. """
+    return get_results(document_id, 'text', if_none_match)
 
 
 @router.get('/extraction/get_table_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
-    """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results_tables(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+def get_table_extraction(document_id: str, if_none_match: Optional[str] = Header(None)):
+    """ An API to get the tables of the extraction of the task. """
+    return get_results(document_id, 'tables', if_none_match)
 
 
 @router.get('/extraction/has_extraction/')
@@ -126,32 +97,95 @@ def has_extraction(document_id: str, response: Response):
     return {}
 
 
+@router.get('/extraction/statistics/')
+def get_statistics():
+    """ An API to get the statistics of the service (e.g. the depth of the queue and the hits and misses of
+    the extraction cache). """
+    return {'queue': taskBuilderAPI.scheduler.statistics(),
+            'extraction_cache': taskBuilderAPI.cache.statistics()}
 
-@router.get('/extraction/get_task_extraction/', response_model=Document, status_code=HTTP_200_OK)
-def get_task_extraction(document_id: str):
-    """ An API to get the extraction of the task. """
-    state: str = get_state(document_id)
-    if state == 'finished':
-        res: Document = get_results(document_id)
-        return res
-    else:
-        raise HTTPException(status_code=HTTP_404_NOT_FOUND,
-                            detail="Document not ready or not found")
+
+@router.get('/extraction/get_task_status/', response_model=TaskStatus, status_code=HTTP_200_OK)
+def get_task_status(document_id: str):
+    """ An API to get the state of the task (with the times of the changes). """
+    task = taskBuilderAPI.scheduler.get_job(document_id)
+    if task is not None:
+        return TaskStatus(status=get_state(document_id), document_id=document_id, queued_at=task.queued_at,
+                          started_at=task.started_at, finished_at=task.finished_at)
+    if document_id in finished_tasks_database:
+        return TaskStatus(status='finished', document_id=document_id)
+    raise HTTPException(status_code=HTTP_404_NOT_FOUND,
+                        detail="Document not found")
 
 
 @router.post('/extraction/transform_pdf_to_data', response_model=TaskStatus, status_code=HTTP_201_CREATED)
 def transform_pdf_to_text(request: Request,
-                          background_tasks: BackgroundTasks,
                           data: Data
                           ):
     """ An API that extracts Information from a single PDF-Document. """
+    _check_queue(request)
+    file = base64.urlsafe_b64decode(data.file.encode('utf-8'))
+    task = taskBuilderAPI.create_task(task='pdf_to_data',
+                                      client=request.client.host,
+                                      document_id=data.document_id,
+                                      file=file)
+    return _submit_task(task)
+
+
+@router.post('/extraction/upload_pdf', response_model=TaskStatus, status_code=HTTP_201_CREATED)
+async def upload_pdf(request: Request,
+                     document_id: str = Form(...),
+                     file: UploadFile = File(...)
+                     ):
+    """ An API that extracts Information from a single PDF-Document, which is uploaded as multipart/form-data.
+    The file is written in chunks to the input directory (instead of being sent as base64 in a JSON). """
+    _check_queue(request)
+    path_to_pdf, content_hash = await asy_save_pdf_stream(_read_chunks(file))
+    await file.close()
+    # A cache hit reads and stores the whole result, which must not block the event loop
+    return await run_in_threadpool(_create_task_from_upload, request, document_id, path_to_pdf, content_hash)
+
+
+@router.post('/extraction/upload_raw_pdf', response_model=TaskStatus, status_code=HTTP_201_CREATED)
+async def upload_raw_pdf(request: Request,
+                         document_id: str
+                         ):
+    """ An API that extracts Information from a single PDF-Document, which is sent as the body of the request
+    (Content-Type: application/pdf). The body is written in chunks to the input directory, while it is received. """
+    _check_queue(request)
+    path_to_pdf, content_hash = await asy_save_pdf_stream(request.stream())
+    return await run_in_threadpool(_create_task_from_upload, request, document_id, path_to_pdf, content_hash)
+
+
+async def _read_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """ Reads an uploaded file in chunks. """
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _create_task_from_upload(request: Request, document_id: str, path_to_pdf: str, content_hash: str) -> TaskStatus:
+    """ Creates the task for a saved upload and queues the extraction. """
+    if os.path.getsize(path_to_pdf) == 0:
+        os.remove(path_to_pdf)
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                            detail="The uploaded file is empty")
+    task = taskBuilderAPI.create_task_from_file(task='pdf_to_data',
+                                                path_to_input_file=path_to_pdf,
+                                                client=request.client.host,
+                                                document_id=document_id,
+                                                content_hash=content_hash)
+    return _submit_task(task)
+
 
-    _job = dict(
-        status='pending',
-        document_id=data.document_id
-    )
-    background_tasks.add_task(bg_transform_pdf_to_data, request, data.document_id, data.file)
-    return _job
+def _add_finished_task(task: TaskSettings) -> None:
+    """ Saves the result of the task in the database, if the extraction was successful.
+    Only the serialized output model is kept, the task itself is dropped. """
+    if task.status == 'finished':
+        result = task.serialized_data if task.serialized_data is not None else task.data.json()
+        finished_tasks_database.add(task.document_id, result)
 
 
 async def asy_bg_transform_pdf_to_data(request, document_id, file):
@@ -160,20 +194,41 @@ async def asy_bg_transform_pdf_to_data(request, document_id, file):
                                                 document_id=document_id,
                                                 file=file)
 
-    taskBuilderAPI.perform_task(task)
-    finished_tasks_database.update({
-        document_id: task
-    })
+    await run_in_threadpool(_submit_task, task)
 
 
-def bg_transform_pdf_to_data(request, document_id, file):
-    file = base64.urlsafe_b64decode(file.encode('utf-8'))
-    task = taskBuilderAPI.create_task(task='pdf_to_data',
-                                      client=request.client.host,
-                                      document_id=document_id,
-                                      file=file)
+def _check_queue(request: Request) -> None:
+    """ Rejects a request before the upload is saved, if the queue of the tasks (or of the client) is full. """
+    if taskBuilderAPI.scheduler.is_full(request.client.host):
+        _reject(taskBuilderAPI.scheduler.get_retry_after())
+
 
-    taskBuilderAPI.perform_task(task)
-    finished_tasks_database.update({
-        document_id: task
-    })
+def _reject(retry_after: int) -> None:
+    raise HTTPException(status_code=HTTP_429_TOO_MANY_REQUESTS,
+                        detail="Too many tasks, please retry later",
+                        headers={'Retry-After': str(retry_after)})
+
+
+def _submit_task(task: TaskSettings) -> TaskStatus:
+    """ Finishes the task with the cached result of the same PDF or queues the extraction. """
+    if taskBuilderAPI.load_from_cache(task):
+        task.finished_at = datetime.now()
+        _add_finished_task(task)
+    else:
+        try:
+            taskBuilderAPI.scheduler.submit(task, _run_extraction)
+        except QueueFullError as e:
+            os.remove(task.path_to_input_file)
+            _reject(e.retry_after)
+    return TaskStatus(status=task.status, document_id=task.document_id, queued_at=task.queued_at,
+                      started_at=task.started_at, finished_at=task.finished_at)
+
+
+def _run_extraction(task: TaskSettings) -> None:
+    """ Runs the extraction of a task (in a worker thread of the scheduler) and waits for the result.
+    The extraction itself runs in a worker process of the executor. """
+    # The result is set here, because the callbacks of the future (which set it as well) may run after result()
+    task.serialized_data = extractionExecutor.submit(task).result()
+    task.status = 'finished'
+    taskBuilderAPI.save_to_cache(task)
+    _add_finished_task(task)
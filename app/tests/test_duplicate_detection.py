@@ -0,0 +1,42 @@
+from unittest import TestCase
+from ..core.extraction_modul.duplicate_detection import TextualDuplicateIndex
+import random
+
+
+def create_test_setup(seed: int) -> TextualDuplicateIndex:
+    """ Just a helper function to create an index over random texts and slightly changed copies of them. """
+    rand = random.Random(seed)
+
+    def change(text: str) -> str:
+        chars = list(text)
+        for _ in range(rand.randint(0, 3)):
+            pos = rand.randint(0, len(chars))
+            operation = rand.randint(0, 2)
+            if operation == 0:
+                chars.insert(pos, rand.choice('abc'))
+            elif pos < len(chars):
+                if operation == 1:
+                    del chars[pos]
+                else:
+                    chars[pos] = rand.choice('abc')
+        return "".join(chars)
+
+    texts = ["".join(rand.choice('abcd .,') for _ in range(rand.randint(0, 140))) for _ in range(8)]
+    texts += [change(rand.choice(texts)) for _ in range(20)]
+    return TextualDuplicateIndex(texts)
+
+
+class TestTextualDuplicateIndex(TestCase):
+    def test_candidates_contain_all_duplicates(self):
+        for seed in range(50):
+            index = create_test_setup(seed)
+            for idx in range(len(index.texts)):
+                candidates = index.get_candidates(idx)
+                duplicates = [idx2 for idx2 in range(len(index.texts))
+                              if idx2 != idx and index.is_duplicate(idx, idx2)]
+                self.assertTrue(set(duplicates).issubset(candidates))
+
+    def test_texts_are_normalized(self):
+        index = TextualDuplicateIndex(["Journal of Materials, 2019", "Journal of Materials 2019!", "Other"])
+        self.assertTrue(index.is_duplicate(0, 1))
+        self.assertEqual(index.get_candidates(0), [1])
@@ -0,0 +1,36 @@
+from unittest import TestCase
+from ..core.extraction_modul.datamodels.internal_models import TextBlock, RemainingLines
+from ..core.extraction_modul.layout_statistics import LayoutContext
+from types import SimpleNamespace
+
+
+def create_line(text: str, x1: float, y1: float, x2: float, y2: float):
+    return {'dir': (1, 0), 'bbox': (x1, y1, x2, y2),
+            'spans': [{'bbox': (x1, y1, x2, y2), 'text': text, 'font': 'Times', 'size': 9}]}
+
+
+class TestLinesOfTextBlock(TestCase):
+    def setUp(self):
+        # Two rows of a table, the cells of the rows are mixed in the block
+        self.lines = [create_line("Temperature", 0, 0, 50, 10),
+                      create_line("Load", 0, 12, 20, 22),
+                      create_line("25", 60, 0, 70, 10),
+                      create_line("17", 60, 12, 70, 22),
+                      create_line("C", 70.5, 1, 75, 10)]
+        self.textBlock = SimpleNamespace(layout=LayoutContext(width_of_space=2, distance_between_lines=4))
+
+    def test_lines_in_the_same_row_are_merged(self):
+        lines = TextBlock.extractLinesOfTextBlock(self.textBlock, {'lines': self.lines}, 0)
+        self.assertEqual([line.textInLine for line in lines], ["Temperature 25C", "Load 17"])
+        self.assertEqual([line.position for line in lines], [(0, 0, 75, 10), (0, 12, 70, 22)])
+        self.assertEqual([len(line.spans) for line in lines], [3, 2])
+
+    def test_remaining_lines(self):
+        remaining = RemainingLines(self.lines)
+        self.assertIs(remaining.pop_first(), self.lines[0])
+        self.assertEqual(remaining.get_lines_in_row(0, 10, 2), [2, 4])
+        self.assertIsNone(remaining.get_previous(1))
+        remaining.remove_all([self.lines[2], self.lines[4]])
+        self.assertEqual(len(remaining), 2)
+        self.assertEqual(remaining.get_lines_in_row(0, 10, 2), [])
+        self.assertIs(remaining.get_previous(3), self.lines[1])
@@ -0,0 +1,67 @@
+from unittest import TestCase
+from ..core.extraction_modul.apis.util_functions import MetadataMatcher
+import json
+import os
+import tempfile
+
+
+def create_test_setup(patterns: dict) -> (str, MetadataMatcher):
+    """ Just a helper function to create a matcher for a temporary pattern file. """
+    path = os.path.join(tempfile.mkdtemp(), 'meta_data_pattern.json')
+    with open(path, 'w') as file:
+        json.dump(patterns, file)
+    return path, MetadataMatcher(path)
+
+
+class TestMetadataMatcher(TestCase):
+    def test_match_returns_pattern(self):
+        path, matcher = create_test_setup({"email": "[a-z]+@[a-z]+\\.[a-z]+", "university": "universit(y|ies)"})
+        self.assertEqual(matcher.match("Contact: Mail@Example.org"), "email")
+        self.assertEqual(matcher.match("Technical University of Munich"), "university")
+        self.assertIsNone(matcher.match("The samples were heated."))
+
+    def test_classify(self):
+        path, matcher = create_test_setup({"doi": "doi(:[0-9]+|\\.org)"})
+        self.assertEqual(matcher.classify(["https://doi.org/10.1016", "no metadata"]), ["doi", None])
+
+    def test_reload_on_change(self):
+        path, matcher = create_test_setup({"journal": "journal"})
+        self.assertIsNone(matcher.match("keywords: steel"))
+        with open(path, 'w') as file:
+            json.dump({"keywords": "keyword"}, file)
+        os.utime(path, (0, 0))
+        matcher.RELOAD_INTERVAL = 0
+        self.assertEqual(matcher.match("keywords: steel"), "keywords")
+
+    def test_reload_during_match(self):
+        path, matcher = create_test_setup({"journal": "journal", "keywords": "keyword"})
+        matcher.RELOAD_INTERVAL = 0
+        get_regex = matcher._get_regex
+
+        def get_regex_and_reload():
+            # The file is changed by another thread after the patterns were taken for the match
+            patterns = get_regex()
+            with open(path, 'w') as file:
+                json.dump({"keywords": "keyword"}, file)
+            os.utime(path, (0, 0))
+            get_regex()
+            return patterns
+
+        matcher._get_regex = get_regex_and_reload
+        self.assertEqual(matcher.match("keywords: steel"), "keywords")
+        matcher._get_regex = get_regex
+        self.assertEqual(matcher.match("keywords: steel"), "keywords")
+        self.assertIsNone(matcher.match("journal of materials"))
+
+    def test_invalid_file_keeps_patterns(self):
+        path, matcher = create_test_setup({"journal": "journal"})
+        matcher.RELOAD_INTERVAL = 0
+        self.assertEqual(matcher.match("journal of materials"), "journal")
+        with open(path, 'w') as file:
+            file.write('{"keywords": "keyw')
+        os.utime(path, (0, 0))
+        self.assertEqual(matcher.match("journal of materials"), "journal")
+        with open(path, 'w') as file:
+            json.dump({"keywords": "keyword"}, file)
+        os.utime(path, (0, 0))
+        self.assertEqual(matcher.match("keywords: steel"), "keywords")
@@ -0,0 +1,80 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ..core.detection_models import text_detection
+from ..core.detection_models.text_detection import NLPModelRegistry, SENTENCE_CACHE, are_grammatically_sentences, \
+    is_grammatically_sentence, TYPE_FREQUENCY_CACHE, get_type_frequencies, get_type_frequency, NLP_MODELS, \
+    _get_type_frequency_with_spacy
+
+
+class TestNLPModelRegistry(TestCase):
+    def test_model_is_loaded_once(self):
+        registry = NLPModelRegistry()
+        self.assertFalse(registry.is_loaded('blank:en'))
+        model = registry.get('blank:en')
+        self.assertTrue(registry.is_loaded('blank:en'))
+        self.assertIs(model, registry.get('blank:en'))
+        self.assertIn('blank:en', registry.load_times)
+
+    def test_warm_up(self):
+        registry = NLPModelRegistry()
+        registry.warm_up('blank:en')
+        self.assertTrue(registry.is_loaded('blank:en'))
+
+
+class TestGrammaticallySentences(TestCase):
+    SENTENCES = ["The sample was heated in the furnace.",
+                 "  The   sample was heated in the furnace. ",
+                 "Fig. 1",
+                 "Table 2: Results",
+                 "",
+                 "We measured the hardness of the alloys."]
+
+    def test_batch_equals_single_sentences(self):
+        SENTENCE_CACHE.clear()
+        batch = are_grammatically_sentences(self.SENTENCES)
+        SENTENCE_CACHE.clear()
+        single = [is_grammatically_sentence(sentence) for sentence in self.SENTENCES]
+        self.assertEqual(batch, single)
+
+    def test_sentences_are_memoized(self):
+        SENTENCE_CACHE.clear()
+        are_grammatically_sentences(self.SENTENCES)
+        # Empty sentences are not cached and the two first sentences are equal after the normalization
+        self.assertEqual(len(SENTENCE_CACHE), 4)
+        are_grammatically_sentences(self.SENTENCES)
+        self.assertEqual(len(SENTENCE_CACHE), 4)
+
+    def test_cached_sentences_survive_a_full_cache(self):
+        SENTENCE_CACHE.clear()
+        sentence = text_detection._normalize_sentence(self.SENTENCES[0])
+        SENTENCE_CACHE[(sentence, 1, 2)] = True
+        with patch.object(text_detection, 'MAX_CACHED_SENTENCES', 2):
+            # The cache is cleared while the other sentences are checked
+            self.assertTrue(are_grammatically_sentences(self.SENTENCES)[0])
+
+
+class TestTypeFrequency(TestCase):
+    CELLS = [" ", "N/A", "12.5", "1,000", "Temperature", "Sample A", "Tensile strength", "±0.5"]
+
+    def test_fast_path_equals_spacy(self):
+        TYPE_FREQUENCY_CACHE.clear()
+        nlp = NLP_MODELS.get()
+        expected = [_get_type_frequency_with_spacy(nlp, text) for text in self.CELLS]
+        self.assertEqual(get_type_frequencies(self.CELLS), expected)
+
+    def test_placeholder_cell(self):
+        self.assertEqual(get_type_frequency(" "), (0, [("UNKNOWN", 1)]))
+
+    def test_cells_are_cached(self):
+        TYPE_FREQUENCY_CACHE.clear()
+        get_type_frequencies(self.CELLS + [" ", " "])
+        self.assertEqual(len(TYPE_FREQUENCY_CACHE), len(self.CELLS))
+
+    def test_cached_cells_survive_a_full_cache(self):
+        TYPE_FREQUENCY_CACHE.clear()
+        expected = get_type_frequencies(self.CELLS)
+        with patch.object(text_detection, 'MAX_CACHED_CELLS', 2):
+            TYPE_FREQUENCY_CACHE.clear()
+            get_type_frequencies(self.CELLS[:2])
+            # The cache is cleared while the other cells are processed
+            self.assertEqual(get_type_frequencies(self.CELLS), expected)
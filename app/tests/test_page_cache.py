@@ -0,0 +1,47 @@
+from unittest import TestCase
+from ..core.extraction_modul.page_cache import PageCache
+import fitz
+import os
+
+PATH_TO_TEST_FILES = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'testfiles')
+
+
+def create_test_setup(max_bytes: int = None) -> (fitz.Document, PageCache):
+    """ Just a helper function to create a page cache for the first test document.
+    The document has to be returned as well, otherwise the pages will be orphaned. """
+    path = os.path.join(PATH_TO_TEST_FILES, '10_12_2021_17_12_48_958304.pdf')
+    doc = fitz.open(path)
+    pages = [doc[i] for i in range(doc.pageCount)]
+    if max_bytes is None:
+        return doc, PageCache(pages)
+    return doc, PageCache(pages, max_bytes)
+
+
+class TestPageCache(TestCase):
+    def test_pages_are_parsed_once(self):
+        doc, page_cache = create_test_setup()
+        for pageNum in range(len(page_cache)):
+            page_cache.get_rawdict(pageNum)
+            page_cache.get_text_blocks(pageNum)
+            page_cache.get_dict(pageNum)
+        self.assertEqual(page_cache.number_of_extractions, len(page_cache))
+
+    def test_dict_equals_pymupdf_dict(self):
+        doc, page_cache = create_test_setup()
+        page = page_cache.pages[0]
+        expected = page.getText("dict")
+        blocks = page_cache.get_dict(0)['blocks']
+        self.assertEqual(len(expected['blocks']), len(blocks))
+        for expected_block, block in zip(expected['blocks'], blocks):
+            if block['type'] != 0:
+                continue
+            for expected_line, line in zip(expected_block['lines'], block['lines']):
+                self.assertEqual([_['text'] for _ in expected_line['spans']], [_['text'] for _ in line['spans']])
+
+    def test_memory_cap(self):
+        doc, page_cache = create_test_setup(max_bytes=1)
+        for pageNum in range(len(page_cache)):
+            page_cache.get_rawdict(pageNum)
+        # Only the most recent page is kept, the other pages will be rebuild
+        page_cache.get_rawdict(0)
+        self.assertEqual(page_cache.number_of_extractions, len(page_cache) + 1)
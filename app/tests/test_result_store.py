@@ -0,0 +1,96 @@
+from unittest import TestCase
+from ..core.schemas.datamodels import Document, Image, MetaData, Author, Text
+from ..core.task_api.result_store import ResultStore, SerializedDocument
+import json
+import os
+import tempfile
+import time
+
+
+def create_document(document_id: str) -> Document:
+    """ Creates a small output model (document). """
+    return Document(document_id=document_id,
+                    metadata=MetaData(title="Tensile strength", authors=[Author(first_name="A", last_name="B")]),
+                    text=Text(chapters=[], title="Tensile strength"),
+                    images=[Image(base64_file="aGVsbG8=", description="Fig. 1", name="image_1")])
+
+
+class TestSerializedDocument(TestCase):
+    def assert_same_json(self, section: bytes, document: Document):
+        self.assertEqual(json.loads(section), json.loads(document.json()))
+
+    def test_sections_equal_output_model(self):
+        document = create_document('d')
+        serialized = SerializedDocument.from_json(document.json())
+        self.assert_same_json(serialized.get_section('document'), document)
+        self.assert_same_json(serialized.get_section('images'), Document(images=document.images, document_id='d'))
+        self.assert_same_json(serialized.get_section('metadata'), Document(metadata=document.metadata, document_id='d'))
+        self.assert_same_json(serialized.get_section('text'), Document(text=document.text, document_id='d'))
+        self.assert_same_json(serialized.get_section('tables'), Document(tables=document.tables, document_id='d'))
+
+    def test_etags(self):
+        serialized = SerializedDocument.from_json(create_document('d').json())
+        self.assertEqual(serialized.etags, SerializedDocument.from_json(create_document('d').json()).etags)
+        self.assertNotEqual(serialized.etags['images'], serialized.etags['metadata'])
+        other = SerializedDocument.from_json(create_document('e').json())
+        self.assertNotEqual(serialized.etags['document'], other.etags['document'])
+
+
+class TestResultStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_least_recently_used_results_are_moved_to_disk(self):
+        # The memory cap is large enough for a single document
+        max_bytes = int(SerializedDocument.from_json(create_document('a').json()).size_in_bytes * 1.5)
+        store = ResultStore(max_bytes=max_bytes, max_entries=2, ttl=60, path=self.path)
+        store.add('a', create_document('a').json())
+        store.add('b', create_document('b').json())
+        self.assertEqual(len(store), 1)
+        self.assertLessEqual(store.size_in_bytes, max_bytes)
+        # The evicted result is read from the disk and moved back into the memory
+        self.assertEqual(json.loads(store.get('a').to_json()), json.loads(create_document('a').json()))
+        self.assertEqual(json.loads(store.get('b').to_json()), json.loads(create_document('b').json()))
+        self.assertEqual(len(store), 1)
+        store.close()
+
+    def test_has_does_not_move_results_back(self):
+        max_bytes = int(SerializedDocument.from_json(create_document('a').json()).size_in_bytes * 1.5)
+        store = ResultStore(max_bytes=max_bytes, max_entries=2, ttl=60, path=self.path)
+        store.add('a', create_document('a').json())
+        store.add('b', create_document('b').json())
+        self.assertTrue(store.has('a'))
+        self.assertTrue(store.has('b'))
+        self.assertFalse(store.has('c'))
+        # 'a' is still on the disk and 'b' in the memory
+        self.assertEqual(list(store._results), ['b'])
+        store.close()
+
+    def test_max_entries(self):
+        store = ResultStore(max_bytes=10000, max_entries=2, ttl=60, path=None)
+        for document_id in ['a', 'b', 'c']:
+            store.add(document_id, create_document(document_id).json())
+        self.assertEqual(len(store), 2)
+        self.assertNotIn('a', store)
+        self.assertIn('c', store)
+
+    def test_expired_results_are_dropped(self):
+        store = ResultStore(max_bytes=300, max_entries=10, ttl=0.05, path=self.path)
+        store.add('a', create_document('a').json())
+        store.add('b', create_document('b').json())
+        time.sleep(0.1)
+        self.assertIsNone(store.get('a'))
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.size_in_bytes, 0)
+        store.close()
+
+    def test_result_is_replaced(self):
+        store = ResultStore(max_bytes=10000, max_entries=10, ttl=60, path=None)
+        store.add('a', Document(document_id='a').json())
+        store.add('a', create_document('a').json())
+        self.assertEqual(json.loads(store.get('a').to_json()), json.loads(create_document('a').json()))
+        self.assertEqual(store.size_in_bytes, SerializedDocument.from_json(create_document('a').json()).size_in_bytes)
@@ -0,0 +1,53 @@
+from unittest import TestCase
+from ..core.extraction_modul.spatial_index import SpatialIndex
+import math
+import random
+
+
+class Box:
+    def __init__(self, pageNum, posX1, posY1, posX2, posY2):
+        self.pageNum = pageNum
+        self.posX1 = posX1
+        self.posY1 = posY1
+        self.posX2 = posX2
+        self.posY2 = posY2
+
+
+def create_test_setup(number_of_boxes: int = 300) -> (list, SpatialIndex):
+    """ Just a helper function to create an index over random boxes on two pages. """
+    rand = random.Random(42)
+    boxes = []
+    for _ in range(number_of_boxes):
+        x1, y1 = rand.randint(0, 600), rand.randint(0, 800)
+        boxes.append(Box(rand.randint(0, 1), x1, y1, x1 + rand.randint(0, 200), y1 + rand.randint(0, 40)))
+    return boxes, SpatialIndex(boxes)
+
+
+class TestSpatialIndex(TestCase):
+    RECTS = [(0, 0, 100, 100), (250, 300, 400, 350), (-math.inf, 100, 300, 200), (500, -math.inf, math.inf, math.inf)]
+
+    def test_query_rect_equals_full_scan(self):
+        boxes, index = create_test_setup()
+        for page in [0, 1]:
+            for x1, y1, x2, y2 in self.RECTS:
+                expected = [box for box in boxes if box.pageNum == page and
+                            box.posX1 <= x2 and x1 <= box.posX2 and box.posY1 <= y2 and y1 <= box.posY2]
+                self.assertEqual(index.query_rect(page, x1, y1, x2, y2), expected)
+
+    def test_query_contained(self):
+        boxes, index = create_test_setup()
+        for x1, y1, x2, y2 in self.RECTS:
+            expected = [box for box in boxes if box.pageNum == 0 and
+                        x1 <= box.posX1 and box.posX2 <= x2 and y1 <= box.posY1 and box.posY2 <= y2]
+            self.assertEqual(index.query_contained(0, x1, y1, x2, y2), expected)
+
+    def test_nearest_equals_full_scan(self):
+        boxes, index = create_test_setup(50)
+        for x, y in [(0, 0), (300, 400), (900, 900), (-100, 50)]:
+            distances = [(SpatialIndex._distance(box, x, y), num) for num, box in enumerate(boxes) if box.pageNum == 1]
+            self.assertIs(index.nearest(1, x, y), boxes[min(distances)[1]])
+
+    def test_get_page(self):
+        boxes, index = create_test_setup()
+        self.assertEqual(index.get_page(1), [box for box in boxes if box.pageNum == 1])
+        self.assertEqual(index.get_page(5), [])
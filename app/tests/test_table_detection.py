@@ -0,0 +1,47 @@
+from unittest import TestCase
+from ..core.detection_models.table_detection import TableDetectionModelManager
+from ..core.detection_models.table_rules import TABLE_REGION_PROPOSER
+import sys
+
+
+class TestTableDetectionModelManager(TestCase):
+    def test_model_is_not_loaded_on_import(self):
+        from ..core.extraction_modul.apis import TableStrategy
+        self.assertNotIn('mmdet.apis', sys.modules)
+
+    def test_disabled_table_detection(self):
+        manager = TableDetectionModelManager(enabled=False)
+        manager.warm_up()
+        self.assertFalse(manager.is_loaded())
+        self.assertRaises(RuntimeError, manager.get)
+
+
+class TestTableRegionProposer(TestCase):
+    def get_proposals(self, path: str, page: int):
+        from ..core.extraction_modul.apis import TableStrategy
+        from ..core.extraction_modul.extraction_model import PDF_Extraction
+        data = PDF_Extraction.read_pdf(path)
+        TableStrategy().identify_table_descriptions(data)
+        descriptions = [textBlock for textBlock in data.tableDescriptions if textBlock.pageNum == page]
+        proposals = TABLE_REGION_PROPOSER.propose(data.document.load_page(page), descriptions,
+                                                  data.spatial_index.get_page(page), data.layout)
+        return proposals, descriptions
+
+    def test_ruled_table_below_caption(self):
+        proposals, descriptions = self.get_proposals('testfiles/10_12_2021_17_14_25_406443.pdf', 0)
+        self.assertTrue(TABLE_REGION_PROPOSER.is_confident(proposals, descriptions))
+        self.assertEqual(len(proposals), 1)
+        # The table is between the top and the bottom rule
+        self.assertAlmostEqual(proposals[0]['y1'], 651, delta=2)
+        self.assertAlmostEqual(proposals[0]['y2'], 681, delta=2)
+        self.assertEqual(proposals[0]['page'], 0)
+
+    def test_caption_without_table(self):
+        # The text block starting with "Table 1 summarizes" is no caption, so no table follows
+        proposals, descriptions = self.get_proposals('testfiles/10_12_2021_17_13_20_823533.pdf', 1)
+        self.assertFalse(TABLE_REGION_PROPOSER.is_confident(proposals, descriptions))
+
+    def test_merge_segments_of_ruling_lines(self):
+        lines = [(10, 100, 50, 100.5), (50.5, 100, 90, 100.5), (10, 120, 90, 120.5)]
+        self.assertEqual(TABLE_REGION_PROPOSER.merge_lines(lines, 0),
+                         [(10, 100, 90, 100.5), (10, 120, 90, 120.5)])
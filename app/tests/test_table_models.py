@@ -0,0 +1,165 @@
+from unittest import TestCase
+from ..core.detection_models.table_rules import TABLE_REGION_PROPOSER
+from ..core.extraction_modul.apis import TableStrategy
+from ..core.extraction_modul.datamodels.internal_models import Span
+from ..core.extraction_modul.datamodels.table_models import Table, Row, Column, Cell
+from ..core.extraction_modul.extraction_model import PDF_Extraction
+from ..core.extraction_modul.layout_statistics import LayoutContext
+from types import SimpleNamespace
+import copy
+import os
+import random
+
+
+def update_cell_positions_pairwise(table: Table) -> None:
+    """ The former implementation of Table.update_cell_positions, which compares every cell with every
+    grid element in every step. """
+    containers = []
+    for row in table.rows:
+        for column in table.columns:
+            x1, x2, y1, y2 = column.posX1, column.posX2, row.posY1, row.posY2
+            containers.append((x1 + (x2 - x1) / 2, y1 + (y2 - y1) / 2))
+
+    distances = {}
+    for cell in table.cells:
+        distances[cell] = {}
+        for container in containers:
+            distances[cell][container] = ((cell.centerX - container[0]) ** 2 +
+                                          (cell.centerY - container[1]) ** 2) ** (1 / 2)
+
+    new_rows = []
+    for row in table.rows:
+        new_row = Row(row.rowNumber, line=None, table=row.table)
+        new_row.posX1, new_row.posY1, new_row.posX2, new_row.posY2 = row.posX1, row.posY1, row.posX2, row.posY2
+        new_rows.append(new_row)
+        for column in table.columns:
+            new_row.cells.append(Cell((column.posX1, row.posY1, column.posX2, row.posY2), " ", row, None))
+
+    while any([_.not_activated for _ in table.cells]):
+        options = []
+        for cell in table.cells:
+            if cell.not_activated:
+                cell_options = sorted([(distance, key, cell) for key, distance in distances[cell].items()],
+                                      key=lambda x: x[0])
+                options.append(cell_options[0])
+        options.sort(key=lambda x: x[0])
+        key, cell = options[0][1], options[0][2]
+        for row in new_rows:
+            for _cell in row.cells:
+                if _cell.posX1 <= key[0] <= _cell.posX2 and _cell.posY1 <= key[1] <= _cell.posY2:
+                    _cell.text = cell.text
+                    _cell.mostCommonTypeOfWord = cell.mostCommonTypeOfWord
+                    _cell.numberOfWords = cell.numberOfWords
+                    cell.not_activated = False
+
+    table.rows = new_rows
+    for num, column in enumerate(table.columns):
+        for row in table.rows:
+            column.cells.append(row.cells[num])
+
+
+def get_grid(table: Table):
+    rows = [[(cell.text, cell.posX1, cell.posY1, cell.posX2, cell.posY2, cell.mostCommonTypeOfWord)
+             for cell in row.cells] for row in table.rows]
+    columns = [[cell.text for cell in column.cells] for column in table.columns]
+    return rows, columns
+
+
+def get_test_tables():
+    """ Creates the tables of the test files from the regions proposed by the rules. """
+    tables = []
+    table_api = TableStrategy()
+    for dir, _, files in os.walk('testfiles'):
+        for file in sorted(files):
+            if not file.endswith(".pdf"):
+                continue
+            data = PDF_Extraction.read_pdf(os.path.join(dir, file))
+            table_api.identify_table_descriptions(data)
+            for page in sorted(set([textBlock.pageNum for textBlock in data.tableDescriptions])):
+                descriptions = [_ for _ in data.tableDescriptions if _.pageNum == page]
+                for boundary in TABLE_REGION_PROPOSER.propose(data.document.load_page(page), descriptions,
+                                                              data.spatial_index.get_page(page), data.layout):
+                    x1, y1, x2, y2 = boundary['x1'], boundary['y1'], boundary['x2'], boundary['y2']
+                    textBlocks = [_ for _ in data.spatial_index.get_page(page) if _.is_part_of(page, x1, y1, x2, y2)]
+                    if len(textBlocks) == 0:
+                        continue
+                    table = Table(descriptions[0], textBlocks, x1, y1, x2, y2, data.layout)
+                    table.create_rows()
+                    table.create_cells()
+                    table.setColumns(x1, y1, x2, y2)
+                    tables.append(table)
+    return tables
+
+
+def create_random_table(number_of_rows: int, number_of_columns: int) -> Table:
+    """ Creates a table with shifted, overlapping and missing cells. """
+    table = Table(SimpleNamespace(pageNum=0, isPartOfTable=False), [], 0, 0, 1000, 1000, LayoutContext())
+    for num in range(number_of_rows):
+        row = Row(num, None, table)
+        row.posY1 = num * 20 + random.randint(-3, 3)
+        row.posY2 = row.posY1 + random.choice([10, 12, 25])
+        for column_number in range(number_of_columns):
+            if random.random() < 0.8:
+                x = column_number * 60 + random.randint(-25, 25)
+                cell = Cell((x, row.posY1 + random.randint(-4, 4), x + random.randint(5, 70), row.posY2),
+                            random.choice(["1.5", "abc", "x y", "12 %"]))
+                row.cells.append(cell)
+                table.cells.append(cell)
+        table.rows.append(row)
+    positions = sorted(set([random.randint(0, 500) for _ in range(number_of_columns)]))
+    table.columns = [Column(num, x, x + random.choice([30, 60, 90]), 0, 0, table) for num, x in enumerate(positions)]
+    return table
+
+
+class TestUpdateCellPositions(TestCase):
+    def assert_same_grid(self, table: Table):
+        expected, result = copy.deepcopy(table), copy.deepcopy(table)
+        update_cell_positions_pairwise(expected)
+        result.update_cell_positions()
+        self.assertEqual(get_grid(expected), get_grid(result))
+
+    def test_test_tables(self):
+        for table in get_test_tables():
+            self.assert_same_grid(table)
+
+    def test_random_tables(self):
+        random.seed(0)
+        for _ in range(50):
+            self.assert_same_grid(create_random_table(random.randint(1, 12), random.randint(1, 8)))
+
+
+class TestIdentifySpans(TestCase):
+    def assert_same_cells(self, row: Row, spans):
+        expected = [(tuple([int(_) for _ in span.bbox]), span.text)
+                    for span in row._identify_spans_pairwise(spans)]
+        result = [(tuple([int(_) for _ in bbox]), text) for bbox, text in row.identify_spans(spans)]
+        self.assertEqual(expected, result)
+
+    def test_lines_of_test_files(self):
+        for dir, _, files in os.walk('testfiles'):
+            for file in sorted(files):
+                if not file.endswith(".pdf"):
+                    continue
+                data = PDF_Extraction.read_pdf(os.path.join(dir, file))
+                table = Table(SimpleNamespace(pageNum=0, isPartOfTable=False), [], 0, 0, 1, 1, data.layout)
+                for textBlock in data.textBlocks:
+                    for line in textBlock.lines:
+                        self.assert_same_cells(Row.from_line(line, 0, table), line.getSpans(0))
+
+    def test_random_spans(self):
+        random.seed(0)
+        table = Table(SimpleNamespace(pageNum=0, isPartOfTable=False), [], 0, 0, 1, 1, LayoutContext(width_of_space=3))
+        for _ in range(1000):
+            row = Row(0, None, table)
+            row.orientation = random.choice([0, 1])
+            position, spans = 0, []
+            for num in range(random.randint(1, 12)):
+                position += random.choice([-4, -1, 0, 1, 3.75, 5, 8])
+                width, offset = random.choice([0.5, 4, 20]), random.uniform(0, 3)
+                if row.orientation == 0:
+                    bbox = (position, offset, position + width, offset + 8)
+                else:
+                    bbox = (offset, 500 - position - width, offset + 8, 500 - position)
+                spans.append(Span(bbox, str(num)))
+                position += width
+            self.assert_same_cells(row, spans)
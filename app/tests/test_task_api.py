@@ -0,0 +1,177 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ..core import task_api
+from ..core.task_api import asy_save_pdf_stream, TaskBuilder, TaskSettings
+from ..core.task_api.extraction_cache import ExtractionCache
+from ..core.task_api.scheduler import JobScheduler, QueueFullError
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+PATH_TO_TEST_FILES = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'testfiles')
+
+
+async def read_in_chunks(path: str, chunk_size: int):
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class TestUpload(TestCase):
+    def test_streamed_upload_is_saved_and_hashed(self):
+        path = os.path.join(PATH_TO_TEST_FILES, '10_12_2021_17_12_48_958304.pdf')
+        with open(path, 'rb') as file:
+            content = file.read()
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.object(task_api, 'INPUT_DIRECTORY', directory):
+                path_to_pdf, content_hash = asyncio.run(asy_save_pdf_stream(read_in_chunks(path, 4096)))
+            with open(path_to_pdf, 'rb') as file:
+                self.assertEqual(file.read(), content)
+            self.assertEqual(content_hash, hashlib.sha256(content).hexdigest())
+
+            task = TaskBuilder(ExtractionCache(directory=None)).create_task_from_file('pdf_to_data', path_to_pdf, client='127.0.0.1',
+                                                       document_id='d', content_hash=content_hash)
+            self.assertEqual(task.path_to_input_file, path_to_pdf)
+            self.assertEqual(task.content_hash, content_hash)
+
+
+class TestExtractionCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_result_is_returned_with_the_new_document_id(self):
+        cache = ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='1')
+        self.assertIsNone(cache.get('abc', 'd2'))
+        cache.add('abc', '{"document_id": "d1", "tables": []}')
+        self.assertEqual(cache.get('abc', 'd2'), '{"document_id": "d2", "tables": []}')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # The results of another version of the pipeline are not used
+        self.assertIsNone(ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='2').get('abc', 'd2'))
+
+    def test_cache_is_persistent_and_bounded(self):
+        cache = ExtractionCache(self.directory.name, max_bytes=100, pipeline_version='1')
+        for content_hash in ['a', 'b', 'c']:
+            cache.add(content_hash, '{"document_id": "%s", "text": "%s"}' % (content_hash, 10 * content_hash))
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.size_in_bytes, 100)
+        cache = ExtractionCache(self.directory.name, max_bytes=100, pipeline_version='1')
+        self.assertIsNone(cache.get('a', 'd'))
+        self.assertIsNotNone(cache.get('c', 'd'))
+
+    def test_cache_is_shared_between_processes(self):
+        cache = ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='1')
+        other = ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='1')
+        other.add('abc', '{"document_id": "d1"}')
+        self.assertEqual(cache.get('abc', 'd2'), '{"document_id": "d2"}')
+        self.assertEqual(len(cache), 1)
+
+    def test_incomplete_results_are_deleted(self):
+        path = os.path.join(self.directory.name, 'abc_1.json.123.tmp')
+        with open(path, 'w') as file:
+            file.write('{"document_id"')
+        os.utime(path, (0, 0))
+        ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='1')
+        self.assertFalse(os.path.exists(path))
+
+    def test_task_is_finished_from_cache(self):
+        builder = TaskBuilder(ExtractionCache(self.directory.name, max_bytes=1000, pipeline_version='1'))
+        task = TaskSettings(client='127.0.0.1', document_id='d1', content_hash='abc', status='finished',
+                            serialized_data='{"document_id": "d1"}')
+        builder.save_to_cache(task)
+        task = TaskSettings(client='127.0.0.1', document_id='d2', content_hash='abc')
+        self.assertTrue(builder.load_from_cache(task))
+        self.assertEqual(task.status, 'finished')
+        self.assertEqual(task.serialized_data, '{"document_id": "d2"}')
+
+
+class TestJobScheduler(TestCase):
+    def setUp(self):
+        self.order = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def block(self, task: TaskSettings):
+        """ A task that blocks the single worker until it is released. """
+        self.started.set()
+        self.release.wait(5)
+
+    def execute(self, task: TaskSettings):
+        self.order.append(task.document_id)
+
+    def run_tasks(self, scheduler: JobScheduler, tasks):
+        scheduler.submit(TaskSettings(client='0', document_id='blocking'), self.block)
+        self.started.wait(5)
+        for client, document_id in tasks:
+            scheduler.submit(TaskSettings(client=client, document_id=document_id), self.execute)
+        self.release.set()
+        for _ in range(500):
+            if scheduler.statistics()['finished'] == len(tasks) + 1:
+                break
+            time.sleep(0.01)
+        scheduler.shutdown()
+
+    def test_clients_are_served_in_turns(self):
+        scheduler = JobScheduler(workers=1, max_queue_size=10, priorities={})
+        self.run_tasks(scheduler, [('a', 'a1'), ('a', 'a2'), ('a', 'a3'), ('b', 'b1'), ('b', 'b2')])
+        self.assertEqual(self.order, ['a1', 'b1', 'a2', 'b2', 'a3'])
+
+    def test_clients_with_priority_are_served_first(self):
+        scheduler = JobScheduler(workers=1, max_queue_size=10, priorities={'b': 1})
+        self.run_tasks(scheduler, [('a', 'a1'), ('a', 'a2'), ('b', 'b1'), ('b', 'b2')])
+        self.assertEqual(self.order, ['b1', 'b2', 'a1', 'a2'])
+
+    def test_full_queue_is_rejected(self):
+        scheduler = JobScheduler(workers=1, max_queue_size=1, priorities={})
+        scheduler.submit(TaskSettings(client='0', document_id='blocking'), self.block)
+        self.started.wait(5)
+        scheduler.submit(TaskSettings(client='a', document_id='a1'), self.execute)
+        self.assertTrue(scheduler.is_full('b'))
+        with self.assertRaises(QueueFullError) as context:
+            scheduler.submit(TaskSettings(client='a', document_id='a2'), self.execute)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        self.assertEqual(scheduler.statistics()['queued'], 1)
+        self.release.set()
+        scheduler.shutdown()
+
+    def test_client_can_not_fill_the_queue(self):
+        scheduler = JobScheduler(workers=1, max_queue_size=10, max_client_queue_size=2, priorities={})
+        scheduler.submit(TaskSettings(client='0', document_id='blocking'), self.block)
+        self.started.wait(5)
+        scheduler.submit(TaskSettings(client='a', document_id='a1'), self.execute)
+        scheduler.submit(TaskSettings(client='a', document_id='a2'), self.execute)
+        self.assertTrue(scheduler.is_full('a'))
+        self.assertFalse(scheduler.is_full('b'))
+        with self.assertRaises(QueueFullError):
+            scheduler.submit(TaskSettings(client='a', document_id='a3'), self.execute)
+        scheduler.submit(TaskSettings(client='b', document_id='b1'), self.execute)
+        self.release.set()
+        scheduler.shutdown()
+
+    def test_states_of_tasks(self):
+        def fail(task: TaskSettings):
+            raise ValueError()
+
+        scheduler = JobScheduler(workers=1, max_queue_size=10, priorities={})
+        task = TaskSettings(client='a', document_id='a1')
+        scheduler.submit(TaskSettings(client='0', document_id='blocking'), self.block)
+        self.started.wait(5)
+        scheduler.submit(task, fail)
+        self.assertEqual(scheduler.get_job('a1').status, 'queued')
+        self.assertEqual(scheduler.get_job('blocking').status, 'running')
+        self.release.set()
+        for _ in range(500):
+            if task.finished_at is not None:
+                break
+            time.sleep(0.01)
+        scheduler.shutdown()
+        self.assertEqual(task.status, 'failed')
+        self.assertTrue(task.queued_at <= task.started_at <= task.finished_at)